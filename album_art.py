@@ -0,0 +1,154 @@
+"""Embedded album art rendered as half-block terminal cells"""
+
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+from rich.color import Color
+from rich.segment import Segment
+from rich.style import Style
+from config import ALBUM_ART_CACHE_TRACKS
+from visualizer import DOWNGRADE_SYSTEMS
+
+HALF_BLOCK = "▀"  # Foreground paints the top pixel, background the bottom one
+
+
+def read_embedded_art(song_path):
+    """Bytes of the cover image embedded in a song (ID3 APIC, FLAC/Vorbis picture, MP4 covr), or None"""
+    try:
+        import mutagen
+        audio = mutagen.File(song_path)
+    except Exception:
+        return None
+    if audio is None:
+        return None
+
+    pictures = getattr(audio, 'pictures', None)  # FLAC
+    if pictures:
+        return min(pictures, key=lambda p: p.type != 3).data  # Prefer the front cover
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, 'getall'):  # ID3
+        frames = tags.getall("APIC")
+        if frames:
+            return min(frames, key=lambda f: f.type != 3).data
+        return None
+    covers = tags.get('covr') if hasattr(tags, 'get') else None  # MP4
+    if covers:
+        return bytes(covers[0])
+    return None
+
+
+def decode_image(data):
+    """Decode JPEG/PNG bytes into an (height, width, 3) uint8 array using pygame"""
+    import pygame
+    surface = pygame.image.load(io.BytesIO(data))
+    return pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+
+
+def downscale(pixels, width, height):
+    """Area-average an (h, w, 3) image down to (height, width, 3) in one NumPy pass"""
+    src_h, src_w = pixels.shape[:2]
+    width, height = min(width, src_w), min(height, src_h)
+    row_starts = (np.arange(height) * src_h) // height
+    col_starts = (np.arange(width) * src_w) // width
+    sums = np.add.reduceat(np.add.reduceat(pixels.astype(np.uint32), row_starts, axis=0), col_starts, axis=1)
+    counts = np.outer(np.diff(np.append(row_starts, src_h)), np.diff(np.append(col_starts, src_w)))
+    return (sums / counts[:, :, None]).astype(np.uint8)
+
+
+class AlbumArt:
+    """Rich renderable showing the cover of the current track.
+
+    Decoded images are kept for the last few tracks and the rendered cell
+    lines for each (track, size, color depth), so a frame only replays
+    cached segments and switching back to a track does not decode again.
+    """
+
+    def __init__(self, max_tracks=ALBUM_ART_CACHE_TRACKS):
+        self.max_tracks = max_tracks
+        self.color_depth = "truecolor"
+        self._images = OrderedDict()  # song path -> pixels (None if the song has no art)
+        self._lines = OrderedDict()  # (song path, width, height, depth) -> rendered lines
+        self._track = None
+        self._lock = threading.Lock()
+
+    @property
+    def has_image(self):
+        return self._images.get(self._track) is not None
+
+    def set_color_depth(self, depth):
+        self.color_depth = depth
+
+    def set_track(self, song_path):
+        """Show the cover of a song, decoding it only if it is not cached"""
+        with self._lock:
+            if song_path in self._images:
+                self._images.move_to_end(song_path)
+                self._track = song_path
+                return self.has_image
+        pixels = None
+        data = read_embedded_art(song_path) if song_path else None
+        if data:
+            try:
+                pixels = decode_image(data)
+            except Exception:
+                pixels = None
+        with self._lock:
+            self._images[song_path] = pixels
+            while len(self._images) > self.max_tracks:
+                gone, _ = self._images.popitem(last=False)
+                for key in [key for key in self._lines if key[0] == gone]:
+                    del self._lines[key]
+            self._track = song_path
+        return pixels is not None
+
+    def _cell_style(self, top, bottom):
+        fg, bg = Color.from_rgb(*top), Color.from_rgb(*bottom)
+        system = DOWNGRADE_SYSTEMS.get(self.color_depth)
+        if system is not None:
+            fg, bg = fg.downgrade(system), bg.downgrade(system)
+        return Style(color=fg, bgcolor=bg)
+
+    def _render_lines(self, pixels, width, height):
+        """Cell lines for an image fitted (square) in width x height cells, centred vertically"""
+        size = max(1, min(width, height * 2))
+        small = downscale(pixels, size, size)
+        if len(small) % 2:
+            small = np.concatenate([small, small[-1:]])  # Odd pixel rows: repeat the last one
+        rows, cols = len(small) // 2, small.shape[1]
+        pad = " " * ((width - cols) // 2)
+        styles = {}
+        lines = [[Segment(" " * width)] for _ in range((height - rows) // 2)]
+        for y in range(rows):
+            line = [Segment(pad)] if pad else []
+            for top, bottom in zip(map(tuple, small[2 * y]), map(tuple, small[2 * y + 1])):
+                style = styles.get((top, bottom))
+                if style is None:
+                    style = styles[(top, bottom)] = self._cell_style(top, bottom)
+                line.append(Segment(HALF_BLOCK, style))
+            line.append(Segment(" " * (width - len(pad) - cols)))
+            lines.append(Segment.simplify(line))
+        lines.extend([Segment(" " * width)] for _ in range(height - len(lines)))
+        return lines
+
+    def __rich_console__(self, console, options):
+        width = options.max_width
+        height = options.height or width // 2
+        with self._lock:
+            pixels = self._images.get(self._track)
+            key = (self._track, width, height, self.color_depth)
+            lines = self._lines.get(key)
+        if pixels is None or width <= 0 or height <= 0:
+            return
+        if lines is None:
+            lines = self._render_lines(pixels, width, height)
+            with self._lock:
+                self._lines[key] = lines
+                while len(self._lines) > self.max_tracks * 4:
+                    self._lines.popitem(last=False)
+        new_line = Segment.line()
+        for line in lines:
+            yield from line
+            yield new_line
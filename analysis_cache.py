@@ -0,0 +1,84 @@
+"""Persistent per-track analysis cache stored as JSON"""
+
+import json
+import os
+import tempfile
+import threading
+from config import CACHE_DIR, ANALYSIS_CACHE_FILE
+
+
+def file_signature(path):
+    """Return a (size, mtime_ns) signature used to detect changed files"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class AnalysisCache:
+    """Stores per-track analysis results (loudness, etc.) keyed by absolute path.
+
+    Entries are invalidated automatically when the file size or modification
+    time changes, so a re-tagged or replaced file is analysed again.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, ANALYSIS_CACHE_FILE)
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, song_path, key=None, default=None):
+        """Get the cached analysis for a track, or a single value from it"""
+        try:
+            signature = file_signature(song_path)
+        except OSError:
+            return default
+        with self._lock:
+            self._load()
+            entry = self._entries.get(os.path.abspath(song_path))
+        if not entry or entry.get('signature') != signature:
+            return default
+        if key is None:
+            return entry
+        return entry.get(key, default)
+
+    def update(self, song_path, save=True, **values):
+        """Merge new analysis values into the entry for a track"""
+        signature = file_signature(song_path)
+        with self._lock:
+            self._load()
+            key = os.path.abspath(song_path)
+            entry = self._entries.get(key)
+            if not entry or entry.get('signature') != signature:
+                entry = {'signature': signature}
+                self._entries[key] = entry
+            entry.update(values)
+            self._dirty = True
+        if save:
+            self.save()
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_path)
+                self._dirty = False
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,223 @@
+"""Live analysis frames in shared memory, for visualizers running in other processes"""
+
+import os
+import socket
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from config import ANALYSIS_SHM_NAME, ANALYSIS_SHM_SLOTS, ANALYSIS_SOCKET_PATH
+
+MAGIC = b"PLAN"
+VERSION = 2
+# magic, version, bands, slots, slot size, owner PID, then the sequence of the last complete frame
+HEADER = struct.Struct('<4sHHIIi4x8x')
+SEQUENCE_OFFSET = HEADER.size - 8
+SEQUENCE = struct.Struct('<Q')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but belongs to another user
+    return True
+
+
+def _remove_stale_block(name):
+    """Unlink a leftover block, unless the player that created it is still running"""
+    stale = shared_memory.SharedMemory(name=name)
+    try:
+        if stale.size >= HEADER.size:
+            magic, version, _, _, _, owner = HEADER.unpack_from(stale.buf, 0)
+            if magic == MAGIC and version == VERSION and owner != os.getpid() and _process_alive(owner):
+                # Attaching registered the block for deletion when this process exits
+                resource_tracker.unregister(stale._name, "shared_memory")
+                raise RuntimeError(f"El bloque de análisis '{name}' está en uso por otro reproductor (PID {owner})")
+    finally:
+        stale.close()
+    stale.unlink()
+
+
+def slot_dtype(num_bands):
+    """Layout of one ring slot; `seq` is 0 while the slot is being written"""
+    return np.dtype([
+        ('seq', '<u8'),
+        ('timestamp', '<f8'),  # time.time() at which the frame is due on screen
+        ('position', '<f8'),  # Playback position, seconds
+        ('duration', '<f8'),  # Track length, seconds
+        ('line', '<i4'),  # Current lyric line, -1 before the first one
+        ('bands', '<f4', (num_bands,)),
+    ])
+
+
+class AnalysisPublisher:
+    """Writes every analysis frame into a shared-memory ring buffer.
+
+    The block starts with a header holding the layout and the sequence
+    number of the newest complete frame, followed by `slots` fixed-size
+    records. Frame n goes to slot n % slots: its `seq` is cleared, the
+    data written, then `seq` set to n and the header sequence advanced, so
+    a reader that sees the same `seq` before and after reading a slot got
+    a consistent frame. The player only ever writes into memory, so no
+    reader can slow it down.
+
+    With a socket path, consumers may also connect to a Unix socket and
+    receive the 8-byte sequence number of each new frame instead of polling;
+    clients that fall behind are dropped.
+
+    A block left behind by a crashed player is replaced; one whose owner is
+    still running raises RuntimeError instead of being taken over.
+    """
+
+    def __init__(self, num_bands, name=ANALYSIS_SHM_NAME, slots=ANALYSIS_SHM_SLOTS,
+                 socket_path=ANALYSIS_SOCKET_PATH):
+        self.num_bands = num_bands
+        self.dtype = slot_dtype(num_bands)
+        size = HEADER.size + slots * self.dtype.itemsize
+        try:
+            self._block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:  # Left behind by a player that did not exit cleanly, or still in use
+            _remove_stale_block(name)
+            self._block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(self._block.buf, 0, MAGIC, VERSION, num_bands, slots, self.dtype.itemsize, os.getpid())
+        self.slots = np.ndarray((slots,), dtype=self.dtype, buffer=self._block.buf, offset=HEADER.size)
+        self.slots[:] = 0
+        self.sequence = 0
+        self._last_bands = np.zeros(num_bands, dtype=np.float32)
+
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._server = None
+        if socket_path:
+            self._start_notifier(socket_path)
+
+    @property
+    def name(self):
+        return self._block.name
+
+    def publish(self, bands, position, duration, line, timestamp=None):
+        """Append one frame; `bands` None repeats the previous ones (no new analysis)"""
+        if bands is not None:
+            self._last_bands = np.asarray(bands, dtype=np.float32)[:self.num_bands]
+        self.sequence += 1
+        slot = self.slots[self.sequence % len(self.slots)]
+        slot['seq'] = 0
+        slot['timestamp'] = time.time() if timestamp is None else timestamp
+        slot['position'] = position
+        slot['duration'] = duration
+        slot['line'] = line
+        slot['bands'][:len(self._last_bands)] = self._last_bands
+        slot['seq'] = self.sequence
+        SEQUENCE.pack_into(self._block.buf, SEQUENCE_OFFSET, self.sequence)
+        if self._clients:
+            self._notify()
+
+    def _start_notifier(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(socket_path)
+        self._server.listen()
+        self._socket_path = socket_path
+        thread = threading.Thread(target=self._accept_clients, daemon=True)
+        thread.start()
+
+    def _accept_clients(self):
+        while self._server is not None:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return  # Closed
+            client.setblocking(False)
+            with self._clients_lock:
+                self._clients.append(client)
+
+    def _notify(self):
+        message = SEQUENCE.pack(self.sequence)
+        with self._clients_lock:
+            for client in list(self._clients):
+                try:
+                    # A partial write would split the stream mid-number: drop the client instead
+                    complete = client.send(message) == len(message)
+                except OSError:  # Gone, or not reading: the player never waits for it
+                    complete = False
+                if not complete:
+                    client.close()
+                    self._clients.remove(client)
+
+    def close(self):
+        """Remove the shared block and the socket"""
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.close()
+            with self._clients_lock:
+                for client in self._clients:
+                    client.close()
+                self._clients = []
+            if os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+        if self._block is not None:
+            del self.slots
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+
+class AnalysisReader:
+    """Consumer side of AnalysisPublisher, for use from another process.
+
+    `slots` is a NumPy view straight onto the shared block, so reading a
+    frame copies nothing; read() checks the sequence around the access and
+    returns None if the frame was overwritten meanwhile.
+    """
+
+    def __init__(self, name=ANALYSIS_SHM_NAME):
+        self._block = shared_memory.SharedMemory(name=name)
+        # Attaching registers the block with this process's resource tracker,
+        # which would delete it when the reader exits; the player owns it
+        resource_tracker.unregister(self._block._name, "shared_memory")
+        magic, version, num_bands, slots, slot_size, _ = HEADER.unpack_from(self._block.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._block.close()
+            raise ValueError(f"{name} no contiene cuadros de análisis compatibles")
+        self.num_bands = num_bands
+        self.slots = np.ndarray((slots,), dtype=slot_dtype(num_bands), buffer=self._block.buf, offset=HEADER.size)
+
+    @property
+    def sequence(self):
+        """Sequence number of the newest complete frame (0 before the first one)"""
+        return SEQUENCE.unpack_from(self._block.buf, SEQUENCE_OFFSET)[0]
+
+    def read(self, sequence=None, copy=False):
+        """Slot of frame `sequence` (the newest by default), or None if it is no longer in the ring.
+
+        Without `copy` the returned record is a view into shared memory that
+        later frames overwrite; check `record['seq']` again after using it.
+        """
+        if sequence is None:
+            sequence = self.sequence
+        if sequence <= 0:
+            return None
+        slot = self.slots[sequence % len(self.slots)]
+        if slot['seq'] != sequence:
+            return None
+        if copy:
+            slot = slot.copy()
+            if self.slots[sequence % len(self.slots)]['seq'] != sequence:
+                return None
+        return slot
+
+    def frames_since(self, sequence):
+        """Copies of the complete frames newer than `sequence` still in the ring, oldest first"""
+        newest = self.sequence
+        first = max(sequence + 1, newest - len(self.slots) + 2)  # The oldest slot may be mid-write
+        frames = (self.read(n, copy=True) for n in range(first, newest + 1))
+        return [frame for frame in frames if frame is not None]
+
+    def close(self):
+        del self.slots
+        self._block.close()
@@ -4,6 +4,132 @@ import numpy as np
 from pydub import AudioSegment
 import tempfile
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from config import DECODE_WORKERS
+from transcode_cache import TranscodeCache, needs_transcode, transcode_to_cache
+
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+_pending_transcodes = set()  # Tracks being written to the transcode cache
+
+
+def segment_to_array(audio_segment):
+    """Convert a pydub AudioSegment to a (samples, 2) integer NumPy array"""
+    samples = np.array(audio_segment.get_array_of_samples())
+    if audio_segment.channels == 2:
+        return samples.reshape((-1, 2))
+    return np.repeat(samples[:, np.newaxis], 2, axis=1)
+
+
+def segment_to_samples(audio_segment):
+    """Float samples in [-1.0, 1.0] of a pydub AudioSegment, plus its sample rate"""
+    full_scale = float(1 << (8 * audio_segment.sample_width - 1))
+    return segment_to_array(audio_segment) / full_scale, audio_segment.frame_rate
+
+
+def decode_audio(song_path):
+    """Decode an audio file to float samples in [-1.0, 1.0] plus its sample rate"""
+    return segment_to_samples(AudioSegment.from_file(song_path))
+
+
+def _decode_to_shared_memory(song_path, export_wav=True):
+    """Worker process: decode a file, export the WAV for the mixer and publish the PCM.
+
+    The samples are written into a named shared memory block so the player can
+    map them without copying or pickling; only the block name and metadata are
+    returned. Formats the mixer cannot play are served from the transcode
+    cache when possible; otherwise a temporary WAV is exported and the
+    result asks the caller to fill the cache in the background.
+    """
+    audio_segment = AudioSegment.from_file(song_path)
+    samples = segment_to_array(audio_segment)
+
+    music_file_path = None
+    music_file_is_temporary = False
+    transcode = False
+    if export_wav:  # Only the pygame.mixer.music engine plays from a file
+        if needs_transcode(song_path):
+            music_file_path = TranscodeCache().lookup(song_path)
+            transcode = music_file_path is None
+        if music_file_path is None:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+                audio_segment.export(tmp_file.name, format="wav")
+                music_file_path = tmp_file.name
+            music_file_is_temporary = True
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+    # The player owns the block from now on; keep this process' resource
+    # tracker from unlinking it when the worker exits
+    resource_tracker.unregister(block._name, "shared_memory")
+    np.ndarray(samples.shape, dtype=samples.dtype, buffer=block.buf)[:] = samples
+    block.close()
+
+    return {
+        'shm_name': block.name,
+        'shape': samples.shape,
+        'dtype': samples.dtype.str,
+        'music_file_path': music_file_path,
+        'music_file_is_temporary': music_file_is_temporary,
+        'transcode': transcode,
+        'sample_rate': audio_segment.frame_rate,
+        'channels': audio_segment.channels,
+        'sample_width': audio_segment.sample_width,
+        'duration': len(audio_segment) / 1000.0,
+    }
+
+
+def submit_decode(song_path, export_wav=True):
+    """Start decoding a track in the worker pool and return its future.
+
+    Several tracks can be submitted at once (e.g. to prepare the next song);
+    pass the future to AudioProcessor.load_audio to use the result.
+    """
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ProcessPoolExecutor(max_workers=DECODE_WORKERS)
+        return _decode_pool.submit(_decode_to_shared_memory, song_path, export_wav)
+
+
+def submit_transcode(song_path):
+    """Fill the transcode cache entry for a track in the worker pool (once per track)"""
+    global _decode_pool
+    with _decode_pool_lock:
+        if song_path in _pending_transcodes:
+            return None
+        if _decode_pool is None:
+            _decode_pool = ProcessPoolExecutor(max_workers=DECODE_WORKERS)
+        _pending_transcodes.add(song_path)
+        future = _decode_pool.submit(transcode_to_cache, song_path)
+    future.add_done_callback(lambda _: _pending_transcodes.discard(song_path))
+    return future
+
+
+def shutdown_decode_pool():
+    """Stop the decode worker processes"""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is not None:
+            _decode_pool.shutdown(wait=False, cancel_futures=True)
+            _decode_pool = None
+
+
+def release_decoded(decoded):
+    """Free the resources of a decode result that will not be loaded"""
+    _unlink_shared_memory(decoded['shm_name'])
+    if decoded['music_file_is_temporary'] and os.path.exists(decoded['music_file_path']):
+        os.remove(decoded['music_file_path'])
+
+
+def _unlink_shared_memory(name):
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
 
 
 class AudioProcessor:
@@ -12,74 +138,123 @@ class AudioProcessor:
         self.raw_data = None
         self.sample_rate = 0
         self.channels = 0
+        self.sample_width = 2
         self.chunk_size = 2048
         self.music_file_path = None
+        self._music_file_is_temporary = False
+        self._shared_block = None
+        self._band_plans = {}  # (chunk length, sample rate) -> FFT bin ranges of the bands
 
-    def load_audio(self, song_path):
-        """Load audio file and prepare for analysis"""
-        audio_segment = AudioSegment.from_file(song_path)
-        self.sample_rate = audio_segment.frame_rate
-        self.channels = audio_segment.channels
-
-        # Store raw data for analysis
-        samples = np.array(audio_segment.get_array_of_samples())
-        if self.channels == 2:
-            self.raw_data = samples.reshape((-1, 2))
-        else:
-            self.raw_data = np.repeat(samples[:, np.newaxis], 2, axis=1)
-
-        # Calculate duration
-        self.duration = len(audio_segment) / 1000.0  # Duration in seconds
-        
-        # Create a temporary file for pygame.mixer.music
-        if self.music_file_path and os.path.exists(self.music_file_path):
-            os.remove(self.music_file_path)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-            audio_segment.export(tmp_file.name, format="wav")
-            self.music_file_path = tmp_file.name
-        
+    def load_audio(self, song_path, decode_future=None):
+        """Load audio file and prepare for analysis.
+
+        Decoding runs in a worker process (see submit_decode), so this thread
+        only waits, without holding the GIL, and the UI keeps animating. The
+        PCM is mapped from shared memory instead of being copied back.
+        """
+        if decode_future is None:
+            decode_future = submit_decode(song_path)
+        decoded = decode_future.result()
+
+        # Free the previous track only now, so it stays valid while the next one decodes
+        self._release_samples()
+        self._remove_music_file()
+
+        self._shared_block = shared_memory.SharedMemory(name=decoded['shm_name'])
+        self.raw_data = np.ndarray(decoded['shape'], dtype=np.dtype(decoded['dtype']),
+                                   buffer=self._shared_block.buf)
+        self.sample_rate = decoded['sample_rate']
+        self.channels = decoded['channels']
+        self.sample_width = decoded['sample_width']
+        self.duration = decoded['duration']  # Duration in seconds
+
+        # File for pygame.mixer.music: a temporary WAV written by the worker or a cached transcode
+        self.music_file_path = decoded['music_file_path']
+        self._music_file_is_temporary = decoded['music_file_is_temporary']
+        if decoded['transcode']:
+            submit_transcode(song_path)
         return self.music_file_path
 
-    def calculate_eq_bands(self, mono_chunk):
-        """Calculate equalizer bands from audio chunk"""
-        # Apply FFT
-        fft_result = np.fft.rfft(mono_chunk)
-        fft_magnitude = np.abs(fft_result)
+    def _remove_music_file(self):
+        """Delete the temporary WAV (cached transcodes stay in the cache)"""
+        if self._music_file_is_temporary and self.music_file_path and os.path.exists(self.music_file_path):
+            try:
+                os.remove(self.music_file_path)
+            except PermissionError:
+                pass  # Gracefully ignore if file is still in use
+        self.music_file_path = None
+        self._music_file_is_temporary = False
 
-        # Logarithmic scale for frequencies
-        min_freq = 20
-        max_freq = self.sample_rate / 2
-        log_freq_space = np.logspace(np.log10(min_freq), np.log10(max_freq), self.num_eq_bands + 1)
-        
-        bands = []
-        fft_freqs = np.fft.rfftfreq(len(mono_chunk), 1.0 / self.sample_rate)
+    def _release_samples(self):
+        """Unmap and unlink the shared memory holding the current track"""
+        block, self._shared_block = self._shared_block, None
+        self.raw_data = None
+        if block is None:
+            return
+        block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            pass  # A view is still alive somewhere; the mapping goes away with it
+
+    def _band_plan(self, chunk_samples):
+        """FFT bin ranges of the logarithmic bands for a chunk length, computed once per length"""
+        key = (chunk_samples, self.sample_rate)
+        plan = self._band_plans.get(key)
+        if plan is None:
+            # Logarithmic scale for frequencies, 20 Hz to Nyquist
+            log_freq_space = np.logspace(np.log10(20), np.log10(self.sample_rate / 2), self.num_eq_bands + 1)
+            fft_freqs = np.fft.rfftfreq(chunk_samples, 1.0 / self.sample_rate)
+            edges = np.searchsorted(fft_freqs, log_freq_space)
+            starts, ends = edges[:-1], edges[1:]
+            plan = self._band_plans[key] = (starts, ends, np.maximum(ends - starts, 1))
+        return plan
+
+    def calculate_eq_bands(self, chunk):
+        """Calculate equalizer bands from an audio chunk.
 
-        for i in range(self.num_eq_bands):
-            start_idx = np.searchsorted(fft_freqs, log_freq_space[i])
-            end_idx = np.searchsorted(fft_freqs, log_freq_space[i+1])
-            if start_idx == end_idx:
-                bands.append(0)
-                continue
-            avg_magnitude = np.mean(fft_magnitude[start_idx:end_idx])
-            bands.append(avg_magnitude)
+        A (samples,) chunk gives a list of band levels. A (channels, samples)
+        chunk is transformed in one batched FFT and gives a (channels, bands)
+        array, normalized together so the channels stay comparable.
+        """
+        if self.sample_rate <= 0 or chunk.shape[-1] == 0:
+            silence = np.zeros(chunk.shape[:-1] + (self.num_eq_bands,))
+            return silence.tolist() if silence.ndim == 1 else silence
 
-        if not bands:
-            return [0.0] * self.num_eq_bands
+        # Apply FFT along the last axis: every channel in the same call
+        fft_magnitude = np.abs(np.fft.rfft(chunk, axis=-1))
+
+        # Mean magnitude of each band from a running sum; empty bands read as 0
+        starts, ends, counts = self._band_plan(chunk.shape[-1])
+        running = np.zeros(fft_magnitude.shape[:-1] + (fft_magnitude.shape[-1] + 1,))
+        np.cumsum(fft_magnitude, axis=-1, out=running[..., 1:])
+        bands = (running[..., ends] - running[..., starts]) / counts
 
         # Enhanced normalization
-        bands = np.array(bands)
         bands = np.log1p(bands * 5)  # Apply gain and logarithmic scale
-        
+
         # Use a fixed ceiling or more stable dynamic maximum for normalization
         max_val = max(5.0, np.max(bands))  # Prevents division by zero and stabilizes
-        if max_val > 0:
-            bands = bands / max_val
-        
-        return np.clip(bands, 0, 1).tolist()
+        bands = np.clip(bands / max_val, 0, 1)
+        return bands.tolist() if bands.ndim == 1 else bands
+
+    @staticmethod
+    def stereo_correlation(chunk):
+        """Correlation of the left and right channels of a (2, samples) chunk.
+
+        +1 is mono, 0 unrelated channels (wide stereo), -1 out of phase.
+        Silence reads as +1.
+        """
+        left, right = chunk[0], chunk[-1]
+        energy = np.sqrt(np.dot(left, left) * np.dot(right, right))
+        return float(np.dot(left, right) / energy) if energy > 1e-12 else 1.0
+
+    def get_audio_chunk(self, current_playback_ms, analysis_chunk_samples, channels=False):
+        """Extract audio chunk for analysis based on current playback position.
 
-    def get_audio_chunk(self, current_playback_ms, analysis_chunk_samples):
-        """Extract audio chunk for analysis based on current playback position"""
+        Mixed down to mono by default; with `channels`, a (channels, samples)
+        array for calculate_eq_bands to analyse per channel.
+        """
         if self.raw_data is None:
             return np.array([])
         
@@ -99,20 +274,24 @@ class AudioProcessor:
             return np.array([])
 
         # Normalize chunk to [-1.0, 1.0] for FFT analysis
+        if channels:
+            return chunk_to_analyze.T / 32768.0
         mono_chunk_int = chunk_to_analyze.mean(axis=1)
         normalized_chunk = mono_chunk_int / 32768.0
 
         return normalized_chunk
 
+    def get_normalized_samples(self):
+        """Get the loaded audio as float samples in [-1.0, 1.0]"""
+        if self.raw_data is None:
+            return np.zeros((0, 2))
+        return self.raw_data / float(1 << (8 * self.sample_width - 1))
+
     def get_duration(self):
         """Get the total duration of the loaded audio in seconds"""
         return getattr(self, 'duration', 0)
 
     def cleanup(self):
-        """Clean up temporary audio file"""
-        if self.music_file_path and os.path.exists(self.music_file_path):
-            try:
-                os.remove(self.music_file_path)
-            except PermissionError:
-                pass  # Gracefully ignore if file is still in use
-            self.music_file_path = None
\ No newline at end of file
+        """Clean up temporary audio file and the shared sample buffer"""
+        self._release_samples()
+        self._remove_music_file()
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""Full-screen renderer that only rewrites the terminal cells that changed"""
+
+import sys
+from rich.cells import get_character_cell_size
+from rich.color import ColorSystem
+
+COLOR_SYSTEMS = {"standard": ColorSystem.STANDARD, "256": ColorSystem.EIGHT_BIT,
+                 "truecolor": ColorSystem.TRUECOLOR, "windows": ColorSystem.WINDOWS}
+GAP_TO_BRIDGE = 4  # Rewriting a few unchanged cells is cheaper than another cursor move
+
+# Placeholder for the right half of a double-width character
+WIDE_TAIL = None
+
+
+class _StdoutGuard:
+    """Stands in for sys.stdout while the renderer owns the screen.
+
+    Anything printed by other code would scribble over cells the back buffer
+    still believes are on screen, so the next frame is redrawn in full.
+    """
+
+    def __init__(self, stream, renderer):
+        self.stream = stream
+        self.renderer = renderer
+
+    def write(self, text):
+        self.renderer.invalidate()
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class CellRenderer:
+    """Draws a rich renderable over the whole terminal, curses-style.
+
+    Each frame is rendered to a grid of (character, style) cells and compared
+    with the back buffer of the previous frame. Only runs of changed cells are
+    written, each preceded by a cursor-addressing sequence, so a frame where
+    just the equalizer row, one lyric line and the progress bar move costs a
+    few hundred bytes instead of the whole screen.
+    """
+
+    def __init__(self, console):
+        self.console = console
+        self._chars = None  # Back buffer: rows of characters...
+        self._styles = None  # ...and their styles
+        self._size = None
+        self._saved_stdout = None
+        self._sgr_cache = {}
+
+    def start(self):
+        self._saved_stdout = sys.stdout
+        sys.stdout = _StdoutGuard(sys.stdout, self)
+        self.invalidate()
+        self._write("\x1b[?25l")  # Hide the cursor
+
+    def stop(self):
+        if self._saved_stdout is not None:
+            sys.stdout = self._saved_stdout
+            self._saved_stdout = None
+        height = self._size[1] if self._size else 0
+        self._write(f"\x1b[0m\x1b[{height + 1};1H\x1b[?25h")
+
+    def invalidate(self):
+        """Forget the back buffer so the next frame is drawn in full"""
+        self._chars = self._styles = None
+
+    def _write(self, data):
+        self.console.file.write(data)
+        self.console.file.flush()
+
+    def _render_grid(self, renderable, width, height):
+        options = self.console.options.update_dimensions(width, height)
+        chars, styles = [], []
+        for line in self.console.render_lines(renderable, options, pad=True):
+            row_chars, row_styles = [], []
+            for segment in line:
+                text, style = segment.text, segment.style
+                if segment.control:
+                    continue
+                if text.isascii():
+                    row_chars.extend(text)
+                    row_styles.extend([style] * len(text))
+                    continue
+                for char in text:
+                    size = get_character_cell_size(char)
+                    if size == 0:
+                        continue
+                    row_chars.append(char)
+                    row_styles.append(style)
+                    if size == 2:
+                        row_chars.append(WIDE_TAIL)
+                        row_styles.append(style)
+            chars.append(row_chars[:width])
+            styles.append(row_styles[:width])
+        return chars, styles
+
+    def _changed_runs(self, row, chars, styles):
+        """(start, end) column ranges of this row that differ from the back buffer"""
+        old_chars, old_styles = self._chars[row], self._styles[row]
+        if chars == old_chars and styles == old_styles:
+            return []
+        width = len(chars)
+        changed = [col for col in range(width)
+                   if col >= len(old_chars) or chars[col] != old_chars[col] or styles[col] != old_styles[col]]
+        runs = []
+        for col in changed:
+            if runs and col - runs[-1][1] <= GAP_TO_BRIDGE:
+                runs[-1][1] = col + 1
+            else:
+                runs.append([col, col + 1])
+        return runs
+
+    def _sgr(self, style, color_system):
+        """Escape sequence that resets attributes and applies `style`"""
+        key = (style, color_system)
+        sgr = self._sgr_cache.get(key)
+        if sgr is None:
+            rendered = style.render("\0", color_system=color_system) if style else "\0"
+            codes = rendered.split("\0")[0][2:-1]  # Strip "\x1b[" and "m"
+            sgr = f"\x1b[0;{codes}m" if codes else "\x1b[0m"
+            self._sgr_cache[key] = sgr
+        return sgr
+
+    def _encode_run(self, row, start, end, chars, styles, color_system):
+        # Never start or end in the middle of a double-width character
+        while start > 0 and chars[start] is WIDE_TAIL:
+            start -= 1
+        while end < len(chars) and chars[end] is WIDE_TAIL:
+            end += 1
+        parts = [f"\x1b[{row + 1};{start + 1}H"]
+        col = start
+        while col < end:
+            style = styles[col]
+            run_end = col
+            while run_end < end and styles[run_end] == style:
+                run_end += 1
+            parts.append(self._sgr(style, color_system))
+            parts.append("".join(c for c in chars[col:run_end] if c is not WIDE_TAIL))
+            col = run_end
+        return "".join(parts)
+
+    def refresh(self, renderable):
+        """Render a frame and write only what changed since the previous one"""
+        width, height = self.console.size
+        height = max(1, height - 1)  # Keep off the last line so the terminal never scrolls
+        chars, styles = self._render_grid(renderable, width, height)
+        color_system = COLOR_SYSTEMS.get(self.console.color_system)
+
+        full_redraw = self._chars is None or self._size != (width, height)
+        out = ["\x1b[0m\x1b[2J"] if full_redraw else []
+        for row in range(len(chars)):
+            if full_redraw:
+                runs = [(0, len(chars[row]))]
+            else:
+                runs = self._changed_runs(row, chars[row], styles[row])
+            for start, end in runs:
+                out.append(self._encode_run(row, start, end, chars[row], styles[row], color_system))
+
+        self._chars, self._styles, self._size = chars, styles, (width, height)
+        if out:
+            self._write("".join(out))
@@ -4,15 +4,69 @@
 DEFAULT_EQ_BANDS = 16
 ANALYSIS_INTERVAL_MS = 100
 AUDIO_BUFFER_SIZE = 2048
+DECODE_WORKERS = 2  # Processes that decode tracks off the UI thread
+
+# Playback engine: "stream" (pygame.mixer.music) or "gapless" (pre-decoded buffers on a mixer channel)
+PLAYBACK_ENGINE = "stream"
+CROSSFADE_SECONDS = 0.0  # Gapless engine only; 0 joins tracks back to back
+GAPLESS_BLOCK_SECONDS = 0.25  # Size of the buffers queued on the channel
+PREFETCH_SECONDS = 15.0  # Start decoding the next song this long before the current one ends
+TRACK_CACHE_MAX_MB = 256  # Decoded PCM kept for recently played songs (about 10 MB per minute); 0 disables
 
 # Display settings
-CONSOLE_REFRESH_RATE = 10
-EQ_DECAY_RATE = 0.2
+CONSOLE_REFRESH_RATE = 30  # Frames per second at best; the EQ is interpolated between analysis frames
+EQ_DECAY_RATE = 2.0  # How fast the bar envelope falls, per second
+EQ_ATTACK_SECONDS = 0.28  # Smoothing time constant while bars rise
+EQ_RELEASE_SECONDS = 0.28  # Smoothing time constant while bars fall
+EQ_PEAK_HOLD = False  # Keep a per-band peak marker (drawn by the peaks mode)
+EQ_PEAK_HOLD_SECONDS = 1.0
+EQ_PEAK_FALL_RATE = 0.5  # Peak fall per second after the hold
+VISUALIZER_ROWS = 8  # Height of the multi-row modes (waterfall, peaks)
+VISUALIZER_HISTORY_FRAMES = 64  # Band frames kept in the visualizer ring buffer
+PEAK_HOLD_FRAMES = 30  # Frames a peak marker is held (about 1.5 s at 20 fps)
 LYRIC_TYPING_SPEED = 0.05  # seconds per character
+LYRIC_HISTORY_LINES = 10  # Completed lyric lines kept on screen
+ALBUM_ART = True  # Show the embedded cover next to the lyrics
+ALBUM_ART_WIDTH = 32  # Columns of the cover panel (two pixels per cell vertically)
+ALBUM_ART_CACHE_TRACKS = 8  # Decoded covers kept for recently shown tracks
+
+# Terminal output
+DISPLAY_RENDERER = "live"  # "live" (rich Live, full repaint) or "cells" (writes only changed cells)
+COLOR_DEPTH = "auto"  # "auto" (detected by rich), "truecolor", "256" or "16"
+OUTPUT_BUDGET_BYTES_PER_SEC = 0  # Byte budget for the live display; 0 adapts to write throughput only
+OUTPUT_WRITE_BUSY_LIMIT = 0.5  # Lower quality when writes block for more than this share of the time
 
 # Paths
 SONGS_DIR = "songs"
 LYRICS_DIR = "lyrics"
+CACHE_DIR = ".cache"
+
+# Cache settings
+ANALYSIS_CACHE_FILE = "analysis.json"
+LYRIC_INDEX_FILE = "lyric_index.json"  # Parsed lines of every lyrics file, for full-text search
+
+# Library warm-up (main.py --warm)
+WARM_WORKERS = None  # Worker processes; None uses every CPU
+WARM_MAX_MEMORY_MB = 2048  # Estimated decoded audio allowed in flight across the workers
+TRANSCODE_CACHE_DIR = "transcodes"  # Under CACHE_DIR; playable copies of M4A/AAC/WMA/OPUS/AIFF/AU files
+TRANSCODE_FORMAT = "ogg"  # "ogg" (Vorbis, compact) or "flac" (lossless)
+TRANSCODE_CACHE_MAX_MB = 1024  # Least recently played transcodes are deleted above this; 0 disables
+
+# Analysis frames for external visualizers (see analysis_publisher)
+ANALYSIS_PUBLISH = False  # Write every band frame, position and lyric line to shared memory
+ANALYSIS_SHM_NAME = "player_cli_analysis"  # Readers attach to this shared memory block
+ANALYSIS_SHM_SLOTS = 64  # Frames kept in the ring buffer (6.4 s at the default interval)
+ANALYSIS_SOCKET_PATH = None  # Unix socket announcing each new frame, e.g. "/tmp/player_cli_analysis.sock"
+
+# Loudness normalization
+LOUDNESS_NORMALIZATION = True
+LOUDNESS_TARGET_LUFS = -18.0  # ReplayGain 2.0 reference level
+
+# Live library watching
+WATCH_LIBRARY = True
+WATCH_DEBOUNCE_SECONDS = 0.5  # Apply changes once the folders have been quiet this long
+WATCH_MAX_DELAY_SECONDS = 5.0  # ...but never hold a change back longer than this
+WATCH_POLL_INTERVAL = 2.0  # Used where inotify is not available
 
 # Colors
 LYRIC_COLORS = ["bright_cyan", "bright_magenta", "bright_yellow", "bright_green", "bright_blue", "bright_red"]
\ No newline at end of file
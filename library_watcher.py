@@ -0,0 +1,300 @@
+"""Live library watcher that keeps the playlist in sync with the songs and lyrics folders"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from config import (SONGS_DIR, LYRICS_DIR, WATCH_DEBOUNCE_SECONDS, WATCH_MAX_DELAY_SECONDS,
+                    WATCH_POLL_INTERVAL)
+from utils import SUPPORTED_FORMATS, iter_files, index_lyrics_files, find_lyrics_for_song, relative_stem
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# Change kinds reported by the event sources
+ADDED = "added"
+REMOVED = "removed"
+REMOVED_TREE = "removed_tree"
+RESCAN = "rescan"
+
+
+class InotifySource:
+    """Reports file changes below the given roots using Linux inotify.
+
+    Files are reported when they are closed after writing or moved in, so a
+    song being copied is not picked up half-written.
+    """
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}  # watch descriptor -> directory
+        for root in roots:
+            self._watch_tree(root)
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith('linux')
+
+    def _watch(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def _watch_tree(self, root, report_files=False):
+        """Watch a directory and its subfolders; optionally report the files already inside"""
+        changes = []
+        self._watch(root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in dirnames:
+                self._watch(os.path.join(dirpath, name))
+            if report_files:
+                changes.extend((ADDED, os.path.join(dirpath, name)) for name in filenames)
+        return changes
+
+    def _unwatch_tree(self, root):
+        prefix = os.path.join(root, "")
+        for wd, directory in list(self._dirs.items()):
+            if directory == root or directory.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def read_changes(self, timeout):
+        """Wait up to `timeout` seconds and return the (kind, path) changes that arrived"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changes = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.append((RESCAN, None))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changes.extend(self._watch_tree(path, report_files=True))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._unwatch_tree(path)
+                    changes.append((REMOVED_TREE, path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changes.append((ADDED, path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                changes.append((REMOVED, path))
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Fallback source that diffs periodic os.scandir snapshots of the roots"""
+
+    def __init__(self, roots, interval=WATCH_POLL_INTERVAL):
+        self._roots = roots
+        self._interval = interval
+        self._next_poll = time.monotonic() + interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root in self._roots:
+            for entry in iter_files(root, SUPPORTED_FORMATS + ('.lrc',)):
+                stat = entry.stat()  # Cached by os.scandir on most platforms
+                snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def read_changes(self, timeout):
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self._next_poll = time.monotonic() + self._interval
+
+        snapshot = self._scan()
+        changes = [(REMOVED, path) for path in self._snapshot.keys() - snapshot.keys()]
+        changes.extend((ADDED, path) for path, signature in snapshot.items()
+                       if self._snapshot.get(path) != signature)
+        self._snapshot = snapshot
+        return changes
+
+    def close(self):
+        pass
+
+
+class LibraryWatcher:
+    """Applies songs/ and lyrics/ changes to a Playlist while the player runs.
+
+    Events are collected and applied in one batch once the folders have been
+    quiet for `debounce` seconds (or `max_delay` after the first event), so a
+    bulk copy lands as a single update. Uses inotify on Linux and falls back
+    to polling elsewhere.
+    """
+
+    def __init__(self, playlist, on_change=None, auto_extract=True,
+                 debounce=WATCH_DEBOUNCE_SECONDS, max_delay=WATCH_MAX_DELAY_SECONDS):
+        self.playlist = playlist
+        self.on_change = on_change
+        self.auto_extract = auto_extract
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lyrics_by_name = {}
+        self._songs_without_lyrics = set()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, wait_for=None):
+        """Start watching in a daemon thread, optionally once `wait_for` is set"""
+        self._thread = threading.Thread(target=self._run, args=(wait_for,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    def _create_source(self, roots):
+        if InotifySource.available():
+            try:
+                return InotifySource(roots)
+            except OSError as e:
+                print(f"inotify no disponible, usando sondeo: {e}")
+        return PollingSource(roots)
+
+    def _run(self, wait_for):
+        if wait_for is not None:
+            wait_for.wait()
+        if self._stop_event.is_set():
+            return
+
+        roots = [root for root in (SONGS_DIR, LYRICS_DIR) if os.path.isdir(root)]
+        source = self._create_source(roots)
+        self._lyrics_by_name = index_lyrics_files()
+
+        pending = {}  # path -> last change kind; later events win (e.g. delete then re-copy)
+        first_event = last_event = 0.0
+        try:
+            while not self._stop_event.is_set():
+                timeout = self.debounce if pending else 0.5
+                for kind, path in source.read_changes(timeout):
+                    if kind == RESCAN:
+                        pending.clear()
+                        self._resync()
+                        continue
+                    now = time.monotonic()
+                    if not pending:
+                        first_event = now
+                    last_event = now
+                    pending[path] = kind
+
+                now = time.monotonic()
+                if pending and (now - last_event >= self.debounce or now - first_event >= self.max_delay):
+                    changes, pending = pending, {}
+                    self._apply(changes)
+        finally:
+            source.close()
+
+    def _index_lyrics(self, lyrics_path):
+        self._lyrics_by_name.setdefault(relative_stem(lyrics_path, LYRICS_DIR), lyrics_path)
+        self._lyrics_by_name.setdefault(os.path.splitext(os.path.basename(lyrics_path))[0], lyrics_path)
+
+    def _unindex_lyrics(self, is_gone):
+        for name, path in list(self._lyrics_by_name.items()):
+            if is_gone(path):
+                del self._lyrics_by_name[name]
+
+    def _add_song(self, song_path):
+        if song_path in self.playlist or not os.path.isfile(song_path):
+            return False
+        lyrics_path = find_lyrics_for_song(song_path, self._lyrics_by_name, self.auto_extract)
+        if not lyrics_path:
+            self._songs_without_lyrics.add(song_path)
+            return False
+        self._songs_without_lyrics.discard(song_path)
+        self.playlist.add_song(song_path, lyrics_path)
+        return True
+
+    def _remove_songs(self, is_gone):
+        removed = 0
+        for song_path in self.playlist.get_song_paths():
+            if is_gone(song_path) and self.playlist.remove_song_by_path(song_path):
+                removed += 1
+        self._songs_without_lyrics = {p for p in self._songs_without_lyrics if not is_gone(p)}
+        return removed
+
+    def _apply(self, changes):
+        """Apply one debounced batch of changes: removals first, then additions"""
+        removed_paths = {path for path, kind in changes.items() if kind == REMOVED}
+        removed_trees = [os.path.join(path, "") for path, kind in changes.items() if kind == REMOVED_TREE]
+        added_paths = [path for path, kind in changes.items() if kind == ADDED]
+
+        def is_gone(path):
+            return path in removed_paths or any(path.startswith(tree) for tree in removed_trees)
+
+        removed = 0
+        orphaned = set()  # Songs still on disk whose lyrics disappeared
+        if removed_paths or removed_trees:
+            gone_lyrics = {p for p in self._lyrics_by_name.values() if is_gone(p)}
+            self._unindex_lyrics(is_gone)
+            orphaned = {song for song in self.playlist.get_song_paths()
+                        if not is_gone(song) and self.playlist.get_lyrics_path(song) in gone_lyrics}
+            # Songs lose their entry when either the audio or its lyrics disappear
+            removed = self._remove_songs(lambda song: is_gone(song) or song in orphaned)
+            # Keep the orphans around so lyrics added later bring them back
+            self._songs_without_lyrics.update(orphaned)
+
+        added = 0
+        new_lyrics = [p for p in added_paths if p.lower().endswith('.lrc')]
+        for lyrics_path in new_lyrics:
+            self._index_lyrics(lyrics_path)
+        if new_lyrics:
+            for song_path in list(self._songs_without_lyrics):
+                added += self._add_song(song_path)
+        for song_path in added_paths:
+            if song_path.lower().endswith(SUPPORTED_FORMATS):
+                added += self._add_song(song_path)
+
+        if self.on_change and (added or removed):
+            self.on_change(added, removed)
+
+    def _resync(self):
+        """Event queue overflowed: diff the folders against the playlist once"""
+        self._lyrics_by_name = index_lyrics_files()
+        on_disk = {entry.path for entry in iter_files(SONGS_DIR, SUPPORTED_FORMATS)}
+        removed = self._remove_songs(lambda song: song not in on_disk)
+        added = sum(self._add_song(song_path) for song_path in on_disk if song_path not in self.playlist)
+        if self.on_change and (added or removed):
+            self.on_change(added, removed)
@@ -0,0 +1,167 @@
+"""Integrated loudness analysis (EBU R128 / ReplayGain 2.0 style) for volume normalization"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from audio_processor import decode_audio
+from config import LOUDNESS_TARGET_LUFS
+
+# ITU-R BS.1770 K-weighting filters (high shelf + RLB high-pass), specified at 48 kHz
+K_FILTER_RATE = 48000
+K_SHELF = ([1.53512485958697, -2.69169618940638, 1.19839281085285],
+           [1.0, -1.69065929318241, 0.73248077421585])
+K_HIGHPASS = ([1.0, -2.0, 1.0],
+              [1.0, -1.99004745483398, 0.99007225036621])
+
+STEP_SECONDS = 0.1  # Gating blocks overlap by 75%, so they are built from 100 ms segments
+SEGMENTS_PER_BLOCK = 4  # 400 ms gating block
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+SEGMENTS_PER_BATCH = 600  # One minute of audio per batched FFT keeps memory bounded
+
+_MISSING = object()
+
+
+def _biquad_power_response(coeffs, freqs):
+    """Squared magnitude response of a biquad at the given frequencies"""
+    b, a = coeffs
+    z = np.exp(-2j * np.pi * np.minimum(freqs, K_FILTER_RATE / 2) / K_FILTER_RATE)
+    numerator = b[0] + b[1] * z + b[2] * z ** 2
+    denominator = a[0] + a[1] * z + a[2] * z ** 2
+    return np.abs(numerator / denominator) ** 2
+
+
+def k_weighting(freqs):
+    """Power gain of the K-weighting curve at the given frequencies"""
+    return _biquad_power_response(K_SHELF, freqs) * _biquad_power_response(K_HIGHPASS, freqs)
+
+
+def segment_powers(samples, sample_rate):
+    """Mean-square K-weighted power of each 100 ms segment, per channel.
+
+    The weighting is applied in the frequency domain so a whole batch of
+    segments is filtered with a single rfft instead of a per-sample IIR loop.
+    """
+    segment_length = int(sample_rate * STEP_SECONDS)
+    num_segments = len(samples) // segment_length if segment_length else 0
+    if num_segments == 0:
+        return np.zeros((0, samples.shape[1]))
+
+    segments = samples[:num_segments * segment_length].reshape(num_segments, segment_length, -1)
+    weights = k_weighting(np.fft.rfftfreq(segment_length, 1.0 / sample_rate))
+    # One-sided spectrum: every bin except DC and Nyquist stands for two (Parseval)
+    weights[1:(segment_length + 1) // 2] *= 2
+    weights /= segment_length ** 2
+
+    powers = np.empty((num_segments, segments.shape[2]))
+    for start in range(0, num_segments, SEGMENTS_PER_BATCH):
+        spectrum = np.fft.rfft(segments[start:start + SEGMENTS_PER_BATCH], axis=1)
+        energy = spectrum.real ** 2 + spectrum.imag ** 2
+        powers[start:start + len(spectrum)] = np.einsum('f,sfc->sc', weights, energy)
+    return powers
+
+
+def integrated_loudness(samples, sample_rate):
+    """Gated integrated loudness in LUFS, or None for silent/too-short audio"""
+    powers = segment_powers(samples, sample_rate)
+    if len(powers) < SEGMENTS_PER_BLOCK:
+        return None
+
+    windows = np.lib.stride_tricks.sliding_window_view(powers.sum(axis=1), SEGMENTS_PER_BLOCK)
+    block_power = windows.mean(axis=1)
+    with np.errstate(divide='ignore'):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+
+    gated = block_power[block_loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return None
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = block_power[block_loudness > max(ABSOLUTE_GATE_LUFS, relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def normalization_gain(loudness_lufs, target_lufs=LOUDNESS_TARGET_LUFS):
+    """Linear gain that brings a track from its loudness to the target level"""
+    if loudness_lufs is None:
+        return 1.0
+    return 10 ** ((target_lufs - loudness_lufs) / 20.0)
+
+
+def analyze_file(song_path):
+    """Decode a file and measure its loudness (runs inside worker processes)"""
+    samples, sample_rate = decode_audio(song_path)
+    return integrated_loudness(samples, sample_rate)
+
+
+def get_track_gain(cache, song_path, samples=None, sample_rate=None):
+    """Get the normalization gain for a track, measuring and caching it if needed.
+
+    If the track is not cached yet, the already decoded samples are used when
+    given so the file does not have to be decoded a second time.
+    """
+    loudness_lufs = cache.get(song_path, 'loudness_lufs', _MISSING)
+    if loudness_lufs is _MISSING:
+        if samples is None:
+            samples, sample_rate = decode_audio(song_path)
+        loudness_lufs = integrated_loudness(samples, sample_rate)
+        cache.update(song_path, loudness_lufs=loudness_lufs)
+    return normalization_gain(loudness_lufs)
+
+
+def analyze_library_loudness(song_paths, cache, max_workers=None, stop_event=None):
+    """Measure every uncached track in parallel worker processes.
+
+    Only a couple of jobs per worker are kept in flight so the batch can be
+    interrupted quickly through `stop_event`. Returns the number of tracks analysed.
+    """
+    pending = [path for path in song_paths if cache.get(path, 'loudness_lufs', _MISSING) is _MISSING]
+    if not pending:
+        return 0
+
+    max_workers = max_workers or os.cpu_count() or 1
+    analysed = 0
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        queue = iter(pending)
+        while True:
+            while len(in_flight) < max_workers * 2 and not (stop_event and stop_event.is_set()):
+                path = next(queue, None)
+                if path is None:
+                    break
+                in_flight[executor.submit(analyze_file, path)] = path
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                try:
+                    cache.update(path, save=False, loudness_lufs=future.result())
+                    analysed += 1
+                except Exception as e:
+                    print(f"No se pudo analizar el volumen de {os.path.basename(path)}: {e}")
+            if analysed and analysed % 50 == 0:
+                cache.save()
+
+    cache.save()
+    return analysed
+
+
+def start_background_loudness_analysis(song_paths, cache, max_workers=None, wait_for=None):
+    """Run the library loudness batch in a daemon thread; returns its stop event.
+
+    With `wait_for` (e.g. the library scan's done event) the batch starts
+    once it is set, and `song_paths` is only read at that point.
+    """
+    stop_event = threading.Event()
+
+    def run():
+        if wait_for is not None:
+            wait_for.wait()
+        analyze_library_loudness(list(song_paths), cache, max_workers, stop_event)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return stop_event
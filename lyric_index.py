@@ -0,0 +1,200 @@
+"""Persistent full-text index over the lines of every lyrics file"""
+
+import bisect
+import json
+import os
+import re
+import tempfile
+import threading
+from config import LYRICS_DIR, CACHE_DIR, LYRIC_INDEX_FILE
+from song_index import fold_text
+from utils import iter_files
+
+TIME_TAG = re.compile(r'\[(\d+):(\d+(?:[.:]\d+)?)\]')
+META_TAG = re.compile(r'^\[[a-zA-Z]+:.*\]$')  # [ar:...], [ti:...], [offset:...]
+TOKEN = re.compile(r'\w+')
+LINE_BITS = 20  # Postings are stored as file id << LINE_BITS | line number
+
+
+def tokenize(text):
+    """Folded words of a text: 'Corazón, mío' -> ['corazon', 'mio']"""
+    return TOKEN.findall(fold_text(text))
+
+
+def parse_lyric_lines(text):
+    """(seconds or None, text) for every lyric line of an LRC (or plain-text) file"""
+    lines = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        if not raw or META_TAG.match(raw):
+            continue
+        tags = TIME_TAG.findall(raw)
+        words = TIME_TAG.sub('', raw).strip()
+        if not words:
+            continue
+        if not tags:
+            lines.append((None, words))  # Not aligned yet: no timestamp to jump to
+        for minutes, seconds in tags:  # '[00:12.00][01:30.00]chorus' repeats the line
+            lines.append((int(minutes) * 60 + float(seconds.replace(':', '.')), words))
+    lines.sort(key=lambda line: -1.0 if line[0] is None else line[0])
+    return lines
+
+
+class LyricIndex:
+    """Inverted index from folded words to (lyrics file, line) postings.
+
+    Each file's parsed lines and signature are stored in a JSON cache with
+    the postings (word -> packed (file, line) ids), so loading tokenizes
+    nothing and refresh() only re-reads and re-tokenizes files that were
+    added or changed since the last run. In memory the postings are
+    word -> {lyrics path: [line numbers]}. A phrase search intersects the
+    postings of its words (the last word as a prefix, so results follow
+    typing) and confirms the words appear in order on the line.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, LYRIC_INDEX_FILE)
+        self._files = {}  # lyrics path -> {'signature': [...], 'lines': [[seconds, text], ...]}
+        self._postings = {}
+        self._words = []  # Sorted vocabulary, for prefix lookups
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._files)
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            paths = [path for path, _, _ in data['files']]
+            for path, signature, lines in data['files']:
+                self._files[path] = {'signature': signature, 'lines': lines}
+            mask = (1 << LINE_BITS) - 1
+            for token, packed in data['postings'].items():
+                by_file = self._postings[token] = {}
+                for posting in packed:
+                    by_file.setdefault(paths[posting >> LINE_BITS], []).append(posting & mask)
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            # Missing, damaged or older cache: refresh() indexes everything again
+            self._files, self._postings = {}, {}
+        self._words = sorted(self._postings)
+
+    def _add_postings(self, path, entry):
+        self._files[path] = entry
+        for line_no, (_, text) in enumerate(entry['lines']):
+            for token in tokenize(text):
+                lines = self._postings.setdefault(token, {}).setdefault(path, [])
+                if not lines or lines[-1] != line_no:
+                    lines.append(line_no)
+
+    def _remove_postings(self, path):
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for token in {t for _, text in entry['lines'] for t in tokenize(text)}:
+            by_file = self._postings.get(token)
+            if by_file is not None:
+                by_file.pop(path, None)
+                if not by_file:
+                    del self._postings[token]
+
+    def refresh(self, root=LYRICS_DIR):
+        """Index new and changed lyrics files below `root`, forget deleted ones"""
+        with self._lock:
+            seen = set()
+            changed = False
+            for entry in iter_files(root, ('.lrc',)):
+                path = os.path.abspath(entry.path)
+                seen.add(path)
+                stat = entry.stat()
+                signature = [stat.st_size, stat.st_mtime_ns]
+                known = self._files.get(path)
+                if known is not None and known['signature'] == signature:
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+                        lines = parse_lyric_lines(f.read())
+                except OSError:
+                    continue
+                self._remove_postings(path)
+                self._add_postings(path, {'signature': signature, 'lines': [list(line) for line in lines]})
+                changed = True
+            for path in [p for p in self._files if p not in seen]:
+                self._remove_postings(path)
+                changed = True
+            if changed:
+                self._words = sorted(self._postings)
+                self._dirty = True
+        self.save()
+
+    def _prefix_postings(self, prefix):
+        """Merged postings of every word starting with `prefix`"""
+        merged = {}
+        start = bisect.bisect_left(self._words, prefix)
+        for word in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            for path, lines in self._postings[word].items():
+                merged.setdefault(path, set()).update(lines)
+        return merged
+
+    def search(self, phrase, limit=50):
+        """Lines containing the phrase: list of (lyrics path, seconds or None, text)"""
+        words = tokenize(phrase)
+        if not words:
+            return []
+        with self._lock:
+            # Complete words first (usually the rarest), the last one as a prefix
+            postings = [{path: set(lines) for path, lines in self._postings.get(word, {}).items()}
+                        for word in words[:-1]]
+            postings.append(self._prefix_postings(words[-1]))
+            postings.sort(key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                candidates = {path: lines & posting[path] for path, lines in candidates.items() if path in posting}
+                candidates = {path: lines for path, lines in candidates.items() if lines}
+
+            results = []
+            for path in sorted(candidates):
+                for line_no in sorted(candidates[path]):
+                    seconds, text = self._files[path]['lines'][line_no]
+                    if self._phrase_at(tokenize(text), words):
+                        results.append((path, seconds, text))
+                        if len(results) >= limit:
+                            return results
+            return results
+
+    @staticmethod
+    def _phrase_at(tokens, words):
+        """True if `words` appear consecutively in `tokens` (the last one as a prefix)"""
+        n = len(words)
+        for i in range(len(tokens) - n + 1):
+            if tokens[i:i + n - 1] == words[:-1] and tokens[i + n - 1].startswith(words[-1]):
+                return True
+        return False
+
+    def save(self):
+        """Write the parsed lines and the postings to disk atomically"""
+        with self._lock:
+            if not self._dirty:
+                return
+            file_ids = {path: i for i, path in enumerate(self._files)}
+            data = {
+                'files': [[path, entry['signature'], entry['lines']] for path, entry in self._files.items()],
+                'postings': {token: [file_ids[path] << LINE_BITS | line_no
+                                     for path, lines in by_file.items() for line_no in lines]
+                             for token, by_file in self._postings.items()},
+            }
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_path)
+                self._dirty = False
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
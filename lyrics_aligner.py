@@ -0,0 +1,206 @@
+"""Automatic alignment of plain-text lyrics to audio using vocal-band energy"""
+
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from audio_processor import decode_audio
+
+FRAME_SECONDS = 0.05  # Analysis frame (and hop) length
+FRAMES_PER_BATCH = 2000  # Frames per batched FFT, keeps memory bounded on long tracks
+VOCAL_BAND = (300.0, 3400.0)  # Hz, where most sung/spoken energy lives
+SMOOTHING_SECONDS = 0.3
+MIN_GAP_SECONDS = 0.6  # Shorter silences are treated as breaths inside a phrase
+MIN_REGION_SECONDS = 0.5
+ONSET_SNAP_SECONDS = 0.35
+MIN_LINE_SPACING = 0.1
+
+TIMESTAMP_PATTERN = re.compile(r"\[\d{1,3}:\d{2}(?:[.:]\d{1,3})?\]")
+
+
+def has_timestamps(lrc_content):
+    """Check whether lyric text already contains LRC time tags"""
+    return TIMESTAMP_PATTERN.search(lrc_content) is not None
+
+
+def is_plain_lyrics(lrc_content):
+    """Plain lyrics are non-empty text without any LRC time tags"""
+    return bool(lrc_content.strip()) and not has_timestamps(lrc_content)
+
+
+def vocal_activity(samples, sample_rate):
+    """Per-frame vocal-band energy (dB) and onset strength.
+
+    All frames are windowed and transformed together with a batched rfft,
+    so the cost is a handful of NumPy calls per minute of audio.
+    """
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    frame_length = max(1, int(sample_rate * FRAME_SECONDS))
+    num_frames = len(mono) // frame_length
+    if num_frames == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+
+    frames = mono[:num_frames * frame_length].reshape(num_frames, frame_length)
+    window = np.hanning(frame_length)
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    in_band = (freqs >= VOCAL_BAND[0]) & (freqs <= VOCAL_BAND[1])
+
+    vocal_energy = np.empty(num_frames)
+    for start in range(0, num_frames, FRAMES_PER_BATCH):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + FRAMES_PER_BATCH] * window, axis=1)) ** 2
+        vocal_energy[start:start + len(spectrum)] = spectrum[:, in_band].sum(axis=1)
+
+    energy_db = 10 * np.log10(vocal_energy + 1e-10)
+    smoothing = max(1, int(SMOOTHING_SECONDS / FRAME_SECONDS))
+    smoothed_db = np.convolve(energy_db, np.ones(smoothing) / smoothing, mode='same')
+    onsets = np.maximum(np.diff(energy_db, prepend=energy_db[0]), 0.0)
+    times = np.arange(num_frames) * FRAME_SECONDS
+    return times, smoothed_db, onsets
+
+
+def find_vocal_regions(times, energy_db):
+    """Segment the track into (start, end) regions with vocal-band activity"""
+    if len(energy_db) == 0:
+        return []
+    floor, peak = np.percentile(energy_db, [20, 95])
+    if peak - floor < 3.0:  # Flat energy: nothing to segment
+        return []
+    active = energy_db > floor + 0.35 * (peak - floor)
+
+    # Run boundaries of the boolean activity mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    starts, ends = times[np.minimum(edges[0::2], len(times) - 1)], times[edges[1::2] - 1] + FRAME_SECONDS
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < MIN_GAP_SECONDS:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(float(s), float(e)) for s, e in regions if e - s >= MIN_REGION_SECONDS]
+
+
+def align_lines(lines, regions, onset_times=None, duration=0.0):
+    """Distribute lyric lines over the vocal regions, weighted by line length"""
+    if not lines:
+        return []
+    if not regions:
+        # No vocal activity detected: spread lines evenly over the track body
+        duration = duration or len(lines) * 5.0
+        regions = [(duration * 0.05, duration * 0.95)]
+
+    region_starts = np.array([s for s, _ in regions])
+    region_lengths = np.array([e - s for s, e in regions])
+    cumulative = np.concatenate(([0.0], np.cumsum(region_lengths)))
+
+    weights = np.array([max(len(line), 4) for line in lines], dtype=float)
+    offsets = np.concatenate(([0.0], np.cumsum(weights)[:-1])) / weights.sum() * cumulative[-1]
+
+    # Map offsets on the concatenated vocal timeline back to absolute track times
+    region_idx = np.clip(np.searchsorted(cumulative, offsets, side='right') - 1, 0, len(regions) - 1)
+    starts = region_starts[region_idx] + (offsets - cumulative[region_idx])
+
+    if onset_times is not None and len(onset_times):
+        nearest = np.clip(np.searchsorted(onset_times, starts), 1, len(onset_times) - 1)
+        candidates = np.stack((onset_times[nearest - 1], onset_times[nearest]))
+        best = candidates[np.argmin(np.abs(candidates - starts), axis=0), np.arange(len(starts))]
+        starts = np.where(np.abs(best - starts) <= ONSET_SNAP_SECONDS, best, starts)
+
+    aligned = []
+    for start in starts:
+        if aligned:
+            start = max(start, aligned[-1] + MIN_LINE_SPACING)
+        aligned.append(float(start))
+    return aligned
+
+
+def format_timed_lrc(lines, start_times):
+    """Build LRC text from lines and their start times in seconds"""
+    lrc_lines = []
+    for line, start in zip(lines, start_times):
+        # Round to centiseconds first, so 59.996 s becomes [01:00.00], not [00:60.00]
+        minutes, centiseconds = divmod(round(start * 100), 6000)
+        seconds, centiseconds = divmod(centiseconds, 100)
+        lrc_lines.append(f"[{minutes:02d}:{seconds:02d}.{centiseconds:02d}]{line}\n")
+    return ''.join(lrc_lines)
+
+
+def align_plain_lyrics(plain_text, samples, sample_rate):
+    """Align plain lyric text to decoded samples and return LRC content"""
+    lines = [line.strip() for line in plain_text.split('\n') if line.strip()]
+    times, energy_db, onsets = vocal_activity(samples, sample_rate)
+    regions = find_vocal_regions(times, energy_db)
+
+    onset_times = None
+    if len(onsets) and onsets.max() > 0:
+        strong = onsets > np.percentile(onsets[onsets > 0], 75)
+        onset_times = times[strong]
+
+    duration = len(samples) / float(sample_rate) if sample_rate else 0.0
+    return format_timed_lrc(lines, align_lines(lines, regions, onset_times, duration))
+
+
+def align_lyrics_file(song_path, lrc_path, samples=None, sample_rate=None):
+    """Rewrite a plain-text lyrics file as a timed LRC; returns True if written"""
+    with open(lrc_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if not is_plain_lyrics(content):
+        return False
+    if samples is None:
+        samples, sample_rate = decode_audio(song_path)
+    lrc_content = align_plain_lyrics(content, samples, sample_rate)
+    # Write next to the file and swap it in, so a crash never leaves half an LRC
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(lrc_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(lrc_content)
+        shutil.copymode(lrc_path, tmp_path)  # mkstemp creates the file private to the user
+        os.replace(tmp_path, lrc_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def needs_alignment(lrc_path):
+    """Check if a lyrics file exists and only holds plain, untimed text"""
+    try:
+        with open(lrc_path, 'r', encoding='utf-8') as f:
+            return is_plain_lyrics(f.read())
+    except OSError:
+        return False
+
+
+def align_library(song_pairs, max_workers=None):
+    """Align every plain-text lyrics file of the library in parallel worker processes"""
+    pending = [(song, lrc) for song, lrc in song_pairs if needs_alignment(lrc)]
+    if not pending:
+        return 0
+
+    aligned = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(align_lyrics_file, song, lrc): song for song, lrc in pending}
+        for future in as_completed(futures):
+            song = futures[future]
+            try:
+                if future.result():
+                    aligned += 1
+                    print(f"Letras alineadas: {os.path.basename(song)}")
+            except Exception as e:
+                print(f"No se pudieron alinear las letras de {os.path.basename(song)}: {e}")
+    return aligned
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils import get_available_songs
+
+    parser = argparse.ArgumentParser(description="Align plain-text lyrics of the whole library to the audio")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    count = align_library(get_available_songs(), max_workers=args.workers)
+    print(f"Alineación completada. {count} archivos de letras actualizados.")
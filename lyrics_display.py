@@ -1,8 +1,11 @@
 import random
+import sys
 import time
 import threading
 import math
 import colorsys # Import colorsys
+from typing import NamedTuple
+import numpy as np
 from rich.console import Console
 from rich.live import Live
 from rich.text import Text
@@ -10,82 +13,193 @@ from rich.align import Align
 from rich.layout import Layout
 from rich.color import Color
 from rich.progress import Progress, BarColumn, TextColumn
-from config import DEFAULT_EQ_BANDS, CONSOLE_REFRESH_RATE
+from config import (DEFAULT_EQ_BANDS, CONSOLE_REFRESH_RATE, LYRIC_TYPING_SPEED, LYRIC_HISTORY_LINES, DISPLAY_RENDERER,
+                    ANALYSIS_INTERVAL_MS, EQ_DECAY_RATE, EQ_ATTACK_SECONDS, EQ_RELEASE_SECONDS,
+                    EQ_PEAK_HOLD, EQ_PEAK_HOLD_SECONDS, EQ_PEAK_FALL_RATE, ALBUM_ART, ALBUM_ART_WIDTH)
 from visualizer import VisualizationModes
+from album_art import AlbumArt
+from output_budget import CountingWriter, OutputBudget, console_color_system, detect_color_depth
+from mixer_backend import SystemClock
+
+class DisplayState(NamedTuple):
+    """Everything the player feeds the display, as one immutable snapshot.
+
+    Producers never modify a published state: they build the next one with
+    _replace() and swap the reference in a single assignment, so the render
+    thread reads one consistent state per frame without taking a lock.
+    """
+    current_time: float = 0.0
+    total_time: float = 0.0
+    line_idx: int = -1
+    typing_line: tuple = None  # (text, color) of the line being typed
+    typing_started: float = 0.0  # Display clock time when that line appeared
+    completed_lyrics: tuple = ()  # (text, color) lines, oldest first
+    lyrics_version: int = 0  # Bumped whenever the lyric lines change
+    eq_frames: tuple = ()  # (timestamp, (mix, left, right) bands) analysis frames to interpolate between
+    correlation: float = 1.0  # Stereo correlation of the latest frame, -1 to +1
+    song_info: dict = None
+    volume: float = 1.0
+    volume_shown_at: float = float('-inf')  # Display clock time of the last volume change
+
 
 class LyricsDisplay:
-    def __init__(self, num_eq_bands=DEFAULT_EQ_BANDS):
-        self.console = Console(force_terminal=True)
+    def __init__(self, num_eq_bands=DEFAULT_EQ_BANDS, output=None, clock=None):
+        # Every time the display looks at, its waits and its animation thread
+        # go through `clock` (see mixer_backend), so it can run on a virtual
+        # clock: replays of recorded sessions (see session_recording) and
+        # headless runs (see simulation)
+        self.clock = clock or SystemClock()
+        self._clock = self.clock.now
+        self.recorder = None  # SessionRecorder, when the session is being recorded
+
+        # Terminal output is measured so the frame rate and color depth can
+        # adapt to what the terminal (or an SSH link) can actually absorb
+        self.output = CountingWriter(output or sys.stdout)
+        self.console = Console(force_terminal=True, file=self.output, color_system=console_color_system())
+        self.output_budget = OutputBudget(detect_color_depth(self.console), clock=self._clock)
+        self.last_refresh_time = float("-inf")
         self.active = False
         self.live = None
+        self.cell_renderer = None
         self.animation_thread = None
         self.layout = self._create_layout()
 
-        # Estado del ecualizador (controlado externamente)
+        # Shared with the producers: replaced as a whole, never modified in place.
+        # The lock only orders concurrent producers; the renderer never takes it.
+        self.state = DisplayState()
+        self._publish_lock = threading.Lock()
+
+        # Estado del ecualizador (controlado externamente). All smoothing is
+        # done on arrays and scaled by the elapsed time, so it costs the same
+        # for any band count and looks the same at any update rate. These
+        # arrays belong to the render thread. Each has three rows: the mix
+        # and the left and right channels, smoothed together.
         self.num_eq_bands = num_eq_bands
-        self.eq_bands = [0.0] * self.num_eq_bands
-        self.decayed_eq_bands = [0.0] * self.num_eq_bands # For smoother decay
-        self.smoothed_eq_bands = [0.0] * self.num_eq_bands  # For additional smoothing
-        self.decay_rate = 0.2 # How fast bars fall, tune this value
-        self.smoothing_factor = 0.3  # Smoothing factor for moving average
+        shape = (3, self.num_eq_bands)
+        self.eq_bands = np.zeros(shape, dtype=np.float32)  # Latest analysis frame
+        self.decayed_eq_bands = np.zeros(shape, dtype=np.float32)  # Jumps up, falls linearly
+        self.smoothed_eq_bands = np.zeros(shape, dtype=np.float32)  # What gets drawn
+        self.peak_eq_bands = np.zeros(shape, dtype=np.float32)
+        self._peak_times = np.zeros(shape)
+        self.correlation = 1.0  # Smoothed stereo correlation
+        self._eq_time = None
+        self.decay_rate = EQ_DECAY_RATE  # How fast bars fall, per second
+        self.attack_seconds = EQ_ATTACK_SECONDS  # Smoothing time constant while rising...
+        self.release_seconds = EQ_RELEASE_SECONDS  # ...and while falling
+        self.peak_hold = EQ_PEAK_HOLD
         self.hue_offset = 0.0 # For dynamic color cycling
-        self.eq_lock = threading.Lock()
         
         # Visualization modes
         self.visualizer = VisualizationModes(num_bands=self.num_eq_bands)
+        self.visualizer.set_color_depth(self.output_budget.color_depth)
 
-        # Estado de las letras
-        self.current_line_idx = -1
-        self.completed_lyrics = []
-        self.typing_line = None
-        self.typing_progress = 0
-        self.last_char_time = 0
+        # Portada: rendered once per track and size, then replayed every frame
+        self.album_art = AlbumArt()
+        self.album_art.set_color_depth(self.output_budget.color_depth)
+        self.layout["art"].update(self.album_art)
+
+        # Estado de las letras. Rendered lyrics are kept between frames: the
+        # completed lines are rebuilt only when the lyrics version changes,
+        # the typing line only grows
+        self._lyrics_version_shown = None
+        self._lyric_renderable = Text(justify="center")
+        self._rendered_chars = 0
         self.lyric_colors = ["bright_cyan", "bright_magenta", "bright_yellow", "bright_green", "bright_blue", "bright_red"]
         
-        # Estado de la barra de progreso
-        self.current_time = 0
-        self.total_time = 0
-        self.progress_text = Text("00:00 / 00:00", justify="center")
-        
         # Estado del volumen
-        self.current_volume = 1.0
-        self.show_volume_bar = False
-        self.volume_bar_start_time = 0
         self.volume_bar_duration = 2.0  # Show volume bar for 2 seconds
+        self._volume_bar_visible = False
         
         # Estado de información de la canción
-        self.current_song_info = {}
         self.show_song_info = True
 
     def _create_layout(self):
         layout = Layout()
         layout.split(Layout(name="header", size=3), Layout(name="middle", ratio=1), Layout(name="progress", size=3), Layout(name="controls", size=5))
         layout["header"].split_row(Layout(name="eq"))
-        layout["middle"].split_column(Layout(name="lyrics"))
+        layout["middle"].split_row(Layout(name="art", size=ALBUM_ART_WIDTH, visible=False), Layout(name="lyrics"))
         layout["progress"].split_row(Layout(name="progress_bar"))
         layout["controls"].split_column(Layout(name="volume_bar"), Layout(name="song_info"))
         return layout
 
-    def update_eq(self, bands):
-        """Método seguro para hilos para actualizar las bandas del ecualizador desde el player."""
-        with self.eq_lock:
-            for i in range(self.num_eq_bands):
-                # Apply decay
-                self.decayed_eq_bands[i] = max(self.decayed_eq_bands[i] - self.decay_rate, 0.0)
-                # Update with new value (only if new value is higher)
-                self.decayed_eq_bands[i] = max(self.decayed_eq_bands[i], bands[i])
-                
-                # Apply additional smoothing using moving average
-                self.smoothed_eq_bands[i] = (
-                    self.smoothing_factor * self.decayed_eq_bands[i] + 
-                    (1 - self.smoothing_factor) * self.smoothed_eq_bands[i]
-                )
+    def update_eq(self, bands, timestamp=None, channel_bands=None, correlation=1.0):
+        """Método seguro para hilos para actualizar las bandas del ecualizador desde el player.
+
+        `timestamp` (display clock, time.perf_counter() by default) is when
+        the frame should be on screen; frames analysed ahead of playback are
+        interpolated into as the render clock reaches them. `channel_bands`
+        ((left, right) band levels) and `correlation` feed the stereo modes;
+        without them both channels repeat `bands`.
+        """
+        frame = np.zeros((3, self.num_eq_bands), dtype=np.float32)
+        rows = [bands] + list(channel_bands if channel_bands is not None else (bands, bands))
+        for row, values in zip(frame, rows):
+            values = np.asarray(values, dtype=np.float32)[:self.num_eq_bands]
+            row[:len(values)] = values  # Missing bands read as silence
+        frame.flags.writeable = False  # Shared with the render thread from now on
+        entry = (self._clock() if timestamp is None else timestamp, frame)
+        with self._publish_lock:
+            self.state = self.state._replace(eq_frames=self.state.eq_frames[-3:] + (entry,),
+                                             correlation=correlation)
+        if self.recorder:
+            self.recorder.record_eq(frame, entry[0], correlation)
+
+    def _publish(self, **changes):
+        """Swap in a new state with the given fields changed"""
+        with self._publish_lock:
+            self.state = self.state._replace(**changes)
+
+    @staticmethod
+    def _sample_eq(frames, now):
+        """Band values at render time `now`, interpolated between analysis frames"""
+        if not frames:
+            return None
+        if now <= frames[0][0]:
+            return frames[0][1]
+        for (t0, b0), (t1, b1) in zip(frames, frames[1:]):
+            if t0 <= now < t1:
+                return b0 + (b1 - b0) * ((now - t0) / (t1 - t0))
+        return frames[-1][1]
+
+    def _render_eq(self, state, now):
+        """Advance the smoothing to render time `now` (called once per frame by the render thread)"""
+        target = self._sample_eq(state.eq_frames, now)
+        if target is None:
+            return
+        # The first frame counts as one nominal analysis interval
+        elapsed = now - self._eq_time if self._eq_time is not None else ANALYSIS_INTERVAL_MS / 1000.0
+        self._eq_time = now
+        self.eq_bands[:] = target
+        self._advance_eq(elapsed, now)
+        if self.release_seconds > 0:
+            self.correlation += (1.0 - math.exp(-elapsed / self.release_seconds)) * (state.correlation - self.correlation)
+        else:
+            self.correlation = state.correlation
+
+    def _advance_eq(self, elapsed, now):
+        """Move the smoothing state `elapsed` seconds towards the latest frame"""
+        # Envelope: follows peaks immediately, then falls at decay_rate per second
+        np.maximum(self.decayed_eq_bands - self.decay_rate * elapsed, self.eq_bands, out=self.decayed_eq_bands)
+
+        # One-pole smoothing with separate attack and release time constants
+        rising = self.decayed_eq_bands > self.smoothed_eq_bands
+        attack = 1.0 - math.exp(-elapsed / self.attack_seconds) if self.attack_seconds > 0 else 1.0
+        release = 1.0 - math.exp(-elapsed / self.release_seconds) if self.release_seconds > 0 else 1.0
+        self.smoothed_eq_bands += np.where(rising, attack, release) * (self.decayed_eq_bands - self.smoothed_eq_bands)
+
+        if self.peak_hold:
+            # Peaks stay put for EQ_PEAK_HOLD_SECONDS, then fall at EQ_PEAK_FALL_RATE per second
+            falling = (now - self._peak_times) > EQ_PEAK_HOLD_SECONDS
+            self.peak_eq_bands[falling] -= EQ_PEAK_FALL_RATE * elapsed
+            raised = self.smoothed_eq_bands >= self.peak_eq_bands
+            self.peak_eq_bands[raised] = self.smoothed_eq_bands[raised]
+            self._peak_times[raised] = now
     
     def update_progress(self, current_time, total_time):
         """Actualizar información de progreso de la reproducción"""
-        self.current_time = current_time
-        self.total_time = total_time
-        self.progress_text = Text(f"{self._format_time(current_time)} / {self._format_time(total_time)}", justify="center")
+        self._publish(current_time=current_time, total_time=total_time)
+        if self.recorder:
+            self.recorder.record_clock(current_time, total_time)
     
     def _format_time(self, seconds):
         """Format seconds to MM:SS format"""
@@ -94,13 +208,23 @@ class LyricsDisplay:
         return f"{minutes:02d}:{seconds:02d}"
     
     def set_smoothing_factor(self, factor):
-        """Adjust the smoothing factor (0.0 to 1.0)"""
+        """Adjust the smoothing factor (0.0 to 1.0): the share of the gap closed per analysis interval"""
         if 0.0 <= factor <= 1.0:
-            self.smoothing_factor = factor
+            interval = ANALYSIS_INTERVAL_MS / 1000.0
+            seconds = 0.0 if factor == 1.0 else (math.inf if factor == 0.0 else -interval / math.log(1.0 - factor))
+            self.attack_seconds = self.release_seconds = seconds
     
     def set_visualization_mode(self, mode):
-        """Set the visualization mode: 'bars', 'waveform', 'spectrum'"""
-        return self.visualizer.set_mode(mode)
+        """Set the visualization mode: 'bars', 'waveform', 'spectrum', 'waterfall', 'peaks'"""
+        changed = self.visualizer.set_mode(mode)
+        # Multi-row modes take more of the screen from the lyrics area
+        self.layout["header"].size = self.visualizer.get_height() + 2
+        if self.recorder:
+            self.recorder.record_mode(mode)
+        return changed
+
+    def get_next_visualization_mode(self):
+        return self.visualizer.next_mode()
     
     def get_visualization_mode(self):
         """Get the current visualization mode"""
@@ -108,21 +232,20 @@ class LyricsDisplay:
     
     def update_volume_display(self, volume):
         """Update the visual volume indicator"""
-        self.current_volume = volume
-        self.show_volume_bar = True
-        import time
-        self.volume_bar_start_time = time.time()
+        self._publish(volume=volume, volume_shown_at=self._clock())
+        if self.recorder:
+            self.recorder.record_volume(volume)
     
-    def _generate_volume_bar(self):
+    def _generate_volume_bar(self, volume):
         """Generate a visual volume bar"""
         from rich.text import Text
         from rich.panel import Panel
         
         # Create a volume bar
         bar_length = 30
-        filled_length = int(bar_length * self.current_volume)
+        filled_length = int(bar_length * volume)
         bar = '█' * filled_length + '░' * (bar_length - filled_length)
-        volume_percent = int(self.current_volume * 100)
+        volume_percent = int(volume * 100)
         
         volume_text = f"VOLUMEN: [{bar}] {volume_percent:3d}%"
         
@@ -137,15 +260,19 @@ class LyricsDisplay:
     
     def update_song_info(self, song_info):
         """Update the song information display"""
-        self.current_song_info = song_info
+        self._publish(song_info=song_info)
+        if self.recorder:
+            self.recorder.record_song(song_info)
+        if ALBUM_ART:
+            self.layout["art"].visible = self.album_art.set_track(song_info.get('path'))
         
-    def _generate_song_info(self):
+    def _generate_song_info(self, song_info):
         """Generate song information display"""
         from rich.text import Text
         from rich.panel import Panel
         from rich.table import Table
         
-        if not self.current_song_info:
+        if not song_info:
             return Panel(Text("Cargando información...", style="italic"), 
                         title="Información de la Canción", 
                         border_style="green")
@@ -156,17 +283,17 @@ class LyricsDisplay:
         info_table.add_column(min_width=30)
         
         # Add song information
-        info_table.add_row("Título:", self.current_song_info.get('title', 'Desconocido'))
-        info_table.add_row("Artista:", self.current_song_info.get('artist', 'Desconocido'))
-        info_table.add_row("Álbum:", self.current_song_info.get('album', 'Desconocido'))
+        info_table.add_row("Título:", song_info.get('title', 'Desconocido'))
+        info_table.add_row("Artista:", song_info.get('artist', 'Desconocido'))
+        info_table.add_row("Álbum:", song_info.get('album', 'Desconocido'))
         
         # Format duration
-        duration = self.current_song_info.get('duration', 0)
+        duration = song_info.get('duration', 0)
         duration_str = f"{int(duration//60):02d}:{int(duration%60):02d}" if duration > 0 else "Desconocido"
         info_table.add_row("Duración:", duration_str)
         
         # Add bitrate if available
-        bitrate = self.current_song_info.get('bitrate', 0)
+        bitrate = song_info.get('bitrate', 0)
         if bitrate > 0:
             info_table.add_row("Bitrate:", f"{bitrate//1000} kbps")
         
@@ -178,119 +305,149 @@ class LyricsDisplay:
         )
         return info_panel
 
-    def _generate_eq_text(self):
+    def _generate_eq_text(self, state):
         """Genera un objeto Text de Rich a partir de los datos de las bandas del ecualizador."""
         # Use the visualization modes
         width = self.console.width or 80
-        with self.eq_lock:
-            # Use the smoothed bands for visualization
-            bands_to_use = list(self.smoothed_eq_bands)
-        return self.visualizer.generate_visualization(bands_to_use, width)
+        self._render_eq(state, self._clock())
+        # Use the smoothed bands for visualization
+        peaks = self.peak_eq_bands[0] if self.peak_hold else None
+        return self.visualizer.generate_visualization(self.smoothed_eq_bands[0], width, peaks,
+                                                      self.smoothed_eq_bands[1:], self.correlation)
 
     def _animate(self):
         while self.active:
-            # Increment hue_offset for color cycling
-            self.hue_offset = (self.hue_offset + 0.01) % 1.0 # Tune this speed
-
-            start_eq_gen_time = time.perf_counter()
-            eq_text = self._generate_eq_text()
-            end_eq_gen_time = time.perf_counter()
-            # print(f"[DEBUG Lyrics] _generate_eq_text took: {(end_eq_gen_time - start_eq_gen_time)*1000:.2f} ms")
-
-            start_eq_update_time = time.perf_counter()
-            self.layout["eq"].update(Align.center(eq_text, vertical="middle"))
-            end_eq_update_time = time.perf_counter()
-            # print(f"[DEBUG Lyrics] layout[\"eq\"] update took: {(end_eq_update_time - start_eq_update_time)*1000:.2f} ms")
-
-            start_typing_logic_time = time.perf_counter()
-            if self.typing_line:
-                text, color = self.typing_line
-                if self.typing_progress < len(text) and (time.time() - self.last_char_time) > 0.05:
-                    self.typing_progress += 1
-                    self.last_char_time = time.time()
-            end_typing_logic_time = time.perf_counter()
-            # print(f"[DEBUG Lyrics] Typing logic took: {(end_typing_logic_time - start_typing_logic_time)*1000:.2f} ms")
-            
-            start_lyrics_render_time = time.perf_counter()
-            lyric_renderable = Text(justify="center")
-            for line, color in self.completed_lyrics:
-                lyric_renderable.append(f"{line}\n", style=color)
-            if self.typing_line:
-                text, color = self.typing_line
-                lyric_renderable.append(text[:self.typing_progress], style=color)
-            end_lyrics_render_time = time.perf_counter()
-            # print(f"[DEBUG Lyrics] Lyrics rendering took: {(end_lyrics_render_time - start_lyrics_render_time)*1000:.2f} ms")
-
-            start_lyrics_update_time = time.perf_counter()
-            self.layout["lyrics"].update(Align.center(lyric_renderable, vertical="top"))
-            end_lyrics_update_time = time.perf_counter()
-            # print(f"[DEBUG Lyrics] layout[\"lyrics\"] update took: {(end_lyrics_update_time - start_lyrics_update_time)*1000:.2f} ms")
-
-            # Update progress bar with animated effects
-            progress_percentage = (self.current_time / self.total_time) * 100 if self.total_time > 0 else 0
-            progress_description = f"{self._format_time(self.current_time)} / {self._format_time(self.total_time)}"
-            
-            # Create an animated progress bar with moving indicator
-            bar_length = 40  # Length of the progress bar in characters
-            filled_length = int(bar_length * progress_percentage / 100)
-            
-            # Create a moving indicator effect
-            import time as time_module
-            animation_frame = int((time_module.time() * 3) % 4)  # Moving every 1/3 second
-            moving_indicator_pos = int((time_module.time() * 5) % bar_length)  # Moving indicator
-            
-            bar = ""
-            for i in range(bar_length):
-                if i < filled_length:
-                    # Different characters for filled part to create animation effect
-                    if i == moving_indicator_pos:
-                        bar += "■"  # Moving indicator block
-                    else:
-                        bar += "█"  # Filled part
-                elif i == filled_length and progress_percentage < 100:
-                    # Animated character for the progress edge
-                    edge_chars = ["▌", "█", "▐", "█"]
-                    bar += edge_chars[animation_frame]
-                else:
-                    # Empty part with moving "pulse" effect
-                    if abs(i - moving_indicator_pos) < 3 and progress_percentage < 100:
-                        bar += "░"  # Pulsing effect near progress
-                    else:
-                        bar += "░"  # Empty part
-            
-            progress_text = f"[{bar}] {progress_percentage:.1f}% {progress_description}"
-            
-            # Create a colorful animated progress panel
-            from rich.panel import Panel
-            from rich.style import Style
-            progress_panel = Panel(
-                progress_text,
-                title="[bold blue]Progreso de la Canción[/bold blue]",
-                border_style=Style(color="bright_blue", blink=False),
-                style="bold"
-            )
-            self.layout["progress_bar"].update(Align.center(progress_panel, vertical="middle"))
-
-            # Update volume bar if needed
-            import time as time_module
-            if self.show_volume_bar:
-                current_time = time_module.time()
-                if current_time - self.volume_bar_start_time > self.volume_bar_duration:
-                    self.show_volume_bar = False
-                    # Clear the volume bar display
-                    self.layout["volume_bar"].update(Align.center(Text("")))
+            self.render_frame()
+            self.clock.sleep(min(0.05, self.output_budget.frame_interval))
+
+    def render_frame(self):
+        """Build the layout from the current state and repaint it if a frame is due"""
+        state = self.state  # One snapshot for the whole frame
+        frame_start = time.perf_counter()
+
+        # Increment hue_offset for color cycling
+        self.hue_offset = (self.hue_offset + 0.01) % 1.0 # Tune this speed
+
+        start_eq_gen_time = time.perf_counter()
+        eq_text = self._generate_eq_text(state)
+        end_eq_gen_time = time.perf_counter()
+        # print(f"[DEBUG Lyrics] _generate_eq_text took: {(end_eq_gen_time - start_eq_gen_time)*1000:.2f} ms")
+
+        start_eq_update_time = time.perf_counter()
+        self.layout["eq"].update(Align.center(eq_text, vertical="middle"))
+        end_eq_update_time = time.perf_counter()
+        # print(f"[DEBUG Lyrics] layout[\"eq\"] update took: {(end_eq_update_time - start_eq_update_time)*1000:.2f} ms")
+
+        self._update_lyrics_panel(state)
+
+        # Update progress bar with animated effects
+        progress_percentage = (state.current_time / state.total_time) * 100 if state.total_time > 0 else 0
+        progress_description = f"{self._format_time(state.current_time)} / {self._format_time(state.total_time)}"
+        
+        # Create an animated progress bar with moving indicator
+        bar_length = 40  # Length of the progress bar in characters
+        filled_length = int(bar_length * progress_percentage / 100)
+        
+        # Create a moving indicator effect
+        now = self._clock()
+        animation_frame = int((now * 3) % 4)  # Moving every 1/3 second
+        moving_indicator_pos = int((now * 5) % bar_length)  # Moving indicator
+        
+        bar = ""
+        for i in range(bar_length):
+            if i < filled_length:
+                # Different characters for filled part to create animation effect
+                if i == moving_indicator_pos:
+                    bar += "■"  # Moving indicator block
                 else:
-                    volume_bar = self._generate_volume_bar()
-                    self.layout["volume_bar"].update(Align.center(volume_bar, vertical="middle"))
+                    bar += "█"  # Filled part
+            elif i == filled_length and progress_percentage < 100:
+                # Animated character for the progress edge
+                edge_chars = ["▌", "█", "▐", "█"]
+                bar += edge_chars[animation_frame]
             else:
-                self.layout["volume_bar"].update(Align.center(Text("")))
+                # Empty part with moving "pulse" effect
+                if abs(i - moving_indicator_pos) < 3 and progress_percentage < 100:
+                    bar += "░"  # Pulsing effect near progress
+                else:
+                    bar += "░"  # Empty part
+        
+        progress_text = f"[{bar}] {progress_percentage:.1f}% {progress_description}"
+        
+        # Create a colorful animated progress panel
+        from rich.panel import Panel
+        from rich.style import Style
+        progress_panel = Panel(
+            progress_text,
+            title="[bold blue]Progreso de la Canción[/bold blue]",
+            border_style=Style(color="bright_blue", blink=False),
+            style="bold"
+        )
+        self.layout["progress_bar"].update(Align.center(progress_panel, vertical="middle"))
+
+        # Update volume bar if needed
+        if now - state.volume_shown_at <= self.volume_bar_duration:
+            volume_bar = self._generate_volume_bar(state.volume)
+            self.layout["volume_bar"].update(Align.center(volume_bar, vertical="middle"))
+            self._volume_bar_visible = True
+        elif self._volume_bar_visible:
+            # Clear the volume bar display
+            self.layout["volume_bar"].update(Align.center(Text("")))
+            self._volume_bar_visible = False
+
+        # Update song info
+        if self.show_song_info:
+            song_info_panel = self._generate_song_info(state.song_info)
+            self.layout["song_info"].update(Align.center(song_info_panel, vertical="middle"))
+
+        return self._refresh_if_due(frame_start)
+
+    def _refresh_if_due(self, frame_start):
+        """Repaint at the budgeted frame rate and feed the output measurements back.
 
-            # Update song info
-            if self.show_song_info:
-                song_info_panel = self._generate_song_info()
-                self.layout["song_info"].update(Align.center(song_info_panel, vertical="middle"))
+        Returns the bytes written, or None when no frame was due.
+        """
+        now = self._clock()
+        if not (self.live or self.cell_renderer) or now - self.last_refresh_time < self.output_budget.frame_interval:
+            return None
+        self.last_refresh_time = now
+        bytes_before, seconds_before = self.output.bytes_written, self.output.write_seconds
+        if self.cell_renderer:
+            self.cell_renderer.refresh(self.layout)
+        else:
+            self.live.refresh()
+        frame_bytes = self.output.bytes_written - bytes_before
+        if self.output_budget.record_frame(frame_bytes, self.output.write_seconds - seconds_before):
+            self.visualizer.set_color_depth(self.output_budget.color_depth)
+            self.album_art.set_color_depth(self.output_budget.color_depth)
+        if self.recorder:
+            self.recorder.record_frame(frame_bytes, time.perf_counter() - frame_start)
+        return frame_bytes
 
-            time_module.sleep(0.05)
+    def _typed_chars(self, state):
+        """Characters of the typing line revealed so far at the typing speed"""
+        text, _ = state.typing_line
+        return min(len(text), int((self._clock() - state.typing_started) / LYRIC_TYPING_SPEED))
+
+    def _update_lyrics_panel(self, state):
+        """Update the lyrics renderable incrementally; the layout is only touched on changes"""
+        changed = False
+        if state.lyrics_version != self._lyrics_version_shown:
+            self._lyric_renderable = Text(justify="center")
+            for line, color in state.completed_lyrics:
+                self._lyric_renderable.append(f"{line}\n", style=color)
+            self._rendered_chars = 0
+            self._lyrics_version_shown = state.lyrics_version
+            changed = True
+        if state.typing_line:
+            text, color = state.typing_line
+            typed = self._typed_chars(state)
+            if self._rendered_chars < typed:
+                self._lyric_renderable.append(text[self._rendered_chars:typed], style=color)
+                self._rendered_chars = typed
+                changed = True
+        if changed:
+            self.layout["lyrics"].update(Align.center(self._lyric_renderable, vertical="top"))
 
     def update_current_line(self, lyrics, current_time, player):
         current_line_idx = -1
@@ -301,31 +458,59 @@ class LyricsDisplay:
             else:
                 break
         
-        if current_line_idx != self.current_line_idx:
-            if self.typing_line:
-                full_text, color = self.typing_line
-                self.completed_lyrics.append((full_text, color))
-                if len(self.completed_lyrics) > 10:
-                    self.completed_lyrics.pop(0)
-
-            self.current_line_idx = current_line_idx
-            if 0 <= current_line_idx < len(lyrics):
-                self.typing_line = (lyrics[current_line_idx].text, random.choice(self.lyric_colors))
-                self.typing_progress = 0
-                self.last_char_time = time.time()
-
-    def start(self):
+        if current_line_idx == self.state.line_idx:
+            return
+        typing_line = None
+        if 0 <= current_line_idx < len(lyrics):
+            typing_line = (lyrics[current_line_idx].text, random.choice(self.lyric_colors))
+        self.show_line(current_line_idx, typing_line)
+
+    def show_line(self, current_line_idx, typing_line):
+        """Start typing a lyric line ((text, color), or None) and move the previous one to the history"""
+        with self._publish_lock:
+            state = self.state
+            completed = state.completed_lyrics
+            if state.typing_line:
+                # Only the last LYRIC_HISTORY_LINES lines stay on screen
+                completed = (completed + (state.typing_line,))[-LYRIC_HISTORY_LINES:]
+            self.state = state._replace(line_idx=current_line_idx, typing_line=typing_line,
+                                        typing_started=self._clock(), completed_lyrics=completed,
+                                        lyrics_version=state.lyrics_version + 1)
+        if self.recorder:
+            self.recorder.record_line(current_line_idx, typing_line)
+
+    def reset_lyrics(self):
+        """Clear the lyric history when a new song starts"""
+        with self._publish_lock:
+            self.state = self.state._replace(line_idx=-1, typing_line=None, completed_lyrics=(),
+                                             lyrics_version=self.state.lyrics_version + 1)
+        if self.recorder:
+            self.recorder.record_reset()
+
+    def start(self, animate=True):
+        """Take over the terminal; without `animate`, frames are drawn by calling render_frame()"""
         self.active = True
-        self.live = Live(self.layout, console=self.console, refresh_per_second=10)
-        self.live.start(refresh=True)
-        self.animation_thread = threading.Thread(target=self._animate)
-        self.animation_thread.daemon = True
-        self.animation_thread.start()
+        # Refreshed from _animate at the rate the output budget allows
+        if DISPLAY_RENDERER == "cells":
+            from cell_renderer import CellRenderer
+            self.cell_renderer = CellRenderer(self.console)
+            self.cell_renderer.start()
+        else:
+            self.live = Live(self.layout, console=self.console, auto_refresh=False)
+            self.live.start(refresh=True)
+        if not animate:
+            return
+        self.animation_thread = self.clock.start_thread(self._animate)
 
     def stop(self):
         self.active = False
         if self.animation_thread:
-            self.animation_thread.join()
+            self.clock.join(self.animation_thread)
+            self.animation_thread = None
         if self.live:
             self.live.stop()
+            self.live = None
+        if self.cell_renderer:
+            self.cell_renderer.stop()
+            self.cell_renderer = None
         self.console.clear()
@@ -84,7 +84,13 @@ def extract_and_sync_lyrics(mp3_path, lrc_path):
         
         # Ensure the LRC file has proper format
         if not lrc_content.strip().startswith('[') and lrc_content.strip():
-            # If not in LRC format, try to convert plain text to basic LRC
+            # If not in LRC format, align the plain text to the audio's vocal regions
+            try:
+                from lyrics_aligner import align_lyrics_file
+                align_lyrics_file(mp3_path, created_lrc)
+                return created_lrc
+            except Exception as e:
+                print(f"Could not align lyrics to audio, using basic timing: {e}")
             formatted_lrc = format_to_basic_lrc(lrc_content)
             with open(created_lrc, 'w', encoding='utf-8') as f:
                 f.write(formatted_lrc)
@@ -96,7 +102,11 @@ def extract_and_sync_lyrics(mp3_path, lrc_path):
 
 
 def format_to_basic_lrc(plain_text):
-    """Convert plain text lyrics to basic LRC format"""
+    """Convert plain text lyrics to basic LRC format.
+
+    Fallback only: `lyrics_aligner.align_plain_lyrics` places lines on the
+    actual vocal regions when the audio can be decoded.
+    """
     lines = plain_text.split('\n')
     lrc_lines = []
     
@@ -135,7 +145,8 @@ def auto_extract_lyrics_for_songs():
     """Auto-extract lyrics for all songs in the songs directory"""
     from utils import get_available_songs
     
-    songs_with_lyrics = get_available_songs()
+    # Without extraction: get_available_songs falls back to this function when it finds nothing
+    songs_with_lyrics = get_available_songs(auto_extract=False)
     new_lyrics_created = 0
     
     for song_path, lyrics_path in songs_with_lyrics:
@@ -1,14 +1,15 @@
+import startup  # First import: the startup report measures from here
 import os
 import sys
-from player import MusicPlayer
-from utils import get_available_songs
-from rich.console import Console
-from rich.table import Table
+from rich.console import Console, Group
 from rich.text import Text
 from rich import print
 from rich.panel import Panel
-from rich.layout import Layout
 from rich.align import Align
+from config import WATCH_LIBRARY
+
+# Heavier modules (player, pygame, NumPy, rich tables/live) are imported where
+# they are first used, so the menu appears before they are loaded.
 
 
 console = Console()
@@ -52,22 +53,193 @@ Controles Disponibles:
   h - Alternar modo aleatorio
   v - Alternar modo de visualización
   ? - Mostrar esta ayuda
+
+En la lista de canciones:
+  / - Buscar por título, artista o álbum
+  l - Buscar una frase en las letras y empezar en esa línea
     """
     print(help_text)
 
-def display_songs_paginated(songs_list, page_size=10):
-    """Display songs in a paginated format"""
-    total_songs = len(songs_list)
-    total_pages = (total_songs + page_size - 1) // page_size  # Ceiling division
+def _build_search_view(songs_list, query, results, selected, page_size):
+    """Build the search table for the visible page of results only"""
+    from rich.markup import escape
+    from rich.table import Table
+    start_idx = (selected // page_size) * page_size
+    table = Table(title=f"[bold green]Buscar:[/bold green] {escape(query)}█  [dim]({len(results)} resultados)[/dim]",
+                 title_style="bold magenta",
+                 border_style="cyan",
+                 header_style="bold blue")
+    table.add_column("#", style="dim", width=6)
+    table.add_column("Canción", style="cyan", min_width=40)
+    
+    for row in range(start_idx, min(start_idx + page_size, len(results))):
+        song_idx = int(results[row])
+        song_name = os.path.splitext(os.path.basename(songs_list[song_idx][0]))[0]
+        display_name = song_name[:46] + "..." if len(song_name) > 46 else song_name
+        style = "bold black on yellow" if row == selected else "bold yellow"
+        table.add_row(str(song_idx + 1), f"[{style}]{escape(display_name)}[/{style}]")
+    
+    caption = Text("Escriba para filtrar · ↑/↓ mover · Enter reproducir · Esc volver", style="dim")
+    return Align.center(Group(table, Align.center(caption)))
+
+
+def _start_song_index(songs_list, scan=None):
+    """A SongIndex fed as the scan finds songs, its gram table built in the background once the scan ends"""
+    from song_index import SongIndex
+    song_index = SongIndex()
+    if scan is None:
+        for song_path, _ in songs_list:
+            song_index.add(song_path)
+        song_index.rebuild_in_background()
+    else:
+        scan.subscribe(lambda song_path, lyrics_path: song_index.add(song_path))
+        song_index.rebuild_in_background(wait_for=scan.done)
+    return song_index
+
+
+def search_songs_interactive(songs_list, song_index, page_size=10):
+    """Incremental search: the results narrow with every key typed"""
+    from rich.live import Live
+    from utils import read_key
+    
+    query = ""
+    results = song_index.search(query)
+    selected = 0
+    
+    console.clear()
+    with Live(_build_search_view(songs_list, query, results, selected, page_size),
+              console=console, auto_refresh=False, transient=True) as live:
+        while True:
+            key = read_key()
+            if key == 'esc':
+                return None
+            elif key == 'enter':
+                return int(results[selected]) if len(results) else None
+            elif key == 'up':
+                selected = max(0, selected - 1)
+            elif key == 'down':
+                selected = max(0, min(len(results) - 1, selected + 1))
+            elif key == 'backspace':
+                query = query[:-1]
+                results, selected = song_index.search(query), 0
+            elif len(key) == 1 and key.isprintable():
+                query += key
+                results, selected = song_index.search(query), 0
+            else:
+                continue
+            live.update(_build_search_view(songs_list, query, results, selected, page_size), refresh=True)
+
+
+def _build_lyric_search_view(songs_list, query, results, selected, page_size):
+    """Build the lyric search table: matching line, its song and its time"""
+    from rich.markup import escape
+    from rich.table import Table
+    from utils import format_time
+    start_idx = (selected // page_size) * page_size
+    table = Table(title=f"[bold green]Buscar en letras:[/bold green] {escape(query)}█  [dim]({len(results)} resultados)[/dim]",
+                 title_style="bold magenta",
+                 border_style="cyan",
+                 header_style="bold blue")
+    table.add_column("Canción", style="cyan", min_width=24)
+    table.add_column("Tiempo", style="dim", width=6)
+    table.add_column("Línea", min_width=40)
+
+    for row in range(start_idx, min(start_idx + page_size, len(results))):
+        song_idx, seconds, text = results[row]
+        song_name = os.path.splitext(os.path.basename(songs_list[song_idx][0]))[0]
+        display_name = song_name[:30] + "..." if len(song_name) > 30 else song_name
+        style = "bold black on yellow" if row == selected else "bold yellow"
+        time_str = format_time(seconds) if seconds is not None else "--:--"
+        table.add_row(f"[{style}]{escape(display_name)}[/{style}]", time_str, escape(text))
+
+    caption = Text("Escriba una frase · ↑/↓ mover · Enter reproducir desde la línea · Esc volver", style="dim")
+    return Align.center(Group(table, Align.center(caption)))
+
+
+def search_lyrics_interactive(songs_list, lyric_index, page_size=10):
+    """Phrase search over every lyrics file; returns (song index, start seconds) or None"""
+    from rich.live import Live
+    from utils import read_key
+
+    song_by_lyrics = {}
+    listed = 0  # Songs already in song_by_lyrics; the scan may still be adding more
+
+    def search(query):
+        nonlocal listed
+        total = len(songs_list)
+        for i in range(listed, total):
+            song_by_lyrics[os.path.abspath(songs_list[i][1])] = i
+        listed = total
+        # Hits whose lyrics belong to no listed song (yet) are left out
+        return [(song_by_lyrics[path], seconds, text) for path, seconds, text in lyric_index.search(query)
+                if path in song_by_lyrics]
+
+    query = ""
+    results = []
+    selected = 0
+
+    console.clear()
+    with Live(_build_lyric_search_view(songs_list, query, results, selected, page_size),
+              console=console, auto_refresh=False, transient=True) as live:
+        while True:
+            key = read_key()
+            if key == 'esc':
+                return None
+            elif key == 'enter':
+                if not results:
+                    return None
+                song_idx, seconds, _ = results[selected]
+                return song_idx, seconds or 0.0
+            elif key == 'up':
+                selected = max(0, selected - 1)
+            elif key == 'down':
+                selected = max(0, min(len(results) - 1, selected + 1))
+            elif key == 'backspace':
+                query = query[:-1]
+                results, selected = search(query), 0
+            elif len(key) == 1 and key.isprintable():
+                query += key
+                results, selected = search(query), 0
+            else:
+                continue
+            live.update(_build_lyric_search_view(songs_list, query, results, selected, page_size), refresh=True)
+
+
+def _open_lyric_search(songs_list, lyric_index, page_size):
+    """Bring the lyric index up to date (only changed files are read) and search it"""
+    from lyric_index import LyricIndex
+    if lyric_index is None:
+        lyric_index = LyricIndex()
+    console.print("[dim]Indexando letras...[/dim]")
+    lyric_index.refresh()
+    return lyric_index, search_lyrics_interactive(songs_list, lyric_index, page_size)
+
+
+def display_songs_paginated(songs_list, page_size=10, scan=None):
+    """Display songs in a paginated format.
+
+    `songs_list` may still be growing while `scan` runs; the page count is
+    recomputed on every redraw and any listed song can already be played.
+    Returns (song index, start seconds), or None to quit; the start is only
+    past zero when the song was found through its lyrics.
+    """
+    from rich.table import Table
+    
     current_page = 0
+    song_index = _start_song_index(songs_list, scan)
+    lyric_index = None
     
     while True:
+        scanning = scan is not None and scan.is_scanning()
+        total_songs = len(songs_list)
+        total_pages = max(1, (total_songs + page_size - 1) // page_size)  # Ceiling division
         start_idx = current_page * page_size
         end_idx = min(start_idx + page_size, total_songs)
         page_songs = songs_list[start_idx:end_idx]
         
         # Create a colorful table for songs
-        table = Table(title=f"[bold green]Canciones disponibles (Página {current_page + 1} de {total_pages})[/bold green]", 
+        scan_status = " [dim](buscando más canciones...)[/dim]" if scanning else ""
+        table = Table(title=f"[bold green]Canciones disponibles (Página {current_page + 1} de {total_pages})[/bold green]{scan_status}", 
                      title_style="bold magenta",
                      border_style="cyan",
                      header_style="bold blue")
@@ -85,12 +257,29 @@ def display_songs_paginated(songs_list, page_size=10):
         console.print("\n")
         console.print(Align.center(table))
         
-        if total_pages > 1:
-            print(f"\n[yellow]Navegación:[/yellow] [Pág. Ant] o [A] - [Pág. Sig] o [S] - [Ir a] o [G] - [Salir] o [Q]")
-            choice = input("Seleccione canción, página (A/S/G) o salir (Q): ").strip().lower()
+        if scanning:
+            print("[dim]Pulse Enter para actualizar la lista.[/dim]")
+        
+        if total_pages > 1 or scanning:
+            print(f"\n[yellow]Navegación:[/yellow] [Pág. Ant] o [A] - [Pág. Sig] o [S] - [Ir a] o [G] - [Buscar] o [/] - [Letras] o [L] - [Salir] o [Q]")
+            choice = input("Seleccione canción, página (A/S/G), buscar (/), letras (L) o salir (Q): ").strip().lower()
             
             if choice == 'q':
                 return None
+            elif choice == '':
+                continue
+            elif choice == '/':
+                found_idx = search_songs_interactive(songs_list, song_index, page_size)
+                if found_idx is not None:
+                    console.clear()
+                    return found_idx, 0.0
+                continue
+            elif choice == 'l':
+                lyric_index, found = _open_lyric_search(songs_list, lyric_index, page_size)
+                if found is not None:
+                    console.clear()
+                    return found
+                continue
             elif choice == 'a' and current_page > 0:
                 current_page -= 1
                 continue
@@ -112,7 +301,7 @@ def display_songs_paginated(songs_list, page_size=10):
                 try:
                     choice_idx = int(choice) - 1
                     if 0 <= choice_idx < total_songs:
-                        return choice_idx
+                        return choice_idx, 0.0
                     else:
                         print(f"Opción inválida. Por favor, seleccione entre 1 y {total_songs}")
                 except ValueError:
@@ -120,32 +309,94 @@ def display_songs_paginated(songs_list, page_size=10):
         else:
             # If only one page, just get the selection
             try:
-                choice = input(f"\nSelecciona una canción (1-{total_songs}) o '?' para ayuda: ").strip()
+                choice = input(f"\nSelecciona una canción (1-{total_songs}), '/' para buscar, 'l' para buscar en letras o '?' para ayuda: ").strip()
                 if choice == '?':
                     show_help()
                     continue
+                if choice == '/':
+                    found_idx = search_songs_interactive(songs_list, song_index, page_size)
+                    if found_idx is not None:
+                        console.clear()
+                        return found_idx, 0.0
+                    continue
+                if choice.lower() == 'l':
+                    lyric_index, found = _open_lyric_search(songs_list, lyric_index, page_size)
+                    if found is not None:
+                        console.clear()
+                        return found
+                    continue
                 choice_idx = int(choice) - 1
                 if 0 <= choice_idx < total_songs:
                     console.clear()  # Clear console before starting playback
-                    return choice_idx
+                    return choice_idx, 0.0
                 else:
                     print(f"Opción inválida. Por favor, seleccione entre 1 y {total_songs}")
             except ValueError:
                 print("Entrada inválida. Por favor ingrese un número.")
 
 
+def _argument_value(flag):
+    """Value following `flag` on the command line, or None"""
+    if flag in sys.argv:
+        position = sys.argv.index(flag) + 1
+        if position < len(sys.argv):
+            return sys.argv[position]
+    return None
+
+
 def main():
-    player = MusicPlayer()
-    
+    if "--warm" in sys.argv:
+        # Offline mode: fill every cache for the whole library and exit
+        from warm import main as warm_main
+        warm_main()
+        return
+    if "--simulate" in sys.argv:
+        # Play the library headless on a virtual clock and report timing and lyric sync
+        from simulation import main as simulate_main
+        simulate_main()
+        return
+    if "--replay" in sys.argv:
+        # Replay a recorded session on the display alone, without audio
+        from session_recording import main as replay_main
+        replay_main()
+        return
+    try:
+        run()
+    finally:
+        if startup.enabled():
+            console.print(startup.format_report())
+
+
+def run():
     show_menu()
+    startup.mark("menú mostrado")
     
     # Auto-extract lyrics from MP3 files if possible
     print("Buscando y extrayendo letras embebidas en archivos MP3...")
     
-    # Obtener canciones disponibles (con auto-extracción)
-    available_songs = get_available_songs()
+    # Obtener canciones disponibles (con auto-extracción) mientras se recorre la biblioteca.
+    # This is the only library scan: the playlist is fed from it.
+    from utils import LibraryScan
+    scan = LibraryScan().start()
+    
+    from player import MusicPlayer
+    from playlist import Playlist
+    player = MusicPlayer(playlist=Playlist(songs=[]))
+    scan.subscribe(player.playlist.add_song)
+    available_songs = scan.songs
+    startup.mark_when_set(scan.done, "biblioteca escaneada")
+
+    # Measure loudness of the whole library in the background while the user
+    # picks a song, so normalization is ready before the first play (the
+    # selected track is measured when it loads if the batch has not reached it)
+    from loudness import start_background_loudness_analysis
+    loudness_songs = []
+    scan.subscribe(lambda song_path, lyrics_path: loudness_songs.append(song_path))
+    loudness_stop = start_background_loudness_analysis(loudness_songs, player.analysis_cache, wait_for=scan.done)
     
-    if not available_songs:
+    found_songs = scan.wait_for_first()
+    startup.mark("primeras canciones encontradas")
+    if not found_songs:
         print("No se encontraron canciones. Asegúrate de tener archivos de música y letras en las carpetas correspondientes.")
         print("\nInstrucciones:")
         print("- Añade archivos de música (MP3, WAV, OGG) a la carpeta 'songs'")
@@ -153,20 +404,40 @@ def main():
         print("- Ejemplo: 'ejemplo.mp3' y 'ejemplo.lrc'")
         print("- O las letras se pueden extraer automáticamente de archivos MP3 con información embebida")
         input("\nPresiona Enter para salir...")
+        loudness_stop.set()
         return
     
     # Use the new paginated song selection
-    selected_idx = display_songs_paginated(available_songs)
+    selection = display_songs_paginated(available_songs, scan=scan)
     
-    if selected_idx is None:  # User chose to quit
+    if selection is None:  # User chose to quit
+        loudness_stop.set()
         return
+    selected_idx, start_seconds = selection
+    
+    # Keep the playlist in sync with files added or removed while playing
+    watcher = None
+    if WATCH_LIBRARY:
+        from library_watcher import LibraryWatcher
+        watcher = LibraryWatcher(player.playlist).start(wait_for=scan.done)
     
+    # Record what the display receives and how long its frames take (see --replay)
+    recorder = None
+    record_path = _argument_value("--record")
+    if record_path:
+        from session_recording import SessionRecorder
+        recorder = SessionRecorder(record_path, player.num_eq_bands, clock=player.clock)
+        player.lyrics_display.recorder = recorder
+
     song_path, lyrics_path = available_songs[selected_idx]
+    player.playlist.set_current_index(selected_idx)
     console.print(f"\n[green]Seleccionando:[/green] [bold]{os.path.splitext(os.path.basename(song_path))[0]}[/bold]")
     
     try:
         player.load_song(song_path, lyrics_path)
-        player.play()
+        startup.mark("primera canción cargada")
+        player.play(start_seconds)
+        startup.mark("reproducción iniciada")
         
         # Importar msvcrt para detectar entrada en Windows
         import msvcrt
@@ -234,8 +505,15 @@ def main():
     except Exception as e:
         print(f"Ocurrió un error: {str(e)}")
     finally:
-        if not player.stopped:
-            player.stop()
+        loudness_stop.set()
+        if watcher:
+            watcher.stop()
+        player.close()
+        if recorder:
+            recorder.close()
+            print(f"Sesión grabada en {record_path}")
+        if "--output-stats" in sys.argv and player._lyrics_display is not None:
+            print(player.lyrics_display.output_budget.format_report())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+"""Mixer backends and clocks: pygame.mixer for real output, a virtual-clock fake for headless runs"""
+
+import heapq
+import threading
+import time
+import wave
+from concurrent.futures import wait
+
+
+def pygame_mixer():
+    """pygame.mixer, imported and initialised for playback"""
+    import pygame
+    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=2048)
+    return pygame.mixer
+
+
+class SystemClock:
+    """Real time, for playback through an audio device"""
+
+    def now(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def start_thread(self, target, name=None):
+        """Start a daemon thread running `target`"""
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def join(self, thread):
+        thread.join()
+
+    def ready(self, future):
+        """True once `future` has finished; never waits"""
+        return future.done()
+
+
+class VirtualClock:
+    """Simulated time shared by threads that take turns, so runs are reproducible.
+
+    Threads take part once started with start_thread() or after attach(),
+    and exactly one of them runs at a time. When it sleeps, joins another
+    participant or exits, the turn goes to the sleeper with the earliest
+    wake time (on a tie, the one that went to sleep first) and the clock
+    jumps to that time. The order of turns therefore depends only on the
+    order of the clock calls, not on how fast the host is: the same run
+    gives the same frames and the same timings every time.
+
+    Work done during a turn takes no simulated time, including waiting for
+    a decode in another process (ready() waits for it). Threads that do not
+    take part (watchers, pool managers) run freely and never see the turns.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._cond = threading.Condition()
+        self._sleepers = []  # Heap of (wake time, arrival order, thread)
+        self._arrivals = 0
+        self._turn = None  # The participant allowed to run
+        self._participants = set()
+        self._joiners = {}  # Participant -> participants waiting for it to exit
+
+    def now(self):
+        return self._now
+
+    def _queue(self, thread, wake):
+        heapq.heappush(self._sleepers, (wake, self._arrivals, thread))
+        self._arrivals += 1
+
+    def _pass_turn(self):
+        """Wake the next sleeper, moving time to its wake time (lock held)"""
+        if self._sleepers:
+            wake, _, self._turn = heapq.heappop(self._sleepers)
+            self._now = max(self._now, wake)
+        else:
+            self._turn = None
+        self._cond.notify_all()
+
+    def _wait_turn(self, me):
+        while self._turn is not me:
+            self._cond.wait()
+
+    def _participant(self):
+        me = threading.current_thread()
+        if me not in self._participants:
+            raise RuntimeError(f"{me.name} no participa en el reloj virtual (use start_thread o attach)")
+        return me
+
+    def attach(self):
+        """Make the calling thread a participant; returns when it gets its turn"""
+        me = threading.current_thread()
+        with self._cond:
+            self._participants.add(me)
+            self._queue(me, self._now)
+            if self._turn is None:
+                self._pass_turn()
+            self._wait_turn(me)
+
+    def detach(self):
+        """Stop taking part and give the turn away"""
+        with self._cond:
+            self._leave(self._participant())
+
+    def _leave(self, me):
+        self._participants.discard(me)
+        for joiner in self._joiners.pop(me, ()):
+            self._queue(joiner, self._now)
+        if self._turn is me:
+            self._pass_turn()
+
+    def sleep(self, seconds):
+        with self._cond:
+            me = self._participant()
+            self._queue(me, self._now + max(0.0, seconds))
+            self._pass_turn()
+            self._wait_turn(me)
+
+    def start_thread(self, target, name=None):
+        """Start a participant running `target`; it runs once the current turn is given up"""
+        def run():
+            with self._cond:
+                self._wait_turn(thread)
+            try:
+                target()
+            finally:
+                with self._cond:
+                    self._leave(thread)
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        with self._cond:
+            self._participants.add(thread)
+            self._queue(thread, self._now)
+            if self._turn is None:
+                self._pass_turn()
+        thread.start()
+        return thread
+
+    def join(self, thread):
+        """Wait for a thread to end, letting the other participants run meanwhile"""
+        me = threading.current_thread()
+        with self._cond:
+            if thread in self._participants and me in self._participants:
+                self._joiners.setdefault(thread, []).append(me)
+                self._pass_turn()
+                self._wait_turn(me)
+        thread.join()
+
+    def ready(self, future):
+        """Wait for `future` without letting time pass, so it is always ready on time"""
+        wait([future])
+        return True
+
+    def advance_to(self, seconds):
+        """Move time forward from a driver that does without participants (see session_recording)"""
+        with self._cond:
+            self._now = max(self._now, seconds)
+
+
+class FakeSound:
+    """A buffer of PCM that only remembers how long it plays"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def get_length(self):
+        return self.seconds
+
+
+class FakeChannel:
+    """pygame Channel stand-in: plays sounds back to back on the clock, silently"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.volume = 1.0
+        self._sound = None
+        self._queued = None
+        self._ends_at = 0.0
+        self._paused_at = None
+
+    def _update(self):
+        if self._paused_at is not None:
+            return
+        now = self.clock.now()
+        while self._sound is not None and now >= self._ends_at:
+            self._sound, self._queued = self._queued, None
+            if self._sound is not None:
+                self._ends_at += self._sound.get_length()
+
+    def play(self, sound):
+        self._sound, self._queued = sound, None
+        self._ends_at = self.clock.now() + sound.get_length()
+        self._paused_at = None
+
+    def queue(self, sound):
+        self._update()
+        if self._sound is None:
+            self.play(sound)
+        else:
+            self._queued = sound
+
+    def get_queue(self):
+        self._update()
+        return self._queued
+
+    def get_busy(self):
+        self._update()
+        return self._sound is not None
+
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = self.clock.now()
+
+    def unpause(self):
+        if self._paused_at is not None:
+            self._ends_at += self.clock.now() - self._paused_at
+            self._paused_at = None
+
+    def stop(self):
+        self._sound = self._queued = None
+        self._paused_at = None
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+
+def file_seconds(path):
+    """Duration of an audio file, from the WAV header or its tags"""
+    try:
+        with wave.open(path, 'rb') as f:
+            return f.getnframes() / float(f.getframerate())
+    except (wave.Error, EOFError, OSError):
+        pass
+    import mutagen
+    audio = mutagen.File(path)
+    return audio.info.length if audio is not None else 0.0
+
+
+class FakeMusic:
+    """pygame.mixer.music stand-in: a loaded file's position advances with the clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.volume = 1.0
+        self._length = 0.0
+        self._start = 0.0
+        self._started_at = None  # None when not playing
+        self._paused_at = None
+
+    def load(self, path):
+        self.stop()
+        self._length = file_seconds(path)
+
+    def unload(self):
+        self.stop()
+        self._length = 0.0
+
+    def play(self, loops=0, start=0.0):
+        self._start = start
+        self._started_at = self.clock.now()
+        self._paused_at = None
+
+    def _elapsed(self):
+        now = self._paused_at if self._paused_at is not None else self.clock.now()
+        return now - self._started_at
+
+    def _finished(self):
+        return self._started_at is None or self._start + self._elapsed() >= self._length
+
+    def pause(self):
+        if self._started_at is not None and self._paused_at is None:
+            self._paused_at = self.clock.now()
+
+    def unpause(self):
+        if self._paused_at is not None:
+            self._started_at += self.clock.now() - self._paused_at
+            self._paused_at = None
+
+    def stop(self):
+        self._started_at = self._paused_at = None
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def get_volume(self):
+        return self.volume
+
+    def get_busy(self):
+        return not self._finished() and self._paused_at is None
+
+    def get_pos(self):
+        """Milliseconds since play(), or -1 once the music has ended"""
+        if self._finished():
+            return -1
+        return int(self._elapsed() * 1000)
+
+
+class FakeMixer:
+    """The part of pygame.mixer the playback engines use, without an audio device.
+
+    Sounds and music produce no output; their positions follow `clock`, so
+    with a VirtualClock whole playlists play in a fraction of their length.
+    """
+
+    def __init__(self, clock, frequency=44100, channels=2):
+        self.clock = clock
+        self._init = (frequency, -16, channels)
+        self._channels = {}
+        self.music = FakeMusic(clock)
+
+    def get_init(self):
+        return self._init
+
+    def set_reserved(self, count):
+        return count
+
+    def Channel(self, index):
+        channel = self._channels.get(index)
+        if channel is None:
+            channel = self._channels[index] = FakeChannel(self.clock)
+        return channel
+
+    def Sound(self, buffer):
+        frequency, size, channels = self._init
+        return FakeSound(len(buffer) / float(abs(size) // 8 * channels * frequency))
+
+    def quit(self):
+        self._channels = {}
+        self.music.unload()
@@ -0,0 +1,144 @@
+"""Terminal output instrumentation and bandwidth budget for the live display"""
+
+import time
+from config import CONSOLE_REFRESH_RATE, COLOR_DEPTH, OUTPUT_BUDGET_BYTES_PER_SEC, OUTPUT_WRITE_BUSY_LIMIT
+
+COLOR_DEPTHS = ("truecolor", "256", "16")  # Highest to lowest precision
+RICH_COLOR_SYSTEMS = {"truecolor": "truecolor", "256": "256", "16": "standard"}
+
+EVALUATE_SECONDS = 1.0  # Length of the measurement window
+RECOVER_WINDOWS = 5  # Quiet windows needed before quality is raised again
+
+
+def console_color_system(depth=COLOR_DEPTH):
+    """`color_system` argument for rich's Console given the configured depth"""
+    return RICH_COLOR_SYSTEMS.get(depth, "auto")
+
+
+def detect_color_depth(console):
+    """Color depth the console supports: 'truecolor', '256' or '16'"""
+    system = console.color_system
+    if system in ("truecolor", "256"):
+        return system
+    return "16"
+
+
+class CountingWriter:
+    """File wrapper that counts the bytes written and the time spent writing them.
+
+    When the terminal (or the SSH link behind it) cannot keep up, writes
+    block, so the share of wall time spent in write/flush shows the real
+    output throughput.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+
+    def write(self, text):
+        start = time.perf_counter()
+        result = self.stream.write(text)
+        self.write_seconds += time.perf_counter() - start
+        self.bytes_written += len(text.encode('utf-8', 'replace'))
+        return result
+
+    def flush(self):
+        start = time.perf_counter()
+        self.stream.flush()
+        self.write_seconds += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)  # isatty, fileno, encoding...
+
+
+class OutputBudget:
+    """Chooses the frame rate and color depth the terminal can sustain.
+
+    Quality levels go from full refresh rate in the best supported color
+    depth down to a few frames per second in 16 colors. After every
+    measurement window the level drops one step if the output went over
+    the byte budget or the writes kept the terminal busy too long, and
+    rises one step after several comfortable windows in a row.
+    """
+
+    def __init__(self, max_color_depth="truecolor", max_fps=CONSOLE_REFRESH_RATE,
+                 bytes_per_second=OUTPUT_BUDGET_BYTES_PER_SEC, busy_limit=OUTPUT_WRITE_BUSY_LIMIT,
+                 clock=time.perf_counter):
+        depths = COLOR_DEPTHS[COLOR_DEPTHS.index(max_color_depth):]
+        half_fps = max(1, max_fps // 2)
+        levels = [(max_fps, depth) for depth in depths[:2]]
+        levels += [(half_fps, depth) for depth in depths[1:]] or [(half_fps, depths[0])]
+        levels.append((min(2, half_fps), depths[-1]))
+        self.levels = list(dict.fromkeys(levels))  # Drop duplicates, keep the order
+        self.level = 0
+        self.bytes_per_second = bytes_per_second
+        self.busy_limit = busy_limit
+        self._clock = clock  # Measurement windows follow the display clock (virtual on replay)
+
+        self.frames = 0
+        self.total_bytes = 0
+        self.last_frame_bytes = 0
+        self.measured_bytes_per_second = 0.0
+        self.measured_busy = 0.0
+        self._recovering = 0
+        self._window_start = clock()
+        self._window_bytes = 0
+        self._window_write_seconds = 0.0
+        self._window_frames = 0
+
+    @property
+    def fps(self):
+        return self.levels[self.level][0]
+
+    @property
+    def color_depth(self):
+        return self.levels[self.level][1]
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.fps
+
+    def record_frame(self, frame_bytes, write_seconds):
+        """Account for one refresh; returns True if the quality level changed"""
+        self.frames += 1
+        self.total_bytes += frame_bytes
+        self.last_frame_bytes = frame_bytes
+        self._window_bytes += frame_bytes
+        self._window_write_seconds += write_seconds
+        self._window_frames += 1
+
+        elapsed = self._clock() - self._window_start
+        if elapsed < EVALUATE_SECONDS:
+            return False
+        self.measured_bytes_per_second = self._window_bytes / elapsed
+        self.measured_busy = self._window_write_seconds / elapsed
+        self._window_start += elapsed
+        self._window_bytes = self._window_frames = 0
+        self._window_write_seconds = 0.0
+        return self._adjust()
+
+    def _adjust(self):
+        over_bytes = self.bytes_per_second and self.measured_bytes_per_second > self.bytes_per_second
+        if over_bytes or self.measured_busy > self.busy_limit:
+            self._recovering = 0
+            if self.level < len(self.levels) - 1:
+                self.level += 1
+                return True
+            return False
+
+        comfortable = self.measured_busy < self.busy_limit / 4 and not (
+            self.bytes_per_second and self.measured_bytes_per_second > self.bytes_per_second / 2)
+        self._recovering = self._recovering + 1 if comfortable else 0
+        if self._recovering >= RECOVER_WINDOWS and self.level > 0:
+            self.level -= 1
+            self._recovering = 0
+            return True
+        return False
+
+    def format_report(self):
+        """Summary of the output statistics"""
+        average = self.total_bytes / self.frames if self.frames else 0
+        return (f"Salida de terminal: {self.frames} cuadros, {average:.0f} bytes/cuadro de media, "
+                f"último {self.last_frame_bytes} bytes, {self.measured_bytes_per_second / 1024:.1f} KiB/s, "
+                f"escritura ocupada {self.measured_busy:.0%}, nivel actual {self.fps} fps / {self.color_depth} colores")
@@ -0,0 +1,285 @@
+"""Output engines: the pygame music stream and a gapless/crossfading channel engine"""
+
+import threading
+import numpy as np
+from config import PLAYBACK_ENGINE, CROSSFADE_SECONDS, GAPLESS_BLOCK_SECONDS
+from mixer_backend import SystemClock
+
+
+def create_engine(mixer, kind=None, clock=None):
+    """Build the output engine `kind`, by default the one named in the config ('stream' or 'gapless').
+
+    `mixer` is pygame.mixer or a stand-in with the same interface (see
+    mixer_backend.FakeMixer); `clock` is the time source the mixer runs on.
+    """
+    if (kind or PLAYBACK_ENGINE) == "gapless":
+        return GaplessEngine(mixer, clock=clock)
+    return StreamEngine(mixer)
+
+
+class StreamEngine:
+    """Plays one file at a time through pygame.mixer.music.
+
+    Every transition is stop, unload, load and play, so there is a short gap
+    between tracks. Tracks are identified by the tag given to load().
+    """
+
+    gapless = False
+    needs_wav_file = True
+
+    def __init__(self, mixer):
+        self.mixer = mixer
+        self._tag = None
+        self._start_ms = 0  # get_pos() counts from play(), not from the start of the file
+
+    def load(self, processor, tag=None, gain=1.0):
+        self.mixer.music.load(processor.music_file_path)
+        self._tag = tag
+
+    def play(self, start=0.0):
+        self.mixer.music.play(start=start)
+        self._start_ms = int(start * 1000)
+
+    def pause(self):
+        self.mixer.music.pause()
+
+    def unpause(self):
+        self.mixer.music.unpause()
+
+    def stop(self):
+        self.mixer.music.stop()
+        self.mixer.music.unload()  # Explicitly unload the music
+        self._tag = None
+        self._start_ms = 0
+
+    def set_volume(self, volume, gain=1.0):
+        self.mixer.music.set_volume(min(1.0, max(0.0, volume * gain)))
+
+    def get_busy(self):
+        return self.mixer.music.get_busy()
+
+    def get_position(self):
+        """(tag, milliseconds into the track), or (None, -1) when nothing plays"""
+        position_ms = self.mixer.music.get_pos()
+        if position_ms == -1:
+            return None, -1
+        return self._tag, self._start_ms + position_ms
+
+
+class _Track:
+    """A decoded track placed on the engine's sample timeline"""
+
+    __slots__ = ('tag', 'samples', 'start', 'end', 'gain', 'fade_in', 'fade_out')
+
+    def __init__(self, tag, samples, start, gain):
+        self.tag = tag
+        self.samples = samples
+        self.start = start
+        self.end = start + len(samples)
+        self.gain = gain
+        self.fade_in = 0
+        self.fade_out = 0
+
+
+class GaplessEngine:
+    """Plays decoded PCM through a reserved pygame Channel as one continuous stream.
+
+    Tracks are laid out on a single sample timeline. Each enqueued track
+    starts exactly where the previous one ends, or `crossfade` seconds
+    earlier with an equal-power fade. A feeder thread renders short blocks
+    from the timeline and keeps one queued on the channel, so the mixer
+    never runs dry between tracks. Positions are read from that timeline,
+    so get_position() switches to the next track at its first sample.
+    """
+
+    gapless = True
+    needs_wav_file = False
+
+    def __init__(self, mixer, crossfade=CROSSFADE_SECONDS, block_seconds=GAPLESS_BLOCK_SECONDS, clock=None):
+        self.mixer = mixer
+        self.clock = clock or SystemClock()
+        self.sample_rate, _, self.channels = mixer.get_init()
+        mixer.set_reserved(1)  # Keep Sound.play() from stealing our channel
+        self.channel = mixer.Channel(0)
+        self.crossfade_samples = int(crossfade * self.sample_rate)
+        self.block_length = max(1, int(block_seconds * self.sample_rate))
+        self.volume = 1.0
+
+        self._lock = threading.RLock()
+        self._tracks = []
+        self._render_pos = 0  # Next timeline sample to render
+        self._playing = (0, 0)  # (start, length) of the block the channel is playing
+        self._queued = None  # (start, length) of the block waiting in the channel queue
+        self._started_at = 0.0
+        self._paused_at = None
+        self._feeder = None
+        self._running = False
+
+    def _to_mixer_format(self, processor):
+        """Track samples as int16 at the mixer rate (zero-copy when they already are)"""
+        samples = processor.raw_data
+        if processor.sample_width != 2 or processor.sample_rate != self.sample_rate:
+            floats = processor.get_normalized_samples()
+            if processor.sample_rate != self.sample_rate:
+                length = int(len(floats) * self.sample_rate / processor.sample_rate)
+                source_times = np.arange(len(floats)) / processor.sample_rate
+                target_times = np.arange(length) / self.sample_rate
+                floats = np.stack([np.interp(target_times, source_times, floats[:, c])
+                                   for c in range(floats.shape[1])], axis=1)
+            samples = np.clip(floats * 32768.0, -32768, 32767).astype(np.int16)
+        if self.channels == 1:
+            samples = samples.mean(axis=1, keepdims=True).astype(np.int16)
+        return samples
+
+    def load(self, processor, tag=None, gain=1.0):
+        """Replace the timeline with a single track (playback starts with play())"""
+        self.stop()
+        with self._lock:
+            self._tracks = [_Track(tag, self._to_mixer_format(processor), 0, gain)]
+
+    def enqueue(self, processor, tag=None, gain=1.0):
+        """Schedule a track right after the last one, overlapping by the crossfade"""
+        samples = self._to_mixer_format(processor)
+        with self._lock:
+            if not self._tracks:
+                self._tracks = [_Track(tag, samples, 0, gain)]
+                return
+            previous = self._tracks[-1]
+            # Blocks already rendered cannot be changed, so a late track starts after them
+            start = max(previous.end - self.crossfade_samples, self._render_pos)
+            track = _Track(tag, samples, start, gain)
+            overlap = max(0, previous.end - start)
+            previous.fade_out = track.fade_in = min(overlap, len(samples))
+            self._tracks.append(track)
+
+    def _render(self, start, length):
+        """Mix the timeline range [start, start + length) into an int16 block"""
+        end = start + length
+        active = [t for t in self._tracks if t.start < end and t.end > start]
+        gain_limit = 1.0 / max(self.volume, 1e-3)  # Same ceiling as volume * gain <= 1 in the stream engine
+        if (len(active) == 1 and active[0].start <= start and active[0].end >= end
+                and not active[0].fade_in and not active[0].fade_out and active[0].gain == 1.0):
+            track = active[0]
+            return np.ascontiguousarray(track.samples[start - track.start:end - track.start])
+
+        mixed = np.zeros((length, self.channels), dtype=np.float32)
+        for track in active:
+            a, b = max(start, track.start), min(end, track.end)
+            envelope = np.full(b - a, min(track.gain, gain_limit), dtype=np.float32)
+            positions = np.arange(a, b)
+            if track.fade_in:
+                x = np.clip((positions - track.start) / track.fade_in, 0.0, 1.0)
+                envelope *= np.sin(0.5 * np.pi * x)
+            if track.fade_out:
+                x = np.clip((track.end - positions) / track.fade_out, 0.0, 1.0)
+                envelope *= np.sin(0.5 * np.pi * x)
+            mixed[a - start:b - start] += track.samples[a - track.start:b - track.start] * envelope[:, None]
+        return np.clip(mixed, -32768, 32767).astype(np.int16)
+
+    def _next_block(self):
+        """Render the next block as a Sound, or None once the timeline is exhausted"""
+        if not self._tracks or self._render_pos >= self._tracks[-1].end:
+            return None
+        start = self._render_pos
+        length = min(self.block_length, self._tracks[-1].end - start)
+        block = self._render(start, length)
+        self._render_pos += length
+        return self.mixer.Sound(buffer=block.tobytes()), (start, length)
+
+    def _feed(self):
+        while self._running:
+            with self._lock:
+                if self._paused_at is None and self.channel.get_queue() is None:
+                    if self._queued is not None:
+                        # The queued block just started playing
+                        self._playing, self._queued = self._queued, None
+                        self._started_at = self.clock.now()
+                        self._drop_finished_tracks()
+                    block = self._next_block()
+                    if block is not None:
+                        sound, self._queued = block
+                        self.channel.queue(sound)
+                    elif not self.channel.get_busy():
+                        self._running = False
+            self.clock.sleep(0.005)
+
+    def _drop_finished_tracks(self):
+        playing_start = self._playing[0]
+        while len(self._tracks) > 1 and self._tracks[0].end <= playing_start:
+            self._tracks.pop(0)
+
+    def play(self, start=0.0):
+        """Start the timeline, `start` seconds into the first track"""
+        with self._lock:
+            if start and self._tracks:
+                self._render_pos = min(int(start * self.sample_rate), self._tracks[0].end)
+            block = self._next_block()
+            if block is None:
+                return
+            sound, self._playing = block
+            self.channel.play(sound)
+            self._started_at = self.clock.now()
+            self._paused_at = None
+            self._running = True
+        self._feeder = self.clock.start_thread(self._feed)
+
+    def pause(self):
+        with self._lock:
+            if self._paused_at is None:
+                self.channel.pause()
+                self._paused_at = self.clock.now()
+
+    def unpause(self):
+        with self._lock:
+            if self._paused_at is not None:
+                self.channel.unpause()
+                self._started_at += self.clock.now() - self._paused_at
+                self._paused_at = None
+
+    def stop(self):
+        self._running = False
+        if self._feeder and self._feeder is not threading.current_thread():
+            self.clock.join(self._feeder)
+        self._feeder = None
+        with self._lock:
+            self.channel.stop()
+            self._tracks = []
+            self._render_pos = 0
+            self._playing = (0, 0)
+            self._queued = None
+            self._paused_at = None
+
+    def set_volume(self, volume, gain=1.0):
+        """Set the channel volume and the gain of the track playing now"""
+        with self._lock:
+            self.volume = volume
+            self.channel.set_volume(min(1.0, max(0.0, volume)))
+            track = self._current_track(self._timeline_position())
+            if track is not None:
+                track.gain = gain
+
+    def get_busy(self):
+        return self._running or self.channel.get_busy()
+
+    def _timeline_position(self):
+        now = self._paused_at if self._paused_at is not None else self.clock.now()
+        start, length = self._playing
+        return start + min(max(0, int((now - self._started_at) * self.sample_rate)), length)
+
+    def _current_track(self, position):
+        current = None
+        for track in self._tracks:
+            if track.start <= position:
+                current = track
+        return current
+
+    def get_position(self):
+        """(tag, milliseconds into the track), or (None, -1) when nothing plays"""
+        with self._lock:
+            if not self.get_busy():
+                return None, -1
+            position = self._timeline_position()
+            track = self._current_track(position)
+            if track is None or position >= track.end:
+                return None, -1
+            return track.tag, (position - track.start) * 1000 // self.sample_rate
@@ -1,130 +1,363 @@
-import pygame
-import pylrc
 import time
 import threading
-from audio_processor import AudioProcessor
-from lyrics_display import LyricsDisplay
 from playlist import Playlist
+from analysis_cache import AnalysisCache
+from track_cache import TrackCache
+from mixer_backend import SystemClock
 import os
-from config import DEFAULT_EQ_BANDS
+import sys
+from config import DEFAULT_EQ_BANDS, LOUDNESS_NORMALIZATION, PREFETCH_SECONDS, ANALYSIS_INTERVAL_MS, ANALYSIS_PUBLISH
 
 class MusicPlayer:
-    def __init__(self, num_eq_bands=DEFAULT_EQ_BANDS):
+    """Playback controller.
+
+    Heavy subsystems are created on first use: pygame and the mixer when the
+    first song is loaded, the audio processor (NumPy/pydub) and the rich
+    display when they are first needed. Constructing a player is cheap and
+    never scans the library; pass the playlist built from the library scan.
+
+    Output goes through a playback engine (see playback_engine). With the
+    gapless engine the next song is decoded while the current one ends and
+    queued behind it, and the player switches its analysis, lyrics and song
+    info when the engine reports that the new track has started.
+
+    Tracks that stop playing are kept decoded in a TrackCache, so going back
+    to a recent song (or ahead to a prefetched one) skips decoding.
+
+    `mixer`, `clock` and `display_output` replace pygame.mixer, real time and
+    the terminal; a FakeMixer on a VirtualClock (see mixer_backend and
+    simulation) plays whole playlists headless at accelerated speed.
+    """
+
+    def __init__(self, num_eq_bands=DEFAULT_EQ_BANDS, playlist=None, mixer=None, clock=None, display_output=None):
         self.num_eq_bands = num_eq_bands
-        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=2048)
-        self.lyrics_display = LyricsDisplay(num_eq_bands=self.num_eq_bands)
+        self._mixer = mixer
+        self.clock = clock or SystemClock()
+        self._display_output = display_output
+        self._lyrics_display = None
+        self._audio_processor = None
+        self._engine = None
+        self._prefetch = None  # Next song being prepared for a gapless transition
+        self._current_track = None  # Song, gain and parsed lyrics of the loaded processor
+        self.track_cache = TrackCache()
         self.song_loaded = False
         self.paused = False
         self.stopped = True
         
-        # Audio processor instance
-        self.audio_processor = AudioProcessor(num_eq_bands=self.num_eq_bands)
-        
         # Playlist instance
-        self.playlist = Playlist()
+        self.playlist = playlist if playlist is not None else Playlist(songs=[])
         
         self.lyrics = None
         self.analysis_thread = None
         self.volume = 1.0
 
+        # Loudness normalization: per-track gain applied on top of the user volume
+        self.analysis_cache = AnalysisCache()
+        self.normalize_loudness = LOUDNESS_NORMALIZATION
+        self.track_gain = 1.0
+
+        # Analysis frames shared with visualizers in other processes
+        self.analysis_publisher = None
+        if ANALYSIS_PUBLISH:
+            from analysis_publisher import AnalysisPublisher
+            try:
+                self.analysis_publisher = AnalysisPublisher(num_eq_bands)
+            except RuntimeError as e:
+                print(f"No se publicará el análisis: {e}")
+
+    @property
+    def mixer(self):
+        """pygame.mixer (unless another backend was given), imported and initialised on first use"""
+        if self._mixer is None:
+            from mixer_backend import pygame_mixer
+            self._mixer = pygame_mixer()
+        return self._mixer
+
+    @property
+    def engine(self):
+        """Output engine (stream or gapless), created with the mixer on first use"""
+        if self._engine is None:
+            from playback_engine import create_engine
+            self._engine = create_engine(self.mixer, clock=self.clock)
+        return self._engine
+
+    @property
+    def lyrics_display(self):
+        if self._lyrics_display is None:
+            from lyrics_display import LyricsDisplay
+            self._lyrics_display = LyricsDisplay(num_eq_bands=self.num_eq_bands, output=self._display_output,
+                                                 clock=self.clock)
+        return self._lyrics_display
+
+    @property
+    def audio_processor(self):
+        if self._audio_processor is None:
+            from audio_processor import AudioProcessor
+            self._audio_processor = AudioProcessor(num_eq_bands=self.num_eq_bands)
+        return self._audio_processor
+
     def load_song(self, song_path, lyrics_path):
         try:
-            # Load audio using audio processor
-            music_file_path = self.audio_processor.load_audio(song_path)
-            pygame.mixer.music.load(music_file_path)
+            self._retire_audio_processor()
+            # Already decoded for a gapless transition, or played recently
+            ready = self._take_prefetch(song_path) or self.track_cache.take(song_path)
+            if ready is not None:
+                self._audio_processor = ready['processor']
+            else:
+                from audio_processor import submit_decode
+                self.audio_processor.load_audio(
+                    song_path, submit_decode(song_path, export_wav=self.engine.needs_wav_file))
+            self.engine.load(self.audio_processor, tag=self.audio_processor)
+            if ready is not None:
+                self.track_gain = ready['gain']
+                self._apply_volume()
+                prepared = ready['prepared']
+            else:
+                self._update_track_gain(song_path)
+                prepared = self._prepare_track(song_path, lyrics_path, self.audio_processor)
 
             self.song_loaded = True
-
-            try:
-                with open(lyrics_path, 'r', encoding='utf-8') as f:
-                    self.lyrics = pylrc.parse(f.read())
-            except Exception as e:
-                print(f"Warning: Could not load lyrics file: {e}")
-                self.lyrics = None
-            
-            # Get and display song information
-            song_info = self.get_song_info(song_path)
-            if hasattr(self.lyrics_display, 'update_song_info'):
-                self.lyrics_display.update_song_info(song_info)
+            self._current_track = {'song': (song_path, lyrics_path), 'gain': self.track_gain,
+                                   'prepared': prepared}
+            self._show_track(*prepared)
                 
         except Exception as e:
             print(f"Error loading song: {e}")
             self.song_loaded = False
             self.lyrics = None
 
-    def play(self):
+    def _prepare_track(self, song_path, lyrics_path, processor):
+        """Parse (and if needed align) the lyrics and read the song info"""
+        lyrics = None
+        try:
+            import pylrc
+            from lyrics_aligner import needs_alignment, align_lyrics_file
+            # Plain-text lyrics get real timings from the audio we just decoded
+            if needs_alignment(lyrics_path):
+                align_lyrics_file(song_path, lyrics_path,
+                                  processor.get_normalized_samples(),
+                                  processor.sample_rate)
+            with open(lyrics_path, 'r', encoding='utf-8') as f:
+                lyrics = pylrc.parse(f.read())
+        except Exception as e:
+            print(f"Warning: Could not load lyrics file: {e}")
+        return lyrics, self.get_song_info(song_path)
+
+    def _show_track(self, lyrics, song_info):
+        self.lyrics = lyrics
+        self.lyrics_display.reset_lyrics()
+        if hasattr(self.lyrics_display, 'update_song_info'):
+            self.lyrics_display.update_song_info(song_info)
+
+    def _retire_audio_processor(self):
+        """Move the loaded track into the track cache (or release it if it is incomplete)"""
+        processor, self._audio_processor = self._audio_processor, None
+        current, self._current_track = self._current_track, None
+        if processor is None:
+            return
+        if current is None or processor.raw_data is None:
+            processor.cleanup()
+            return
+        self.track_cache.put(current['song'][0], processor, current['gain'], current['prepared'])
+
+    def _prefetch_next(self, current_time_sec, total_time):
+        """Prepare the upcoming song near the end of this one and queue it in the engine"""
+        if not self.engine.gapless:
+            return
+        if self._prefetch is None:
+            if total_time - current_time_sec > PREFETCH_SECONDS:
+                return
+            upcoming = self.playlist.peek_next_song()
+            if upcoming is None:
+                return
+            cached = self.track_cache.take(upcoming[0])
+            if cached is not None:
+                self._prefetch = dict(cached, song=upcoming, future=None)
+                self.engine.enqueue(cached['processor'], tag=cached['processor'],
+                                    gain=cached['gain'] if self.normalize_loudness else 1.0)
+                return
+            from audio_processor import submit_decode
+            self._prefetch = {'song': upcoming, 'processor': None,
+                              'future': submit_decode(upcoming[0], export_wav=False)}
+        elif self._prefetch['processor'] is None and self.clock.ready(self._prefetch['future']):
+            from audio_processor import AudioProcessor
+            song_path, lyrics_path = self._prefetch['song']
+            processor = AudioProcessor(num_eq_bands=self.num_eq_bands)
+            try:
+                processor.load_audio(song_path, self._prefetch['future'])
+            except Exception as e:
+                print(f"Error loading song: {e}")
+                self._prefetch['future'] = None  # Keep the failed entry so it is not retried
+                return
+            gain = self._measure_track_gain(song_path, processor)
+            self._prefetch.update(processor=processor, gain=gain,
+                                  prepared=self._prepare_track(song_path, lyrics_path, processor))
+            self.engine.enqueue(processor, tag=processor, gain=gain if self.normalize_loudness else 1.0)
+
+    def _take_prefetch(self, song_path=None):
+        """Hand over the prepared next song (if it is `song_path`), releasing anything else"""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return None
+        if prefetch['processor'] is not None:
+            if prefetch['song'][0] == song_path:
+                return prefetch
+            # Skipped before it played; it may still be asked for soon
+            self.track_cache.put(prefetch['song'][0], prefetch['processor'],
+                                 prefetch['gain'], prefetch['prepared'])
+        elif prefetch['future'] is not None:
+            from audio_processor import release_decoded
+            prefetch['future'].add_done_callback(
+                lambda future: future.exception() is None and release_decoded(future.result()))
+        return None
+
+    def _switch_to_prefetched(self, processor):
+        """The engine started the queued track: make it the current song"""
+        prefetch = self._prefetch
+        if prefetch is None or prefetch['processor'] is not processor:
+            return False
+        self._prefetch = None
+        self._retire_audio_processor()
+        self._audio_processor = processor
+        self._current_track = prefetch
+        song_path, lyrics_path = prefetch['song']
+        index = self.playlist.index_of(song_path)
+        if index >= 0:
+            self.playlist.set_current_index(index)
+        self.track_gain = prefetch['gain']
+        self._apply_volume()
+        self._show_track(*prefetch['prepared'])
+        return True
+
+    def play(self, start=0.0):
+        """Start playback, optionally `start` seconds into the song"""
         if not self.song_loaded:
             return
         self.stopped = False
         self.paused = False
         self.lyrics_display.start()
-        pygame.mixer.music.play() # Start music playback
-        self.analysis_thread = threading.Thread(target=self._analyze_audio_and_update_display)
-        self.analysis_thread.daemon = True
-        self.analysis_thread.start()
+        self.engine.play(start) # Start music playback
+        self.analysis_thread = self.clock.start_thread(self._analyze_audio_and_update_display)
 
     # Removed the private _calculate_eq_bands method as it's now in the AudioProcessor class
 
     def _analyze_audio_and_update_display(self):
         # This thread will now only analyze audio and update display, not play audio
-        analysis_chunk_samples = int(self.audio_processor.sample_rate * 0.1)  # 100ms chunks
-
         while not self.stopped:
             if self.paused:
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
                 continue
 
-            current_playback_ms = pygame.mixer.music.get_pos()
+            # Track and position come from the engine together, so they never disagree
+            processor, current_playback_ms = self.engine.get_position()
             if current_playback_ms == -1:  # Music has stopped or not playing
                 break
-
-            # Get audio chunk for analysis
-            normalized_chunk = self.audio_processor.get_audio_chunk(current_playback_ms, analysis_chunk_samples)
-            
-            if len(normalized_chunk) == 0:
+            if processor is not self.audio_processor and not self._switch_to_prefetched(processor):
                 break
 
-            eq_bands = self.audio_processor.calculate_eq_bands(normalized_chunk)
-            self.lyrics_display.update_eq(eq_bands)
+            # Analyse one interval ahead: the display interpolates between this
+            # frame and the previous one while the interval plays
+            # Both channels go through one batched FFT; the mix is the mean of their
+            # bands, so content that cancels between the channels still shows
+            analysis_chunk_samples = int(processor.sample_rate * 0.1)  # 100ms chunks
+            stereo_chunk = processor.get_audio_chunk(current_playback_ms + ANALYSIS_INTERVAL_MS,
+                                                     analysis_chunk_samples, channels=True)
+            
+            eq_bands = None
+            if len(stereo_chunk) == 0:
+                if not self.engine.get_busy():
+                    break
+            else:
+                channel_bands = processor.calculate_eq_bands(stereo_chunk)
+                eq_bands = channel_bands.mean(axis=0)
+                self.lyrics_display.update_eq(eq_bands, self.clock.now() + ANALYSIS_INTERVAL_MS / 1000.0,
+                                              channel_bands, processor.stereo_correlation(stereo_chunk))
 
             current_time_sec = current_playback_ms / 1000.0
-            total_time = self.audio_processor.get_duration()
+            total_time = processor.get_duration()
             self.lyrics_display.update_progress(current_time_sec, total_time)
             if self.lyrics:
                 self.lyrics_display.update_current_line(self.lyrics, current_time_sec, self)
+            if self.analysis_publisher:
+                self.analysis_publisher.publish(eq_bands, current_time_sec, total_time,
+                                                self.lyrics_display.state.line_idx,
+                                                time.time() + ANALYSIS_INTERVAL_MS / 1000.0)
+            self._prefetch_next(current_time_sec, total_time)
 
-            time.sleep(0.1)  # Sleep to control analysis frequency
+            self.clock.sleep(ANALYSIS_INTERVAL_MS / 1000.0)  # Sleep to control analysis frequency
         
         self.stop()
 
     def pause(self):
         self.paused = True
-        pygame.mixer.music.pause()
+        self.engine.pause()
         
     def unpause(self):
         self.paused = False
-        pygame.mixer.music.unpause()
+        self.engine.unpause()
         
     def stop(self):
         if self.stopped:
             return
         self.stopped = True
         self.lyrics_display.stop()
-        pygame.mixer.music.stop()
-        pygame.mixer.music.unload()  # Explicitly unload the music
+        self.engine.stop()
         
         # Only join the analysis thread if it's not the current thread
         if self.analysis_thread and self.analysis_thread != threading.current_thread():
-            self.analysis_thread.join()
+            self.clock.join(self.analysis_thread)
         elif self.analysis_thread:
             # If it's the same thread, just reset the reference
             self.analysis_thread = None
         
-        # Clean up audio processor resources
-        self.audio_processor.cleanup()
+        # Keep the decoded track around in case it is played again soon
+        self._retire_audio_processor()
+
+    def close(self):
+        """Stop playback and release the prefetched song, cached tracks, the analysis publisher and the decode workers"""
+        if not self.stopped:
+            self.stop()
+        self._retire_audio_processor()
+        self._take_prefetch()
+        self.track_cache.clear()
+        if self.analysis_publisher:
+            self.analysis_publisher.close()
+            self.analysis_publisher = None
+        # The pool only exists once audio_processor has been imported
+        audio_processor = sys.modules.get('audio_processor')
+        if audio_processor is not None:
+            audio_processor.shutdown_decode_pool()
+
+    def _measure_track_gain(self, song_path, processor):
+        """Look up (or measure once) the loudness gain of a decoded track"""
+        if not self.normalize_loudness:
+            return 1.0
+        try:
+            from loudness import get_track_gain
+            return get_track_gain(self.analysis_cache, song_path,
+                                  processor.get_normalized_samples(), processor.sample_rate)
+        except Exception as e:
+            print(f"Warning: Could not analyze loudness: {e}")
+            return 1.0
+
+    def _update_track_gain(self, song_path):
+        """Look up (or measure once) the loudness gain of the loaded track"""
+        self.track_gain = self._measure_track_gain(song_path, self.audio_processor)
+        self._apply_volume()
+
+    def _apply_volume(self):
+        """Send the user volume and the track gain to the output engine"""
+        if self._engine is None:
+            return  # Applied when the first song is loaded
+        self._engine.set_volume(self.volume, self.track_gain if self.normalize_loudness else 1.0)
+
+    def set_loudness_normalization(self, enabled):
+        """Enable or disable automatic loudness normalization"""
+        self.normalize_loudness = enabled
+        self._apply_volume()
 
     def is_playing(self):
-        return self.song_loaded and not self.stopped and not self.paused and pygame.mixer.music.get_busy()
+        return self.song_loaded and not self.stopped and not self.paused and self.engine.get_busy()
 
     def is_paused(self):
         return self.paused and not self.stopped
@@ -133,7 +366,7 @@ class MusicPlayer:
         """Set volume level (0.0 to 1.0)"""
         if 0.0 <= volume <= 1.0:
             self.volume = volume
-            pygame.mixer.music.set_volume(volume)
+            self._apply_volume()
             # Update visual volume indicator
             if hasattr(self.lyrics_display, 'update_volume_display'):
                 self.lyrics_display.update_volume_display(volume)
@@ -176,10 +409,6 @@ class MusicPlayer:
             return True
         return False
     
-    def load_playlist(self):
-        """Load the playlist from available songs"""
-        self.playlist = Playlist()
-    
     def get_current_track_info(self):
         """Get information about the current track"""
         return {
@@ -197,18 +426,12 @@ class MusicPlayer:
         return self.playlist.toggle_repeat()
     
     def set_visualization_mode(self, mode):
-        """Set the visualization mode: 'bars', 'waveform', 'spectrum'"""
+        """Set the visualization mode: 'bars', 'waveform', 'spectrum', 'waterfall', 'peaks'"""
         return self.lyrics_display.set_visualization_mode(mode)
     
     def cycle_visualization_mode(self):
         """Cycle through visualization modes"""
-        current_mode = self.lyrics_display.get_visualization_mode()
-        if current_mode == "bars":
-            new_mode = "waveform"
-        elif current_mode == "waveform":
-            new_mode = "spectrum"
-        else:
-            new_mode = "bars"
+        new_mode = self.lyrics_display.get_next_visualization_mode()
         self.lyrics_display.set_visualization_mode(new_mode)
         return new_mode
     
@@ -220,6 +443,7 @@ class MusicPlayer:
             audio = MP3(song_path)
             
             info = {
+                'path': song_path,
                 'duration': audio.info.length if audio else 0,
                 'bitrate': audio.info.bitrate if audio else 0,
                 'sample_rate': audio.info.sample_rate if audio else 0
@@ -241,6 +465,7 @@ class MusicPlayer:
         except:
             # Fallback if mutagen fails
             return {
+                'path': song_path,
                 'title': os.path.splitext(os.path.basename(song_path))[0],
                 'artist': "Unknown Artist",
                 'album': "Unknown Album",
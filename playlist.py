@@ -1,83 +1,284 @@
 """Playlist management module"""
 
+import os
+import threading
+import numpy as np
 from utils import get_available_songs
 
+INITIAL_CAPACITY = 64
+
 
 class Playlist:
-    def __init__(self):
-        self.songs = get_available_songs()
+    """Play queue stored as a compact array of library IDs.
+
+    Each (song_path, lyrics_path) entry lives once in `_library` and is
+    referenced by its integer ID; IDs of removed songs are reused. `_order` holds the IDs in original order;
+    shuffle mode reads it through a permutation (`_perm`, shuffled position ->
+    original position, with its inverse `_inv_perm`), so toggling shuffle only
+    remaps the current position and never copies the queue.
+    """
+
+    def __init__(self, songs=None):
+        self._library = []
+        self._free_ids = []  # Slots of `_library` freed by removed songs
+        self._ids_by_path = {}
+        self._order = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._perm = None
+        self._inv_perm = None
+        self._size = 0
+        self._rng = np.random.default_rng()
+        self._lock = threading.RLock()  # Songs may be added from the scanner thread
         self.current_index = -1
         self.is_shuffled = False
         self.repeat_mode = "none"  # "none", "one", "all"
-        self._original_order = list(self.songs)  # Keep original order for shuffle
+
+        self.add_songs(get_available_songs() if songs is None else songs)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def songs(self):
+        """The (song, lyrics) entries in play order (builds a new list)"""
+        return [self._entry(i) for i in range(self._size)]
+
+    def _to_original(self, index):
+        """Map a position in the current play order to the original order"""
+        return int(self._perm[index]) if self.is_shuffled else index
+
+    def _to_view(self, original_index):
+        """Map a position in the original order to the current play order"""
+        return int(self._inv_perm[original_index]) if self.is_shuffled else original_index
+
+    def _to_view_shuffled(self, index):
+        """Position in the shuffled order of the song at `index` of the current order"""
+        if index < 0 or self.is_shuffled:
+            return index
+        return int(self._inv_perm[index])
+
+    def _entry(self, index):
+        return self._library[self._order[self._to_original(index)]]
+
+    def _ensure_capacity(self, size):
+        """Grow the backing arrays geometrically so appends stay amortised O(1)"""
+        capacity = len(self._order)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        self._order = self._grown(self._order, new_capacity)
+        if self._perm is not None:
+            self._perm = self._grown(self._perm, new_capacity)
+            self._inv_perm = self._grown(self._inv_perm, new_capacity)
+
+    def _grown(self, array, capacity):
+        grown = np.empty(capacity, dtype=array.dtype)
+        grown[:self._size] = array[:self._size]
+        return grown
+
+    def _store(self, entry):
+        """Put an entry in `_library`, in a freed slot if there is one; returns its ID"""
+        if self._free_ids:
+            library_id = self._free_ids.pop()
+            self._library[library_id] = entry
+        else:
+            library_id = len(self._library)
+            self._library.append(entry)
+        self._ids_by_path[entry[0]] = library_id
+        return library_id
 
     def add_song(self, song_path, lyrics_path):
         """Add a song to the playlist"""
-        self.songs.append((song_path, lyrics_path))
-        self._original_order = list(self.songs)
+        with self._lock:
+            library_id = self._store((song_path, lyrics_path))
+            self._ensure_capacity(self._size + 1)
+
+            position = self._size
+            self._order[position] = library_id
+            self._size += 1
+
+            if self._perm is not None:
+                # Swap the new song into a random upcoming slot of the shuffled order
+                self._perm[position] = position
+                self._inv_perm[position] = position
+                current = self._to_view_shuffled(self.current_index)
+                slot = int(self._rng.integers(current + 1, position + 1))
+                self._perm[slot], self._perm[position] = self._perm[position], self._perm[slot]
+                self._inv_perm[self._perm[slot]] = slot
+                self._inv_perm[self._perm[position]] = position
+
+    def add_songs(self, entries):
+        """Append many (song, lyrics) entries at once, in original order"""
+        with self._lock:
+            entries = list(entries)
+            if not entries:
+                return
+            if self._perm is not None:
+                for song_path, lyrics_path in entries:
+                    self.add_song(song_path, lyrics_path)
+                return
+            reused = [self._store(entry) for entry in entries[:len(self._free_ids)]]
+            entries = entries[len(reused):]
+            first_id = len(self._library)
+            self._library.extend(entries)
+            self._ids_by_path.update((song_path, first_id + i) for i, (song_path, _) in enumerate(entries))
+            count = len(reused) + len(entries)
+            self._ensure_capacity(self._size + count)
+            self._order[self._size:self._size + len(reused)] = reused
+            self._order[self._size + len(reused):self._size + count] = np.arange(first_id, first_id + len(entries))
+            self._size += count
 
     def remove_song(self, index):
         """Remove a song from the playlist by index"""
-        if 0 <= index < len(self.songs):
-            self.songs.pop(index)
-            if self.current_index >= len(self.songs):
-                self.current_index = len(self.songs) - 1
-            self._original_order = list(self.songs)
+        with self._lock:
+            if not 0 <= index < self._size:
+                return
+
+            removed = self._to_original(index)
+            current = self._to_original(self.current_index) if 0 <= self.current_index < self._size else -1
+            size = self._size
+
+            library_id = int(self._order[removed])
+            song_path, _ = self._library[library_id]
+            if self._ids_by_path.get(song_path) == library_id:
+                del self._ids_by_path[song_path]
+            self._library[library_id] = None
+            self._free_ids.append(library_id)
+            self._order[removed:size - 1] = self._order[removed + 1:size]
+            if self._perm is not None:
+                slot = self._inv_perm[removed]
+                self._perm[slot:size - 1] = self._perm[slot + 1:size]
+                perm = self._perm[:size - 1]
+                perm[perm > removed] -= 1
+                self._inv_perm[removed:size - 1] = self._inv_perm[removed + 1:size]
+                inv_perm = self._inv_perm[:size - 1]
+                inv_perm[inv_perm > slot] -= 1
+            self._size -= 1
+
+            # Keep pointing at the same track: its position in the play order
+            # can move even when it comes before the removed song (shuffled
+            # slots shift too). If it was removed, stay on the same slot.
+            if current >= 0 and current != removed:
+                self.current_index = self._to_view(current - 1 if current > removed else current)
+            if self.current_index >= self._size:
+                self.current_index = self._size - 1
+
+    def __contains__(self, song_path):
+        return song_path in self._ids_by_path
+
+    def index_of(self, song_path):
+        """Position of a song in the current play order, or -1"""
+        with self._lock:
+            library_id = self._ids_by_path.get(song_path)
+            if library_id is None:
+                return -1
+            position = int(np.flatnonzero(self._order[:self._size] == library_id)[0])
+            return self._to_view(position)
+
+    def remove_song_by_path(self, song_path):
+        """Remove a song given its file path; returns True if it was queued"""
+        with self._lock:
+            index = self.index_of(song_path)
+            if index < 0:
+                return False
+            self.remove_song(index)
+            return True
+
+    def get_lyrics_path(self, song_path):
+        """Lyrics file paired with a queued song, or None"""
+        with self._lock:
+            library_id = self._ids_by_path.get(song_path)
+            return None if library_id is None else self._library[library_id][1]
+
+    def get_song_paths(self):
+        """Paths of every queued song (in no particular order)"""
+        with self._lock:
+            return list(self._ids_by_path)
 
     def get_current_song(self):
         """Get the current song in the playlist"""
-        if 0 <= self.current_index < len(self.songs):
-            return self.songs[self.current_index]
+        if 0 <= self.current_index < self._size:
+            return self._entry(self.current_index)
+        return None
+
+    def _next_index(self):
+        if not self._size:
+            return None
+        if self.repeat_mode == "one":
+            return self.current_index
+        if self.current_index < self._size - 1:
+            return self.current_index + 1
+        if self.repeat_mode == "all":
+            return 0
         return None
 
     def get_next_song(self):
         """Get the next song in the playlist"""
-        if not self.songs:
-            return None
+        with self._lock:
+            index = self._next_index()
+            if index is None:
+                return None
+            self.current_index = index
+            return self._entry(index)
 
-        if self.repeat_mode == "one":
-            return self.songs[self.current_index]
-        elif self.repeat_mode == "all" and self.current_index == len(self.songs) - 1:
-            self.current_index = 0
-            return self.songs[0]
-        elif self.current_index < len(self.songs) - 1:
-            self.current_index += 1
-            return self.songs[self.current_index]
-        else:
-            return None
+    def peek_next_song(self):
+        """The song get_next_song would return, without moving to it"""
+        with self._lock:
+            index = self._next_index()
+            return None if index is None else self._entry(index)
 
     def get_prev_song(self):
         """Get the previous song in the playlist"""
-        if not self.songs:
-            return None
+        with self._lock:
+            if not self._size:
+                return None
 
-        if self.current_index > 0:
-            self.current_index -= 1
-            return self.songs[self.current_index]
-        elif self.repeat_mode == "all":
-            self.current_index = len(self.songs) - 1
-            return self.songs[self.current_index]
-        else:
-            return None
+            if self.current_index > 0:
+                self.current_index -= 1
+                return self._entry(self.current_index)
+            elif self.repeat_mode == "all":
+                self.current_index = self._size - 1
+                return self._entry(self.current_index)
+            else:
+                return None
 
     def set_current_index(self, index):
         """Set the current song index"""
-        if 0 <= index < len(self.songs):
+        if 0 <= index < self._size:
             self.current_index = index
 
+    def _build_permutation(self):
+        """Draw a new shuffled order that starts with the current song"""
+        capacity = len(self._order)
+        self._perm = np.empty(capacity, dtype=np.int32)
+        self._inv_perm = np.empty(capacity, dtype=np.int32)
+        perm = self._perm[:self._size]
+        perm[:] = self._rng.permutation(self._size)
+        if 0 <= self.current_index < self._size:
+            current = self._to_original(self.current_index)
+            slot = int(np.flatnonzero(perm == current)[0])
+            perm[0], perm[slot] = perm[slot], perm[0]
+        self._inv_perm[perm] = np.arange(self._size, dtype=np.int32)
+
     def shuffle(self):
-        """Shuffle the playlist"""
-        import random
-        self.is_shuffled = not self.is_shuffled
-        if self.is_shuffled:
-            # Shuffle all but maintain current song at position 0 temporarily
-            temp_songs = self.songs[:]
-            shuffled_songs = temp_songs[1:]  # Exclude current song
-            random.shuffle(shuffled_songs)
-            self.songs = [temp_songs[0]] + shuffled_songs if len(temp_songs) > 0 else shuffled_songs
-        else:
-            # Restore original order
-            self.songs = list(self._original_order)
+        """Toggle shuffle mode, keeping the current song selected"""
+        with self._lock:
+            current = self._to_original(self.current_index) if 0 <= self.current_index < self._size else -1
+            if not self.is_shuffled and self._perm is None:
+                self._build_permutation()
+            self.is_shuffled = not self.is_shuffled
+            if current >= 0:
+                self.current_index = self._to_view(current)
+
+    def reshuffle(self):
+        """Draw a fresh shuffled order (current song first) and enable shuffle"""
+        with self._lock:
+            current = self._to_original(self.current_index) if 0 <= self.current_index < self._size else -1
+            self.is_shuffled = False
+            self.current_index = current
+            self._build_permutation()
+            self.is_shuffled = True
+            if current >= 0:
+                self.current_index = self._to_view(current)
 
     def get_current_index(self):
         """Get the current song index"""
@@ -85,7 +286,7 @@ class Playlist:
 
     def get_song_count(self):
         """Get the total number of songs in the playlist"""
-        return len(self.songs)
+        return self._size
 
     def toggle_repeat(self):
         """Toggle through repeat modes: none -> all -> one -> none"""
@@ -101,6 +302,5 @@ class Playlist:
         """Get the current song name without path and extension"""
         song = self.get_current_song()
         if song:
-            import os
             return os.path.splitext(os.path.basename(song[0]))[0]
-        return "No song"
\ No newline at end of file
+        return "No song"
@@ -0,0 +1,237 @@
+"""Recording and deterministic replay of display sessions (main.py --record / --replay)"""
+
+import json
+import os
+import struct
+import threading
+import time
+import numpy as np
+from mixer_backend import SystemClock, VirtualClock
+
+MAGIC = b"PLRS"
+VERSION = 3
+HEADER = struct.Struct('<4sHH')  # magic, version, number of bands
+RECORD = struct.Struct('<Bd')  # kind, seconds since the recording started
+
+# Record kinds and their payloads
+EQ = 1  # <ff seconds until the frame is due, stereo correlation, then one uint8 per band for the mix, left and right
+CLOCK = 2  # <ff playback position, track length
+LINE = 3  # <i line index, then text and color (length-prefixed UTF-8)
+RESET = 4  # No payload: lyrics cleared for a new song
+SONG = 5  # Song info as length-prefixed JSON
+VOLUME = 6  # <f volume
+MODE = 7  # Visualization mode name
+FRAME = 8  # <If bytes written, seconds spent building and writing the frame
+# Key presses are not recorded: what they change on screen arrives as SONG,
+# VOLUME, MODE and CLOCK records, so replaying them would apply it twice
+
+EQ_PAYLOAD = struct.Struct('<ff')
+EQ_ROWS = 3  # Mix, left, right
+CLOCK_PAYLOAD = struct.Struct('<ff')
+LINE_PAYLOAD = struct.Struct('<i')
+VOLUME_PAYLOAD = struct.Struct('<f')
+FRAME_PAYLOAD = struct.Struct('<If')
+SHORT_LENGTH = struct.Struct('<H')
+LONG_LENGTH = struct.Struct('<I')
+
+
+def _pack_text(text, length=SHORT_LENGTH):
+    data = text.encode('utf-8')
+    return length.pack(len(data)) + data
+
+
+def _unpack_text(f, length=SHORT_LENGTH):
+    size, = length.unpack(f.read(length.size))
+    return f.read(size).decode('utf-8')
+
+
+class SessionRecorder:
+    """Appends what the display receives, and how long its frames take, to a binary file.
+
+    LyricsDisplay calls the record_* methods from its producer methods
+    (set `display.recorder`), so a recording holds exactly the inputs the
+    renderer saw: clock samples, analysis frames (bands quantized to one
+    byte), lyric lines with their color, song changes, volume and
+    visualization modes, plus the bytes and time of every frame drawn.
+    Record times come from `clock`, which must be the display's clock (the
+    player's): EQ frames are stored relative to it.
+    """
+
+    def __init__(self, path, num_bands, clock=None):
+        self.path = path
+        self.num_bands = num_bands
+        self.clock = clock or SystemClock()
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, num_bands))
+        self._start = self.clock.now()
+        self._lock = threading.Lock()  # Producers run on the player and render threads
+
+    def _write(self, kind, payload=b""):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(kind, self.clock.now() - self._start) + payload)
+
+    def record_eq(self, frame, timestamp, correlation=1.0):
+        levels = (np.clip(frame, 0.0, 1.0) * 255 + 0.5).astype(np.uint8).tobytes()
+        self._write(EQ, EQ_PAYLOAD.pack(timestamp - self.clock.now(), correlation) + levels)
+
+    def record_clock(self, current_time, total_time):
+        self._write(CLOCK, CLOCK_PAYLOAD.pack(current_time, total_time))
+
+    def record_line(self, line_idx, typing_line):
+        text, color = typing_line or ("", "")
+        self._write(LINE, LINE_PAYLOAD.pack(line_idx) + _pack_text(text) + _pack_text(color))
+
+    def record_reset(self):
+        self._write(RESET)
+
+    def record_song(self, song_info):
+        self._write(SONG, _pack_text(json.dumps(song_info, ensure_ascii=False), LONG_LENGTH))
+
+    def record_volume(self, volume):
+        self._write(VOLUME, VOLUME_PAYLOAD.pack(volume))
+
+    def record_mode(self, mode):
+        self._write(MODE, _pack_text(mode))
+
+    def record_frame(self, frame_bytes, seconds):
+        self._write(FRAME, FRAME_PAYLOAD.pack(frame_bytes, seconds))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_session(path):
+    """(number of bands, generator of (seconds, kind, value)) for a recording"""
+    f = open(path, 'rb')
+    magic, version, num_bands = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        f.close()
+        raise ValueError(f"{path} no es una grabación de sesión compatible")
+
+    def records():
+        with f:
+            while True:
+                head = f.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return  # End of file (or a recording cut short)
+                kind, seconds = RECORD.unpack(head)
+                if kind == EQ:
+                    ahead, correlation = EQ_PAYLOAD.unpack(f.read(EQ_PAYLOAD.size))
+                    levels = np.frombuffer(f.read(EQ_ROWS * num_bands), dtype=np.uint8)
+                    value = (ahead, levels.reshape(EQ_ROWS, num_bands) / 255.0, correlation)
+                elif kind == CLOCK:
+                    value = CLOCK_PAYLOAD.unpack(f.read(CLOCK_PAYLOAD.size))
+                elif kind == LINE:
+                    line_idx, = LINE_PAYLOAD.unpack(f.read(LINE_PAYLOAD.size))
+                    text, color = _unpack_text(f), _unpack_text(f)
+                    value = (line_idx, (text, color) if color else None)
+                elif kind == SONG:
+                    value = json.loads(_unpack_text(f, LONG_LENGTH))
+                elif kind == VOLUME:
+                    value, = VOLUME_PAYLOAD.unpack(f.read(VOLUME_PAYLOAD.size))
+                elif kind == MODE:
+                    value = _unpack_text(f)
+                elif kind == FRAME:
+                    value = FRAME_PAYLOAD.unpack(f.read(FRAME_PAYLOAD.size))
+                elif kind == RESET:
+                    value = None
+                else:
+                    raise ValueError(f"Registro desconocido {kind} en {path}")
+                yield seconds, kind, value
+
+    return num_bands, records()
+
+
+def _frame_stats(seconds):
+    """'n cuadros, media/p95/máx ms' for a list of frame times"""
+    if not seconds:
+        return "0 cuadros"
+    ordered = sorted(seconds)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"{len(ordered)} cuadros, media {sum(ordered) / len(ordered) * 1000:.2f} ms, "
+            f"p95 {p95 * 1000:.2f} ms, máx {ordered[-1] * 1000:.2f} ms")
+
+
+def replay_session(path, fast=False, headless=False):
+    """Drive a LyricsDisplay from a recording, on a virtual clock.
+
+    Frames are drawn at the display's frame interval between the recorded
+    events, so the same recording always produces the same frames; with
+    `fast` nothing waits for the wall clock. Returns a report comparing
+    the replayed frame times with the recorded ones.
+    """
+    from lyrics_display import LyricsDisplay
+
+    num_bands, records = read_session(path)
+    clock = VirtualClock()
+    output = open(os.devnull, 'w') if headless else None
+    display = LyricsDisplay(num_eq_bands=num_bands, output=output, clock=clock)
+    recorded_frames, replayed_frames = [], []
+    wall_start = time.perf_counter()
+    next_frame = [0.0]
+
+    def draw_until(seconds):
+        # The replay sets the frame cadence itself, so every step is drawn
+        while next_frame[0] <= seconds:
+            clock.advance_to(next_frame[0])
+            if not fast:
+                delay = wall_start + next_frame[0] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            display.last_refresh_time = float('-inf')
+            start = time.perf_counter()
+            display.render_frame()
+            replayed_frames.append(time.perf_counter() - start)
+            next_frame[0] += display.output_budget.frame_interval
+        clock.advance_to(seconds)
+
+    display.start(animate=False)
+    try:
+        for seconds, kind, value in records:
+            draw_until(seconds)
+            if kind == EQ:
+                ahead, frame, correlation = value
+                display.update_eq(frame[0], seconds + ahead, frame[1:], correlation)
+            elif kind == CLOCK:
+                display.update_progress(*value)
+            elif kind == LINE:
+                display.show_line(*value)
+            elif kind == RESET:
+                display.reset_lyrics()
+            elif kind == SONG:
+                display.update_song_info(value)
+            elif kind == VOLUME:
+                display.update_volume_display(value)
+            elif kind == MODE:
+                display.set_visualization_mode(value)
+            elif kind == FRAME:
+                recorded_frames.append(value[1])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        display.stop()
+        if output:
+            output.close()
+
+    return (f"Grabado:     {_frame_stats(recorded_frames)}\n"
+            f"Reproducido: {_frame_stats(replayed_frames)} en {time.perf_counter() - wall_start:.1f} s")
+
+
+def main():
+    """main.py --replay FILE [--fast] [--headless]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay a recorded display session without audio")
+    parser.add_argument("--replay", required=True, metavar="FILE", help="recording made with --record")
+    parser.add_argument("--fast", action="store_true", help="do not wait for the recorded timing")
+    parser.add_argument("--headless", action="store_true", help="discard the terminal output")
+    args, _ = parser.parse_known_args()
+    print(replay_session(args.replay, fast=args.fast, headless=args.headless))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Headless end-to-end playback of a playlist on a virtual clock (main.py --simulate)"""
+
+import os
+import time
+from mixer_backend import FakeMixer, VirtualClock
+
+POLL_SECONDS = 0.1  # Virtual time between checks of the player, like the key loop in main.py
+
+
+class SyncProbe:
+    """Display recorder (see LyricsDisplay.recorder) that checks lyric sync and counts frames.
+
+    Each lyric line shown is compared with its LRC time at the playback
+    position the engine reports at that moment: lines shown early, late
+    or skipped show up in the report.
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.tracks = 0
+        self.analysis_frames = 0
+        self.lines = 0
+        self.skipped = 0
+        self.early = 0
+        self.lags = []
+        self.frame_seconds = []
+        self._line_idx = -1
+
+    def record_line(self, line_idx, typing_line):
+        lyrics = self.player.lyrics
+        if not lyrics or not 0 <= line_idx < len(lyrics):
+            return
+        _, position_ms = self.player.engine.get_position()
+        lyric = lyrics[line_idx]
+        lag = position_ms / 1000.0 - (lyric.minutes * 60 + lyric.seconds + lyric.milliseconds / 1000.0)
+        self.lines += 1
+        if lag < 0:
+            self.early += 1
+        self.lags.append(lag)
+        if line_idx > self._line_idx + 1:
+            self.skipped += line_idx - self._line_idx - 1
+        self._line_idx = line_idx
+
+    def record_reset(self):
+        self._line_idx = -1
+
+    def record_song(self, song_info):
+        self.tracks += 1
+
+    def record_eq(self, frame, timestamp, correlation=1.0):
+        self.analysis_frames += 1
+
+    def record_frame(self, frame_bytes, seconds):
+        self.frame_seconds.append(seconds)
+
+    def record_clock(self, current_time, total_time):
+        pass
+
+    def record_volume(self, volume):
+        pass
+
+    def record_mode(self, mode):
+        pass
+
+    def report(self, virtual_seconds, wall_seconds):
+        """Summary of the run"""
+        lines = [f"{self.tracks} pistas, {virtual_seconds:.1f} s de audio en {wall_seconds:.1f} s "
+                 f"(x{virtual_seconds / max(wall_seconds, 1e-9):.1f})",
+                 f"Análisis: {self.analysis_frames} cuadros"]
+        if self.frame_seconds:
+            frames = sorted(self.frame_seconds)
+            lines.append(f"Pantalla: {len(frames)} cuadros, media {sum(frames) / len(frames) * 1000:.2f} ms, "
+                         f"máx {frames[-1] * 1000:.2f} ms")
+        if self.lags:
+            lines.append(f"Letras: {self.lines} líneas, retraso medio {sum(self.lags) / len(self.lags) * 1000:.0f} ms, "
+                         f"máx {max(self.lags) * 1000:.0f} ms, {self.early} antes de tiempo, {self.skipped} saltadas")
+        return "\n".join(lines)
+
+
+def simulate_playlist(song_pairs):
+    """Play every (song, lyrics) pair to the end on a FakeMixer; returns (SyncProbe, audio seconds).
+
+    Each track is loaded, played and, when it ends, followed by next_track(),
+    as a listener would; the gapless engine moves on by itself. Decoding,
+    analysis and rendering run for real, only the waiting is skipped, and
+    the threads take turns on the clock, so every run gives the same report
+    (apart from the measured frame times).
+    """
+    from player import MusicPlayer
+    from playlist import Playlist
+
+    clock = VirtualClock()
+    output = open(os.devnull, 'w')
+    player = MusicPlayer(playlist=Playlist(songs=list(song_pairs)), mixer=FakeMixer(clock), clock=clock,
+                         display_output=output)
+    player.normalize_loudness = False  # Measuring loudness is not playback work
+    probe = SyncProbe(player)
+    player.lyrics_display.recorder = probe
+
+    clock.attach()
+    try:
+        player.playlist.set_current_index(0)
+        player.load_song(*song_pairs[0])
+        player.play()
+        analysis_thread = player.analysis_thread
+        while True:
+            clock.sleep(POLL_SECONDS)
+            # Move on once the track has ended and its analysis thread has finished stopping
+            if player.stopped:
+                clock.join(analysis_thread)
+                if not player.next_track():
+                    break
+                analysis_thread = player.analysis_thread
+    finally:
+        player.close()
+        clock.detach()
+        output.close()
+    return probe, clock.now()
+
+
+def main():
+    """main.py --simulate [--limit N]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Play the library headless on a virtual clock")
+    parser.add_argument("--limit", type=int, default=None, help="number of songs to play")
+    args, _ = parser.parse_known_args()
+
+    from utils import get_available_songs
+    song_pairs = get_available_songs()[:args.limit]
+    if not song_pairs:
+        print("No se encontraron canciones para simular.")
+        return
+    start = time.perf_counter()
+    probe, audio_seconds = simulate_playlist(song_pairs)
+    print(probe.report(audio_seconds, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
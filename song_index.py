@@ -0,0 +1,208 @@
+"""Prefix/trigram search index over song titles, artists and albums"""
+
+import os
+import threading
+import unicodedata
+import numpy as np
+from config import SONGS_DIR
+
+VERIFY_LIMIT = 1000  # Intersection stops once this few candidates remain; they are then checked directly
+REBUILD_THRESHOLD = 1000  # Songs added since the last build that are scanned linearly
+
+_WORD_START = 0x1FFFFF  # Not a valid code point: marks one-character word-prefix grams
+_SPACE = ord(' ')
+
+
+def fold_text(text):
+    """Lowercase and strip accents so 'Canción' matches 'cancion'"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def song_fields(song_path):
+    """Derive (title, artist, album) from the file name and its folders.
+
+    Files named 'Artist - Title' provide the artist; otherwise the folders
+    below the songs directory are read as artist/album.
+    """
+    stem = os.path.splitext(os.path.basename(song_path))[0]
+    title, artist, album = stem, "", ""
+    if " - " in stem:
+        artist, title = stem.split(" - ", 1)
+
+    songs_root = os.path.join(SONGS_DIR, "")
+    if song_path.startswith(songs_root):
+        folders = song_path[len(songs_root):].split(os.sep)[:-1]
+        if folders:
+            artist = artist or folders[0]
+            album = folders[1] if len(folders) > 1 else ""
+    return title, artist, album
+
+
+def _gram_code(a, b, c):
+    """Pack three code points (21 bits each) into one int64"""
+    return (np.int64(a) << 42) | (np.int64(b) << 21) | np.int64(c)
+
+
+def _query_grams(word):
+    """Gram codes that every key containing `word` must also contain"""
+    if len(word) == 1:
+        return [_gram_code(_SPACE, ord(word), _WORD_START)]
+    if len(word) == 2:
+        word = ' ' + word  # Short words match as word prefixes
+    return list({_gram_code(ord(word[i]), ord(word[i + 1]), ord(word[i + 2]))
+                 for i in range(len(word) - 2)})
+
+
+class SongIndex:
+    """Incremental search over a song list.
+
+    Every song gets a folded search key (' title artist album'). The index
+    is a CSR table: sorted unique gram codes, offsets, and one int32 array of
+    song IDs, built in a single vectorized pass. A query intersects the
+    posting slices of its grams (smallest first, via a scratch mask), so a lookup
+    touches a few arrays rather than every title. Songs added after the last
+    build are kept in a short pending list, searched linearly, until the next
+    rebuild; rebuild_in_background() swaps the new table in when it is ready,
+    so searches never wait for it.
+    """
+
+    def __init__(self, songs=()):
+        self._keys = []
+        # (gram codes, offsets, song IDs, number of songs indexed), replaced as a whole
+        self._table = (np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), 0)
+        self._mask = np.zeros(0, dtype=bool)  # Scratch membership mask reused by every query
+        self._last = None  # (needles, grams, results, table) of the previous query
+        self._build_thread = None
+        for song_path, _ in songs:
+            self.add(song_path)
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, song_path, fields=None):
+        """Index a song and return its ID (its position in the song list)"""
+        # Leading space makes every word start visible as ' ' + first letters
+        key = ' ' + fold_text(' '.join(f for f in (fields or song_fields(song_path)) if f))
+        self._keys.append(key)
+        return len(self._keys) - 1
+
+    def rebuild(self):
+        """Build the CSR gram table over every key in one vectorized pass"""
+        keys = self._keys[:]  # Songs may still be added while this runs
+        if keys:
+            self._table = self._build_table(keys)
+
+    def rebuild_in_background(self, wait_for=None):
+        """Rebuild in a daemon thread (once `wait_for` is set), unless a rebuild is already running"""
+        if self._build_thread is not None and self._build_thread.is_alive():
+            return
+
+        def build():
+            if wait_for is not None:
+                wait_for.wait()
+            self.rebuild()
+
+        self._build_thread = threading.Thread(target=build, daemon=True)
+        self._build_thread.start()
+
+    @staticmethod
+    def _build_table(keys):
+        """(gram codes, offsets, song IDs, number of keys) for a list of keys"""
+        # All keys in one code point array, separated by NUL
+        codes = np.frombuffer('\0'.join(keys).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        owners = np.repeat(np.arange(len(keys), dtype=np.int32),
+                           np.fromiter((len(k) + 1 for k in keys), dtype=np.int64, count=len(keys)))[:len(codes)]
+        separator = codes == 0
+
+        valid = ~(separator[:-2] | separator[1:-1] | separator[2:])
+        trigram_codes = (codes[:-2] << 42 | codes[1:-1] << 21 | codes[2:])[valid]
+        trigram_owners = owners[:-2][valid]
+
+        word_start = (codes[:-1] == _SPACE) & ~separator[1:] & (codes[1:] != _SPACE)
+        prefix_codes = (_SPACE << 42 | codes[1:] << 21 | _WORD_START)[word_start]
+        prefix_owners = owners[:-1][word_start]
+
+        all_codes = np.concatenate((trigram_codes, prefix_codes))
+        all_owners = np.concatenate((trigram_owners, prefix_owners))
+        order = np.lexsort((all_owners, all_codes))
+        all_codes, all_owners = all_codes[order], all_owners[order]
+
+        # Drop repeated (gram, song) pairs, then cut the table at gram changes
+        keep = np.ones(len(all_codes), dtype=bool)
+        keep[1:] = (all_codes[1:] != all_codes[:-1]) | (all_owners[1:] != all_owners[:-1])
+        all_codes, ids = all_codes[keep], all_owners[keep]
+        starts = np.flatnonzero(np.concatenate(([True], all_codes[1:] != all_codes[:-1])))
+        return all_codes[starts], np.append(starts, len(all_codes)), ids, len(keys)
+
+    @staticmethod
+    def _posting(table, code):
+        gram_codes, offsets, ids, _ = table
+        slot = np.searchsorted(gram_codes, code)
+        if slot == len(gram_codes) or gram_codes[slot] != code:
+            return ids[:0]
+        return ids[offsets[slot]:offsets[slot + 1]]
+
+    def _intersect(self, postings, indexed):
+        """Intersect sorted ID arrays, smallest first; returns (IDs, whether every posting was applied)"""
+        postings = sorted(postings, key=len)
+        result = postings[0]
+        if len(self._mask) < len(self._keys):
+            self._mask = np.zeros(len(self._keys), dtype=bool)
+        for posting in postings[1:]:
+            if len(result) <= VERIFY_LIMIT:
+                return result, False  # Cheaper to check the few left directly
+            if len(posting) >= indexed:
+                continue  # Gram shared by every song: nothing to filter
+            if len(posting) > 4 * len(result):
+                # Few IDs against a huge posting: binary search beats marking it
+                slots = np.minimum(np.searchsorted(posting, result), len(posting) - 1)
+                result = result[posting[slots] == result]
+            else:
+                self._mask[posting] = True
+                result = result[self._mask[result]]
+                self._mask[posting] = False
+        return result, True
+
+    def _matches(self, song_id, needles):
+        key = self._keys[song_id]
+        return all(needle in key for needle in needles)
+
+    def search(self, query):
+        """Return the sorted IDs of songs whose key contains every query word"""
+        words = fold_text(query).split()
+        if not words:
+            return np.arange(len(self._keys), dtype=np.int32)
+        table = self._table
+        indexed = table[3]
+        if len(self._keys) - indexed > REBUILD_THRESHOLD:
+            self.rebuild_in_background()  # Until it is swapped in, the pending songs are scanned
+
+        needles = [word if len(word) > 2 else ' ' + word for word in words]
+        grams = {code for word in words for code in _query_grams(word)}
+        if self._last is not None and self._last[3] is table and all(
+                any(previous in needle for needle in needles) for previous in self._last[0]):
+            # The query only got stricter (one more key typed): start from the
+            # previous results and intersect just the grams that are new
+            _, last_grams, last_results, _ = self._last
+            base = last_results[last_results < indexed]
+            postings = [base] + [self._posting(table, code) for code in grams - last_grams]
+        else:
+            postings = [self._posting(table, code) for code in grams]
+        candidates, complete = self._intersect(postings, indexed)
+
+        # A word of up to three letters is exactly one gram, so once every
+        # posting is applied the candidates are the matches; anything else
+        # (a longer word, or an intersection cut short) is checked key by key
+        if not complete or any(len(word) > 3 for word in words):
+            candidates = np.array([i for i in candidates if self._matches(i, needles)], dtype=np.int32)
+
+        pending = [i for i in range(indexed, len(self._keys)) if self._matches(i, needles)]
+        if pending:
+            candidates = np.concatenate((candidates, np.array(pending, dtype=np.int32)))
+
+        self._last = (needles, grams, candidates, table)
+        return candidates
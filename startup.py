@@ -0,0 +1,44 @@
+"""Startup timing report for the music player (enable with --startup-report)"""
+
+import os
+import sys
+import threading
+import time
+
+# Imported first by main.py, so times are measured from the start of the program's own imports
+START_TIME = time.perf_counter()
+HEAVY_MODULES = ("numpy", "pygame", "pydub", "mutagen", "pylrc", "rich.live", "rich.table", "rich.layout")
+
+_marks = []
+
+
+def enabled():
+    """The report is printed with --startup-report or PLAYER_STARTUP_REPORT=1"""
+    return "--startup-report" in sys.argv or bool(os.environ.get("PLAYER_STARTUP_REPORT"))
+
+
+def mark(label):
+    """Record the elapsed time and which heavy modules are loaded at this point"""
+    _marks.append((label, time.perf_counter() - START_TIME, len(sys.modules),
+                   [name for name in HEAVY_MODULES if name in sys.modules]))
+
+
+def mark_when_set(event, label):
+    """Record a mark from a daemon thread once `event` is set"""
+    def wait_and_mark():
+        event.wait()
+        mark(label)
+
+    thread = threading.Thread(target=wait_and_mark)
+    thread.daemon = True
+    thread.start()
+
+
+def format_report():
+    """Format the recorded marks as a small table"""
+    lines = ["Informe de arranque:"]
+    for label, elapsed, module_count, heavy in sorted(_marks, key=lambda m: m[1]):
+        lines.append(f"  {elapsed * 1000:8.1f} ms  {label:<30} {module_count:4d} módulos  "
+                     f"pesados: {', '.join(heavy) or '-'}")
+    lines.append("  Detalle por módulo: python -X importtime main.py")
+    return "\n".join(lines)
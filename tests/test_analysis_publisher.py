@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import unittest
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_publisher import HEADER, MAGIC, VERSION, AnalysisPublisher, AnalysisReader
+
+NUM_BANDS = 8
+SLOTS = 4
+
+
+def leave_block(name, owner):
+    """A block as another player would leave it: header written, owned by `owner`, not tracked here"""
+    block = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + 1024)
+    resource_tracker.unregister(block._name, "shared_memory")
+    HEADER.pack_into(block.buf, 0, MAGIC, VERSION, NUM_BANDS, SLOTS, 64, owner)
+    block.close()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class AnalysisPublisherTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"plan_test_{os.getpid()}_{self._testMethodName[-20:]}"
+
+    def publisher(self):
+        publisher = AnalysisPublisher(NUM_BANDS, name=self.name, slots=SLOTS, socket_path=None)
+        self.addCleanup(publisher.close)
+        return publisher
+
+    def reader(self):
+        reader = AnalysisReader(self.name)
+        # The reader drops the block from the resource tracker, which this
+        # process shares with the publisher: register it again for close()
+        resource_tracker.register(reader._block._name, "shared_memory")
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_reader_sees_the_latest_frame(self):
+        publisher = self.publisher()
+        reader = self.reader()
+        self.assertIsNone(reader.read())
+
+        frames = 10
+        for n in range(1, frames + 1):
+            publisher.publish(np.full(NUM_BANDS, n / 10.0), position=n * 0.1, duration=3.0, line=n // 3,
+                              timestamp=100.0 + n)
+            self.assertEqual(reader.sequence, n)
+
+        latest = reader.read(copy=True)
+        self.assertEqual(latest['seq'], frames)
+        self.assertAlmostEqual(latest['position'], 1.0)
+        self.assertEqual(latest['line'], frames // 3)
+        self.assertEqual(latest['timestamp'], 100.0 + frames)
+        np.testing.assert_allclose(latest['bands'], np.full(NUM_BANDS, 1.0))
+
+        # Only the ring is kept; the oldest slot counts as being overwritten
+        self.assertIsNone(reader.read(frames - SLOTS))
+        self.assertEqual([frame['seq'] for frame in reader.frames_since(0)], list(range(frames - SLOTS + 2, frames + 1)))
+
+        publisher.publish(None, position=1.1, duration=3.0, line=3)  # No new analysis: bands repeat
+        np.testing.assert_allclose(reader.read()['bands'], np.full(NUM_BANDS, 1.0))
+
+    def test_block_of_a_running_player_is_not_taken_over(self):
+        leave_block(self.name, os.getppid())  # Alive, and not this process
+        try:
+            with self.assertRaises(RuntimeError):
+                AnalysisPublisher(NUM_BANDS, name=self.name, slots=SLOTS, socket_path=None)
+            reader = AnalysisReader(self.name)  # Still there, untouched
+            self.assertEqual(HEADER.unpack_from(reader._block.buf, 0)[5], os.getppid())
+            reader.close()
+        finally:
+            block = shared_memory.SharedMemory(name=self.name)
+            block.close()
+            block.unlink()
+
+    def test_block_left_by_a_dead_player_is_reclaimed(self):
+        leave_block(self.name, dead_pid())
+        publisher = self.publisher()
+        publisher.publish(np.ones(NUM_BANDS), position=0.5, duration=3.0, line=0)
+
+        reader = self.reader()
+        self.assertEqual(HEADER.unpack_from(reader._block.buf, 0)[5], os.getpid())
+        self.assertEqual(len(reader.slots), SLOTS)
+        self.assertEqual(reader.read()['seq'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_cache import AnalysisCache
+from loudness import integrated_loudness
+
+SAMPLE_RATE = 48000
+
+
+def sine(dbfs, seconds=5.0, frequency=997.0, channels=2):
+    """A sine whose peak is `dbfs`, repeated on every channel"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 10 ** (dbfs / 20.0) * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(tone[:, None], channels, axis=1)
+
+
+class IntegratedLoudnessTest(unittest.TestCase):
+    def test_stereo_sine_reads_its_level(self):
+        # BS.1770: a 997 Hz sine reads -3.01 LUFS per channel at 0 dBFS, so two channels read its dBFS
+        for dbfs in (-6.0, -20.0, -35.0):
+            self.assertAlmostEqual(integrated_loudness(sine(dbfs), SAMPLE_RATE), dbfs, delta=0.5)
+
+    def test_single_channel_sine(self):
+        samples = sine(-20.0)
+        samples[:, 1] = 0.0
+        self.assertAlmostEqual(integrated_loudness(samples, SAMPLE_RATE), -23.01, delta=0.5)
+
+    def test_gating_ignores_silence(self):
+        tone = sine(-20.0)
+        padded = np.concatenate([np.zeros_like(tone), tone, np.zeros((10 * SAMPLE_RATE, 2))])
+        # Ungated, 15 s of silence would pull this down to about -26 LUFS; only the
+        # blocks straddling the edges of the tone count partly
+        self.assertAlmostEqual(integrated_loudness(padded, SAMPLE_RATE), -20.0, delta=0.5)
+
+    def test_quiet_passages_below_relative_gate_are_ignored(self):
+        loud = sine(-20.0)
+        quiet = sine(-50.0, seconds=10.0)
+        mixed = np.concatenate([loud, quiet])
+        self.assertAlmostEqual(integrated_loudness(mixed, SAMPLE_RATE), -20.0, delta=0.5)
+
+    def test_silence_and_short_audio_have_no_loudness(self):
+        self.assertIsNone(integrated_loudness(np.zeros((5 * SAMPLE_RATE, 2)), SAMPLE_RATE))
+        self.assertIsNone(integrated_loudness(sine(-20.0, seconds=0.2), SAMPLE_RATE))
+
+
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.song_path = os.path.join(self._tmp.name, "song.wav")
+        with open(self.song_path, "wb") as f:
+            f.write(b"\0" * 100)
+        self.cache_path = os.path.join(self._tmp.name, "analysis.json")
+        self.cache = AnalysisCache(self.cache_path)
+        self.cache.update(self.song_path, loudness_lufs=-14.5)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_entry_survives_reload(self):
+        self.assertEqual(AnalysisCache(self.cache_path).get(self.song_path, 'loudness_lufs'), -14.5)
+
+    def test_mtime_change_invalidates(self):
+        stat = os.stat(self.song_path)
+        os.utime(self.song_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertIsNone(self.cache.get(self.song_path, 'loudness_lufs'))
+        self.assertIsNone(AnalysisCache(self.cache_path).get(self.song_path))
+
+    def test_size_change_invalidates(self):
+        stat = os.stat(self.song_path)
+        with open(self.song_path, "ab") as f:
+            f.write(b"\0")
+        os.utime(self.song_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Same mtime, new size
+        self.assertIsNone(self.cache.get(self.song_path, 'loudness_lufs'))
+
+    def test_update_after_change_replaces_stale_values(self):
+        with open(self.song_path, "ab") as f:
+            f.write(b"\0")
+        self.cache.update(self.song_path, peak=0.5)
+        self.assertEqual(self.cache.get(self.song_path), {'signature': [101, os.stat(self.song_path).st_mtime_ns],
+                                                         'peak': 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playlist import Playlist
+
+
+def make_playlist(count=14):
+    return Playlist(songs=[(f"s{i}.mp3", f"s{i}.lrc") for i in range(count)])
+
+
+class RemoveSongTest(unittest.TestCase):
+    def test_shuffled_removal_keeps_current_song(self):
+        for removed in range(14):
+            playlist = make_playlist()
+            playlist.set_current_index(3)
+            playlist.shuffle()
+            for _ in range(5):
+                playlist.get_next_song()
+            current = playlist.get_current_song()
+            removed_song = playlist.songs[removed]
+
+            playlist.remove_song(removed)
+
+            self.assertNotIn(removed_song[0], playlist)
+            if removed_song != current:
+                self.assertEqual(playlist.get_current_song(), current)
+            self.assertEqual(len(playlist), 13)
+
+    def test_unshuffle_after_removal_keeps_current_song(self):
+        playlist = make_playlist()
+        playlist.set_current_index(0)
+        playlist.shuffle()
+        playlist.get_next_song()
+        current = playlist.get_current_song()
+        playlist.remove_song(playlist.index_of(current[0]) - 1)
+        playlist.shuffle()
+        self.assertEqual(playlist.get_current_song(), current)
+
+    def test_removed_slots_are_reused(self):
+        playlist = make_playlist()
+        for _ in range(3):
+            playlist.remove_song(0)
+            playlist.add_song("new.mp3", "new.lrc")
+            playlist.remove_song_by_path("new.mp3")
+        playlist.add_songs([(f"n{i}.mp3", f"n{i}.lrc") for i in range(5)])
+        self.assertEqual(len(playlist._library), 16)
+        self.assertEqual(len(playlist), 16)
+        self.assertEqual(playlist.songs[-5:], [(f"n{i}.mp3", f"n{i}.lrc") for i in range(5)])
+        self.assertEqual(playlist.get_lyrics_path("n0.mp3"), "n0.lrc")
+
+
+if __name__ == "__main__":
+    unittest.main()
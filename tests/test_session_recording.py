@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mixer_backend import VirtualClock
+from session_recording import (CLOCK, EQ, FRAME, LINE, MODE, RESET, SONG, VOLUME, SessionRecorder,
+                               read_session, replay_session)
+
+NUM_BANDS = 8
+
+
+class SessionRecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, "sesion.plrs")
+
+    def record_session(self):
+        """Drive a display on a virtual clock with its recorder attached; returns the bands sent"""
+        from lyrics_display import LyricsDisplay
+
+        clock = VirtualClock(start=50.0)  # Recording times are relative to the recorder's start
+        output = open(os.devnull, "w")
+        self.addCleanup(output.close)
+        display = LyricsDisplay(num_eq_bands=NUM_BANDS, output=output, clock=clock)
+        display.recorder = recorder = SessionRecorder(self.path, NUM_BANDS, clock=clock)
+        bands = np.linspace(0.0, 1.0, NUM_BANDS)
+        self.mode = display.get_next_visualization_mode()
+
+        display.start(animate=False)
+        try:
+            display.update_song_info({'title': "Canción", 'artist': "Artista"})
+            clock.advance_to(50.5)
+            display.update_eq(bands, clock.now() + 0.1, (bands, bands[::-1]), correlation=0.25)
+            display.update_progress(0.5, 180.0)
+            clock.advance_to(51.0)
+            display.show_line(0, ("Primera línea", "bright_cyan"))
+            display.update_volume_display(0.75)
+            display.set_visualization_mode(self.mode)
+            display.render_frame()
+            clock.advance_to(52.0)
+            display.reset_lyrics()
+        finally:
+            display.stop()
+            recorder.close()
+        return bands
+
+    def test_record_and_read_back_every_kind(self):
+        bands = self.record_session()
+        num_bands, records = read_session(self.path)
+        self.assertEqual(num_bands, NUM_BANDS)
+        records = list(records)
+        by_kind = {kind: (seconds, value) for seconds, kind, value in records}
+
+        # Every record is stamped with the recorder's clock, not the wall clock
+        self.assertEqual(by_kind[SONG], (0.0, {'title': "Canción", 'artist': "Artista"}))
+        seconds, (ahead, frame, correlation) = by_kind[EQ]
+        self.assertEqual(seconds, 0.5)
+        self.assertAlmostEqual(ahead, 0.1, places=6)
+        self.assertAlmostEqual(correlation, 0.25)
+        np.testing.assert_allclose(frame, [bands, bands, bands[::-1]], atol=0.5 / 255)  # One byte per band
+        self.assertEqual(by_kind[CLOCK][0], 0.5)
+        np.testing.assert_allclose(by_kind[CLOCK][1], (0.5, 180.0))
+        self.assertEqual(by_kind[LINE], (1.0, (0, ("Primera línea", "bright_cyan"))))
+        self.assertEqual(by_kind[VOLUME], (1.0, 0.75))
+        self.assertEqual(by_kind[MODE], (1.0, self.mode))
+        self.assertEqual(by_kind[FRAME][0], 1.0)
+        self.assertGreater(by_kind[FRAME][1][0], 0)  # Bytes written
+        self.assertEqual(by_kind[RESET], (2.0, None))
+        self.assertEqual([seconds for seconds, _, _ in records], sorted(seconds for seconds, _, _ in records))
+
+    def test_replay_draws_the_recorded_session(self):
+        self.record_session()
+        report = replay_session(self.path, fast=True, headless=True)
+        self.assertIn("Grabado:     1 cuadros", report)
+        # One frame per interval of the display's frame rate over the 2 s recorded
+        replayed = int(report.split("Reproducido: ")[1].split(" cuadros")[0])
+        self.assertGreater(replayed, 1)
+
+    def test_incompatible_file_is_rejected(self):
+        with open(self.path, "wb") as f:
+            f.write(b"PLRS\x02\x00\x08\x00")
+        with self.assertRaises(ValueError):
+            read_session(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import playback_engine
+from mixer_backend import FakeMixer, VirtualClock
+from playlist import Playlist
+from simulation import SyncProbe, simulate_playlist
+
+LINE_TIMES = (0.5, 1.5, 2.5, 3.5)
+
+
+def write_track(directory, name, seconds=4.0, frequency=440.0, sample_rate=44100):
+    """A stereo 16-bit sine WAV plus an LRC with a line at each of LINE_TIMES"""
+    song_path = os.path.join(directory, f"{name}.wav")
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = (0.3 * 32767 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+    with wave.open(song_path, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(np.repeat(tone[:, None], 2, axis=1).tobytes())
+    lyrics_path = os.path.join(directory, f"{name}.lrc")
+    with open(lyrics_path, "w", encoding="utf-8") as out:
+        for i, start in enumerate(LINE_TIMES):
+            out.write(f"[00:{start:05.2f}]{name} línea {i}\n")
+    return song_path, lyrics_path
+
+
+def expected_line(position_seconds):
+    return sum(1 for start in LINE_TIMES if position_seconds >= start) - 1
+
+
+class SimulationTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.songs = [write_track(self._tmp.name, "a", frequency=440.0),
+                      write_track(self._tmp.name, "b", frequency=660.0)]
+        self._engine = playback_engine.PLAYBACK_ENGINE
+
+    def tearDown(self):
+        playback_engine.PLAYBACK_ENGINE = self._engine
+        self._tmp.cleanup()
+
+    def test_lyrics_follow_virtual_time_through_pause_and_next_track(self):
+        from player import MusicPlayer
+
+        clock = VirtualClock()
+        output = open(os.devnull, "w")
+        player = MusicPlayer(playlist=Playlist(songs=list(self.songs)), mixer=FakeMixer(clock), clock=clock,
+                             display_output=output)
+        player.normalize_loudness = False
+        probe = SyncProbe(player)
+        player.lyrics_display.recorder = probe
+
+        clock.attach()
+        try:
+            player.playlist.set_current_index(0)
+            player.load_song(*self.songs[0])
+            player.play()
+
+            clock.sleep(1.0)
+            self.assertEqual(player.lyrics_display.state.line_idx, expected_line(1.0))
+            clock.sleep(1.0)
+            self.assertEqual(player.lyrics_display.state.line_idx, expected_line(2.0))
+
+            player.pause()
+            paused_at = clock.now()
+            _, position_ms = player.engine.get_position()
+            clock.sleep(1.0)
+            self.assertTrue(player.is_paused())
+            self.assertEqual(player.engine.get_position()[1], position_ms)
+            self.assertEqual(player.lyrics_display.state.line_idx, expected_line(2.0))
+            self.assertAlmostEqual(clock.now() - paused_at, 1.0)
+
+            player.unpause()
+            clock.sleep(1.0)
+            self.assertEqual(player.lyrics_display.state.line_idx, expected_line(3.0))
+
+            self.assertTrue(player.next_track())
+            self.assertEqual(player.lyrics_display.state.line_idx, -1)
+            clock.sleep(1.0)
+            self.assertEqual(player.lyrics[0].text, "b línea 0")
+            self.assertEqual(player.lyrics_display.state.line_idx, expected_line(1.0))
+        finally:
+            player.close()
+            clock.detach()
+            output.close()
+
+        self.assertEqual(probe.tracks, 2)
+        self.assertEqual(probe.skipped, 0)
+        self.assertEqual(probe.early, 0)
+        self.assertTrue(all(0 <= lag <= 0.15 for lag in probe.lags), probe.lags)
+
+    def assert_repeatable(self, engine):
+        playback_engine.PLAYBACK_ENGINE = engine
+        runs = []
+        for _ in range(2):
+            probe, audio_seconds = simulate_playlist(self.songs)
+            runs.append((probe.tracks, probe.analysis_frames, len(probe.frame_seconds), probe.lines,
+                         probe.lags, audio_seconds))
+        self.assertEqual(runs[0], runs[1])
+        tracks, analysis_frames, _, lines, lags, _ = runs[0]
+        self.assertEqual(tracks, 2)
+        self.assertEqual(lines, 2 * len(LINE_TIMES))
+        self.assertGreater(analysis_frames, 0)
+        self.assertTrue(all(0 <= lag <= 0.15 for lag in lags), lags)
+
+    def test_stream_runs_are_identical(self):
+        self.assert_repeatable("stream")
+
+    def test_gapless_runs_are_identical(self):
+        self.assert_repeatable("gapless")
+
+
+if __name__ == "__main__":
+    unittest.main()
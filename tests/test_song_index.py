@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from song_index import VERIFY_LIMIT, SongIndex
+
+
+def song(title, artist="Artista"):
+    return (os.path.join(os.sep, "musica", f"{artist} - {title}.mp3"), None)
+
+
+def brute_force(index, query):
+    """IDs whose key contains every query word (short words as word prefixes)"""
+    needles = [word if len(word) > 2 else ' ' + word for word in query.lower().split()]
+    return [i for i, key in enumerate(index._keys) if all(needle in key for needle in needles)]
+
+
+class SongIndexTest(unittest.TestCase):
+    def test_title_with_every_gram_but_not_the_word_is_not_a_match(self):
+        # 'ana nan' holds both grams of 'anana' ('ana', 'nan') without the word itself;
+        # enough of them that the gram intersection runs to the end
+        songs = [song(f"ana nan {i}") for i in range(VERIFY_LIMIT * 2)] + [song("Anana")]
+        index = SongIndex(songs)
+        self.assertEqual(index.search("anana").tolist(), [len(songs) - 1])
+        self.assertEqual(len(index.search("nan")), len(songs))  # "Anana" holds "nan" too
+
+    def test_typing_narrows_from_the_previous_results(self):
+        rng = random.Random(7)
+        words = ["rosa", "roca", "rojo", "rio", "amor", "mar", "noche", "luna"]
+        songs = [song(" ".join(rng.sample(words, 3)), rng.choice(["Ana", "Luis"])) for _ in range(3000)]
+        index = SongIndex(songs)
+
+        looked_up = []
+        posting = index._posting
+        index._posting = lambda table, code: looked_up.append(code) or posting(table, code)
+
+        previous = None
+        for query in ["r", "ro", "roc", "roca", "roca l", "roca lu"]:
+            del looked_up[:]
+            results = index.search(query)
+            if previous is not None:
+                # Started from the last results: only the grams the new letter adds are looked up
+                self.assertEqual(set(looked_up), set(looked_up) - previous_grams)
+                self.assertTrue(set(results.tolist()) <= set(previous.tolist()))
+            self.assertEqual(results.tolist(), brute_force(index, query))
+            previous, previous_grams = results, index._last[1]
+
+        # Neither is a two-letter word prefix growing into a three-letter word, which
+        # matches inside words too, nor deleting a letter: the search starts over
+        self.assertEqual(index.search("roca lun").tolist(), brute_force(index, "roca lun"))
+        self.assertEqual(index.search("roca lu").tolist(), brute_force(index, "roca lu"))
+        self.assertEqual(index.search("mar").tolist(), brute_force(index, "mar"))
+
+    def test_songs_added_after_rebuild_are_found(self):
+        index = SongIndex([song(f"Balada {i}") for i in range(50)])
+        self.assertEqual(len(index.search("bal")), 50)
+
+        first = index.add(*song("Balada nueva"))
+        second = index.add(*song("Cumbia", "Balanza"))
+        self.assertEqual(index._table[3], 50)  # Not rebuilt yet: both are pending
+        self.assertEqual(index.search("balad nue").tolist(), [first])
+        self.assertEqual(index.search("bala").tolist()[-2:], [first, second])
+        self.assertEqual(index.search("balanz").tolist(), [second])
+
+        index.rebuild()
+        self.assertEqual(index._table[3], 52)
+        self.assertEqual(index.search("balanz").tolist(), [second])
+        self.assertEqual(index.search("bala").tolist(), brute_force(index, "bala"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcode_cache
+from transcode_cache import TranscodeCache, content_key
+
+ENTRY_BYTES = 4000
+
+
+class FakeSegment:
+    """Stands in for a pydub AudioSegment: export() writes `size` bytes, or fails halfway"""
+
+    def __init__(self, size=ENTRY_BYTES, fail=False):
+        self.size = size
+        self.fail = fail
+        self.exports = []
+
+    def export(self, path, format=None, **options):
+        self.exports.append((path, format))
+        with open(path, "wb") as f:
+            f.write(b"\1" * (self.size // 2))
+            if self.fail:
+                raise RuntimeError("ffmpeg falló")
+            f.write(b"\1" * (self.size - self.size // 2))
+
+
+class TranscodeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.cache_dir = os.path.join(self.root, "transcodes")
+
+    def song(self, name, content=None):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as f:
+            f.write(content if content is not None else name.encode() * 100)
+        return path
+
+    def test_content_key_follows_the_contents_not_the_path(self):
+        original = self.song("a.m4a")
+        copy = os.path.join(self.root, "copia.m4a")
+        shutil.copyfile(original, copy)
+        self.assertEqual(content_key(original), content_key(copy))
+        self.assertEqual(content_key(original), content_key(original, block_size=7))  # Same digest in any block size
+        self.assertNotEqual(content_key(original), content_key(self.song("b.m4a")))
+
+    def test_store_is_atomic_and_reused(self):
+        cache = TranscodeCache(self.cache_dir, max_bytes=1 << 20)
+        song = self.song("a.m4a")
+        self.assertIsNone(cache.lookup(song))
+
+        segment = FakeSegment()
+        path = cache.store(song, segment)
+        export_path, export_format = segment.exports[0]
+        self.assertNotEqual(export_path, path)  # Written elsewhere, then renamed into place
+        self.assertEqual(export_format, cache.format)
+        self.assertEqual(cache.lookup(song), path)
+        self.assertEqual(os.path.getsize(path), ENTRY_BYTES)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(path)])
+
+        # A renamed copy is served from the same entry without transcoding again
+        copy = os.path.join(self.root, "renombrada.m4a")
+        shutil.copyfile(song, copy)
+        self.assertEqual(cache.store(copy, segment), path)
+        self.assertEqual(len(segment.exports), 1)
+
+    def test_failed_export_leaves_no_entry(self):
+        cache = TranscodeCache(self.cache_dir, max_bytes=1 << 20)
+        song = self.song("a.m4a")
+        with self.assertRaises(RuntimeError):
+            cache.store(song, FakeSegment(fail=True))
+        self.assertIsNone(cache.lookup(song))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_least_recently_used_entries_are_evicted_over_the_cap(self):
+        # Room for two entries and a half
+        with mock.patch.object(transcode_cache, "TRANSCODE_CACHE_MAX_MB", 2.5 * ENTRY_BYTES / (1024 * 1024)):
+            cache = TranscodeCache(self.cache_dir)
+        self.assertEqual(cache.max_bytes, 2.5 * ENTRY_BYTES)
+
+        a, b, c, d = (self.song(f"{name}.m4a") for name in "abcd")
+        for age, song in ((400, a), (300, b), (200, c)):
+            path = cache.store(song, FakeSegment())
+            # Explicit times, oldest first, so the order does not depend on the clock resolution
+            mtime_ns = os.stat(path).st_mtime_ns - age * 10 ** 9
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        # The third entry went over the cap: the least recently used one made room for it
+        self.assertIsNone(cache.lookup(a))
+        self.assertEqual(cache.size(), 2 * ENTRY_BYTES)
+
+        self.assertIsNotNone(cache.lookup(b))  # Played again: now the most recent
+        cache.store(d, FakeSegment())
+        self.assertIsNone(cache.lookup(c))
+        self.assertIsNotNone(cache.lookup(b))
+        self.assertIsNotNone(cache.lookup(d))
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+    def test_new_entry_is_kept_even_if_alone_over_the_cap(self):
+        cache = TranscodeCache(self.cache_dir, max_bytes=ENTRY_BYTES // 2)
+        song = self.song("a.m4a")
+        path = cache.store(song, FakeSegment())
+        self.assertEqual(cache.lookup(song), path)
+
+    def test_zero_cap_disables_lookups(self):
+        cache = TranscodeCache(self.cache_dir, max_bytes=0)
+        song = self.song("a.m4a")
+        cache.store(song, FakeSegment())
+        self.assertIsNone(cache.lookup(song))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""In-memory LRU cache of recently played, already decoded tracks"""
+
+import os
+import threading
+from collections import OrderedDict
+from analysis_cache import file_signature
+from config import TRACK_CACHE_MAX_MB
+
+
+class TrackCache:
+    """Keeps decoded tracks that are not playing, ready to be played again.
+
+    Each entry holds the AudioProcessor (the decoded PCM and, for the stream
+    engine, its WAV file), the loudness gain and the parsed lyrics and song
+    info. The cache owns the processors it holds: the least recently used
+    ones are cleaned up once the PCM they hold goes over `max_bytes`.
+    Entries are dropped when the song file changes on disk.
+    """
+
+    def __init__(self, max_bytes=TRACK_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()  # song path -> entry, least recently used first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _track_bytes(processor):
+        return processor.raw_data.nbytes if processor.raw_data is not None else 0
+
+    def put(self, song_path, processor, gain, prepared):
+        """Hand a decoded track over to the cache"""
+        try:
+            signature = file_signature(song_path)
+        except OSError:
+            signature = None
+        size = self._track_bytes(processor)
+        if signature is None or size > self.max_bytes:
+            processor.cleanup()
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(os.path.abspath(song_path), None)
+            if old is not None:
+                self.size_bytes -= old['size']
+                evicted.append(old)
+            self._entries[os.path.abspath(song_path)] = {
+                'processor': processor, 'gain': gain, 'prepared': prepared,
+                'signature': signature, 'size': size}
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self.size_bytes -= entry['size']
+                evicted.append(entry)
+        for entry in evicted:
+            if entry['processor'] is not processor:
+                entry['processor'].cleanup()
+
+    def take(self, song_path):
+        """Remove and return the cached entry for a track, or None.
+
+        The caller owns the processor afterwards (and puts it back once it
+        stops playing it).
+        """
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(song_path), None)
+            if entry is not None:
+                self.size_bytes -= entry['size']
+        if entry is None:
+            return None
+        try:
+            signature = file_signature(song_path)
+        except OSError:
+            signature = None
+        if signature != entry['signature']:
+            entry['processor'].cleanup()
+            return None
+        return entry
+
+    def __contains__(self, song_path):
+        with self._lock:
+            return os.path.abspath(song_path) in self._entries
+
+    def clear(self):
+        """Release every cached track"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self.size_bytes = 0
+        for entry in entries:
+            entry['processor'].cleanup()
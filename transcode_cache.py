@@ -0,0 +1,116 @@
+"""Persistent cache of transcodes for formats pygame.mixer.music cannot play"""
+
+import hashlib
+import os
+import tempfile
+from config import CACHE_DIR, TRANSCODE_CACHE_DIR, TRANSCODE_CACHE_MAX_MB, TRANSCODE_FORMAT
+
+# Formats pygame.mixer.music plays from the file itself
+PYGAME_NATIVE_FORMATS = ('.mp3', '.wav', '.ogg', '.flac')
+# ffmpeg codec and options for each cache format
+EXPORT_OPTIONS = {
+    "ogg": {"codec": "libvorbis", "parameters": ["-q:a", "6"]},
+    "flac": {"codec": "flac", "parameters": []},
+}
+
+
+def needs_transcode(song_path):
+    """True if the mixer can only play this file after converting it"""
+    return not song_path.lower().endswith(PYGAME_NATIVE_FORMATS)
+
+
+def content_key(path, block_size=1024 * 1024):
+    """Digest of the file contents, so renamed or copied files share one entry"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscodeCache:
+    """Directory of transcoded files named after the digest of their source.
+
+    Entries are written atomically (temp file + rename), so a reader never
+    sees a half-written file and concurrent writers of the same track are
+    harmless. The modification time of an entry is bumped on every hit and
+    the oldest entries are deleted once the directory goes over `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, fmt=TRANSCODE_FORMAT):
+        self.directory = directory or os.path.join(CACHE_DIR, TRANSCODE_CACHE_DIR)
+        self.max_bytes = TRANSCODE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.format = fmt
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.{self.format}")
+
+    def lookup(self, song_path, key=None):
+        """Path of the cached transcode of a track, or None"""
+        if self.max_bytes <= 0:
+            return None
+        path = self._entry_path(key or content_key(song_path))
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            return None
+        return path
+
+    def store(self, song_path, audio_segment=None, key=None):
+        """Transcode a track into the cache and return the entry path"""
+        key = key or content_key(song_path)
+        path = self._entry_path(key)
+        if os.path.exists(path):
+            return path
+        if audio_segment is None:
+            from pydub import AudioSegment
+            audio_segment = AudioSegment.from_file(song_path)
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            audio_segment.export(tmp_path, format=self.format, **EXPORT_OPTIONS.get(self.format, {}))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict(keep=path)
+        return path
+
+    def _entries(self):
+        """(modification time, size, path) of every entry; empty if the directory is missing"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(f".{self.format}"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def size(self):
+        """Total bytes of the entries in the cache"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep=None):
+        """Delete the least recently used entries until the cache fits its size cap"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def transcode_to_cache(song_path):
+    """Worker process: fill the cache entry for a track (see audio_processor.submit_transcode)"""
+    return TranscodeCache().store(song_path)
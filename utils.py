@@ -1,58 +1,170 @@
 """Utility functions for the music player"""
 
 import os
+import threading
+import time
 from config import SONGS_DIR, LYRICS_DIR
-from lyrics_extractor import auto_extract_lyrics_for_songs, extract_album_art_from_mp3
 
 
-def get_available_songs(auto_extract=True):
-    """Obtener lista de canciones disponibles"""
-    if not os.path.exists(SONGS_DIR) or not os.path.exists(LYRICS_DIR):
-        print(f"Error: Las carpetas '{SONGS_DIR}' o '{LYRICS_DIR}' no existen.")
-        return []
-    
+SUPPORTED_FORMATS = ('.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac', '.wma', '.opus', '.aiff', '.au')
+
+
+def iter_files(root, extensions):
+    """Recursively yield os.DirEntry objects for files under `root` with the given extensions.
+
+    Uses os.scandir with an explicit stack. File type checks come from the
+    directory listing itself (d_type), and the yielded DirEntry caches its
+    stat() result, so no extra syscalls are spent per file.
+    """
+    pending_dirs = [root]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(extensions) and entry.is_file():
+                        yield entry
+        except PermissionError:
+            print(f"Error: Permiso denegado para leer la carpeta '{directory}'.")
+        except OSError as e:
+            print(f"Error al leer la carpeta '{directory}': {e}")
+        # Reversed so folders are visited in alphabetical order
+        pending_dirs.extend(sorted(subdirs, reverse=True))
+
+
+def relative_stem(path, root):
+    """Path below `root` without extension, e.g. 'Artist/Album/Song'"""
+    root = os.path.join(root, "")
+    relative = path[len(root):] if path.startswith(root) else os.path.basename(path)
+    return os.path.splitext(relative)[0]
+
+
+def index_lyrics_files():
+    """Map lyric names to paths, both by relative path and by bare file name"""
+    lyrics_by_name = {}
+    for entry in iter_files(LYRICS_DIR, ('.lrc',)):
+        lyrics_by_name.setdefault(relative_stem(entry.path, LYRICS_DIR), entry.path)
+        lyrics_by_name.setdefault(os.path.splitext(entry.name)[0], entry.path)
+    return lyrics_by_name
+
+
+def find_lyrics_for_song(song_path, lyrics_by_name, auto_extract=True):
+    """Find the lyrics file for a song, extracting embedded MP3 lyrics if allowed"""
+    song_name = os.path.splitext(os.path.basename(song_path))[0]
+    lyrics_path = lyrics_by_name.get(relative_stem(song_path, SONGS_DIR)) or lyrics_by_name.get(song_name)
+    if lyrics_path or not (auto_extract and song_path.lower().endswith('.mp3')):
+        return lyrics_path
+
+    # If no matching lyrics file exists but auto_extract is enabled, check if we can extract from MP3
+    from lyrics_extractor import create_lrc_file_from_mp3
+    lrc_path = os.path.join(LYRICS_DIR, song_name + '.lrc')
     try:
-        supported_formats = ('.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac', '.wma', '.opus', '.aiff', '.au')
-        song_files = [f for f in os.listdir(SONGS_DIR) if f.lower().endswith(supported_formats)]
-        lyrics_files = [f for f in os.listdir(LYRICS_DIR) if f.endswith('.lrc')]
-    except PermissionError:
-        print("Error: Permiso denegado para leer las carpetas de canciones o letras.")
-        return []
+        created_path = create_lrc_file_from_mp3(song_path, lrc_path)
+        if os.path.exists(created_path):
+            lyrics_by_name[song_name] = created_path
+            return created_path
     except Exception as e:
-        print(f"Error al leer las carpetas: {e}")
-        return []
-    
-    available_pairs = []
-    for song in song_files:
-        song_name = os.path.splitext(song)[0]
-        matching_lyrics = [l for l in lyrics_files if os.path.splitext(l)[0] == song_name]
-        if matching_lyrics:
-            available_pairs.append((os.path.join(SONGS_DIR, song), os.path.join(LYRICS_DIR, matching_lyrics[0])))
-        else:
-            # If no matching lyrics file exists but auto_extract is enabled, check if we can extract from MP3
-            if auto_extract and song.lower().endswith('.mp3'):
-                from lyrics_extractor import create_lrc_file_from_mp3
-                song_path = os.path.join(SONGS_DIR, song)
-                lrc_path = os.path.join(LYRICS_DIR, song_name + '.lrc')
-                try:
-                    created_path = create_lrc_file_from_mp3(song_path, lrc_path)
-                    if os.path.exists(created_path):
-                        available_pairs.append((song_path, created_path))
-                except Exception as e:
-                    print(f"No se pudo extraer letras para {song}: {e}")
+        print(f"No se pudo extraer letras para {os.path.basename(song_path)}: {e}")
+    return None
+
+
+def iter_available_songs(auto_extract=True):
+    """Yield (song_path, lyrics_path) pairs as the songs folder is scanned"""
+    if not os.path.exists(SONGS_DIR) or not os.path.exists(LYRICS_DIR):
+        print(f"Error: Las carpetas '{SONGS_DIR}' o '{LYRICS_DIR}' no existen.")
+        return
+
+    lyrics_by_name = index_lyrics_files()
+    for entry in iter_files(SONGS_DIR, SUPPORTED_FORMATS):
+        lyrics_path = find_lyrics_for_song(entry.path, lyrics_by_name, auto_extract)
+        if lyrics_path:
+            yield (entry.path, lyrics_path)
+
+
+def _retry_with_extraction(auto_extract):
+    """After a scan found no pairs: run the bulk MP3 extraction; True if the scan should be repeated"""
+    if not (os.path.exists(SONGS_DIR) and os.path.exists(LYRICS_DIR)):
+        return False
+    print("No se encontraron pares de canción/letra coincidentes.")
+    # Try auto-extraction if no pairs found
+    if not auto_extract:
+        return False
+    from lyrics_extractor import auto_extract_lyrics_for_songs
+    print("Intentando extraer letras de archivos MP3...")
+    auto_extract_lyrics_for_songs()
+    return True
+
+
+def get_available_songs(auto_extract=True):
+    """Obtener lista de canciones disponibles"""
+    available_pairs = list(iter_available_songs(auto_extract))
     
-    if not available_pairs:
-        print("No se encontraron pares de canción/letra coincidentes.")
-        # Try auto-extraction if no pairs found
-        if auto_extract:
-            print("Intentando extraer letras de archivos MP3...")
-            auto_extract_lyrics_for_songs()
-            # Try again after extraction
-            return get_available_songs(auto_extract=False)  # Don't try to extract again
+    if not available_pairs and _retry_with_extraction(auto_extract):
+        # Try again after extraction
+        return get_available_songs(auto_extract=False)  # Don't try to extract again
     
     return available_pairs
 
 
+class LibraryScan:
+    """Scans the library in a background thread, publishing songs as they are found.
+
+    `songs` grows while the scan runs, so the selector can show and play the
+    first results immediately. Subscribers get every pair, including the
+    ones found before they subscribed.
+    """
+
+    def __init__(self, auto_extract=True):
+        self.songs = []
+        self.done = threading.Event()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, args=(auto_extract,))
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, auto_extract):
+        try:
+            self._publish(iter_available_songs(auto_extract))
+            # Same fallback as get_available_songs when nothing matched
+            if not self.songs and _retry_with_extraction(auto_extract):
+                self._publish(iter_available_songs(auto_extract=False))
+        finally:
+            self.done.set()
+
+    def _publish(self, pairs):
+        for pair in pairs:
+            with self._lock:
+                self.songs.append(pair)
+                for callback in self._subscribers:
+                    callback(*pair)
+
+    def subscribe(self, callback):
+        """Call `callback(song_path, lyrics_path)` for every song, past and future"""
+        with self._lock:
+            for pair in self.songs:
+                callback(*pair)
+            self._subscribers.append(callback)
+
+    def is_scanning(self):
+        return not self.done.is_set()
+
+    def wait_for_first(self, timeout=None):
+        """Block until at least one song was found or the scan finished"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.songs and not self.done.is_set():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self.done.wait(0.02)
+        return bool(self.songs)
+
+
 def format_time(seconds):
     """Format seconds to MM:SS format"""
     minutes = int(seconds // 60)
@@ -70,4 +182,57 @@ def show_message(message, message_type="info"):
     }
     
     prefix = type_prefixes.get(message_type, "[INFO]")
-    print(f"{prefix} {message}")
\ No newline at end of file
+    print(f"{prefix} {message}")
+
+
+_KEY_NAMES = {'\r': 'enter', '\n': 'enter', '\x08': 'backspace', '\x7f': 'backspace', '\x1b': 'esc'}
+
+
+def read_key():
+    """Read one key press without echo.
+
+    Returns the typed character, or one of 'enter', 'backspace', 'esc',
+    'up', 'down' for special keys. Uses msvcrt on Windows and a raw
+    terminal on POSIX systems.
+    """
+    try:
+        import msvcrt
+    except ImportError:
+        return _read_key_posix()
+
+    char = msvcrt.getwch()
+    if char in ('\x00', '\xe0'):  # Prefix of arrow/function keys
+        return {'H': 'up', 'P': 'down'}.get(msvcrt.getwch(), '')
+    if char == '\x03':
+        raise KeyboardInterrupt
+    return _KEY_NAMES.get(char, char)
+
+
+def _read_key_posix():
+    import select
+    import sys
+    import termios
+    import tty
+
+    fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(fd)
+    try:
+        tty.setraw(fd)
+        data = os.read(fd, 1)
+        if data == b'\x1b':
+            # Arrow keys arrive as ESC [ A/B; a lone ESC has nothing behind it
+            if select.select([fd], [], [], 0.02)[0]:
+                sequence = os.read(fd, 2)
+                return {b'[A': 'up', b'[B': 'down'}.get(sequence, '')
+            return 'esc'
+        if data and data[0] >= 0xC0:
+            # Multi-byte UTF-8 character (e.g. 'ñ', 'á')
+            extra = 1 if data[0] < 0xE0 else 2 if data[0] < 0xF0 else 3
+            data += os.read(fd, extra)
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+    char = data.decode('utf-8', errors='ignore')
+    if char == '\x03':
+        raise KeyboardInterrupt
+    return _KEY_NAMES.get(char, char)
@@ -5,7 +5,17 @@ import colorsys
 from rich.text import Text
 from rich.align import Align
 from rich.style import Style
-from config import DEFAULT_EQ_BANDS
+from rich.color import Color, ColorSystem
+from config import DEFAULT_EQ_BANDS, VISUALIZER_ROWS, VISUALIZER_HISTORY_FRAMES, PEAK_HOLD_FRAMES
+
+DOWNGRADE_SYSTEMS = {"256": ColorSystem.EIGHT_BIT, "16": ColorSystem.STANDARD}
+MODES = ("bars", "waveform", "spectrum", "waterfall", "peaks", "stereo", "phase")
+MULTI_ROW_MODES = ("waterfall", "peaks")
+
+SHADE_CHARS = " ░▒▓█"
+BLOCK_CHARS = " ▁▂▃▄▅▆▇█"
+PEAK_CHAR = "▔"
+HEAT_LEVELS = 16  # Color steps of the waterfall
 
 
 class VisualizationModes:
@@ -14,11 +24,63 @@ class VisualizationModes:
         self.current_mode = "bars"  # Default visualization mode
         self.bar_chars = " ▁▂▃▄▅▆▇█"
         self.wave_chars = "       .-~=+*#%@"
+        self.color_depth = "truecolor"
+        self._style_cache = {}
+
+        # Ring buffer of recent band frames for the multi-row modes: frames are
+        # written at `_head` and read back through wrapped indices, never shifted
+        self.rows = VISUALIZER_ROWS
+        self._history = np.zeros((VISUALIZER_HISTORY_FRAMES, num_bands), dtype=np.float32)
+        self._head = 0
+        self._frames = 0
+        self._column_bands = {}  # console width -> band index of every column
+        self._palettes = None
+        self._stereo_palettes = None
+
+    def set_color_depth(self, depth):
+        """Set the color precision of the cells: 'truecolor', '256' or '16'"""
+        if depth != self.color_depth:
+            self.color_depth = depth
+            self._style_cache = {}
+            self._palettes = None
+            self._stereo_palettes = None
+
+    def _color_style(self, r, g, b):
+        """Style for an RGB color (0.0-1.0) at the current color depth"""
+        rgb = (int(r * 255), int(g * 255), int(b * 255))
+        style = self._style_cache.get(rgb)
+        if style is None:
+            if self.color_depth in DOWNGRADE_SYSTEMS:
+                color = Color.from_rgb(*rgb).downgrade(DOWNGRADE_SYSTEMS[self.color_depth])
+                style = f"color({color.number})"
+            else:
+                style = "#%02x%02x%02x" % rgb
+            if len(self._style_cache) > 4096:
+                self._style_cache = {}
+            self._style_cache[rgb] = style
+        return style
+
+    @staticmethod
+    def _append_runs(text, cells):
+        """Append (char, style) cells, merging neighbours with the same style.
+
+        Every style change costs an escape sequence in the terminal output,
+        so runs of equal cells are written as one span.
+        """
+        run_chars, run_style = [], None
+        for char, style in cells:
+            if style != run_style and run_chars:
+                text.append("".join(run_chars), style=run_style)
+                run_chars = []
+            run_chars.append(char)
+            run_style = style
+        if run_chars:
+            text.append("".join(run_chars), style=run_style)
+        return text
         
     def set_mode(self, mode):
-        """Set the visualization mode: 'bars', 'waveform', 'spectrum'"""
-        valid_modes = ["bars", "waveform", "spectrum"]
-        if mode in valid_modes:
+        """Set the visualization mode: 'bars', 'waveform', 'spectrum', 'waterfall', 'peaks', 'stereo', 'phase'"""
+        if mode in MODES:
             self.current_mode = mode
             return True
         return False
@@ -26,10 +88,76 @@ class VisualizationModes:
     def get_mode(self):
         """Get the current visualization mode"""
         return self.current_mode
-    
-    def generate_visualization(self, bands, console_width):
-        """Generate visualization based on current mode"""
-        if self.current_mode == "bars":
+
+    def next_mode(self):
+        """The mode that follows the current one when cycling"""
+        return MODES[(MODES.index(self.current_mode) + 1) % len(MODES)]
+
+    def get_height(self):
+        """Number of text rows the current mode draws"""
+        return self.rows if self.current_mode in MULTI_ROW_MODES else 1
+
+    def push_frame(self, bands):
+        """Store a band frame in the ring buffer"""
+        count = min(len(bands), self.num_bands)
+        self._history[self._head, :count] = bands[:count]
+        self._head = (self._head + 1) % len(self._history)
+        self._frames += 1
+
+    def _recent_frames(self, count):
+        """Indices of the last `count` frames, newest first"""
+        count = min(count, self._frames, len(self._history))
+        return (self._head - 1 - np.arange(count)) % len(self._history)
+
+    def _columns(self, console_width):
+        columns = self._column_bands.get(console_width)
+        if columns is None:
+            columns = np.minimum(np.arange(console_width) * self.num_bands // console_width, self.num_bands - 1)
+            self._column_bands[console_width] = columns
+        return columns
+
+    def _get_palettes(self):
+        """Styles for the multi-row modes at the current color depth"""
+        if self._palettes is None:
+            # Waterfall: dark blue (quiet) through green and yellow to red (loud)
+            heat = [None] + [self._color_style(*colorsys.hls_to_rgb(0.66 * (1 - level / (HEAT_LEVELS - 1)),
+                                                                   0.3 + 0.35 * level / (HEAT_LEVELS - 1), 0.9))
+                             for level in range(1, HEAT_LEVELS)]
+            # Peaks: green at the bottom row to red at the top
+            rows = [self._color_style(*colorsys.hls_to_rgb(0.33 * (1 - row / max(1, self.rows - 1)), 0.5, 0.9))
+                    for row in range(self.rows)]
+            self._palettes = (heat, rows, self._color_style(1.0, 1.0, 1.0))
+        return self._palettes
+
+    @staticmethod
+    def _append_level_runs(text, levels, chars, styles):
+        """Append a row given per-cell levels; each run of equal levels is one span"""
+        bounds = np.flatnonzero(levels[1:] != levels[:-1]) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [len(levels)]
+        for start, end in zip(starts, ends):
+            level = levels[start]
+            text.append(chars[level] * (end - start), style=styles[level])
+
+    def generate_visualization(self, bands, console_width, peaks=None, channel_bands=None, correlation=1.0):
+        """Generate visualization based on current mode.
+
+        `peaks` (per-band held maxima) replaces the ring-buffer maximum in the peaks mode.
+        `channel_bands` ((left, right) band levels) and `correlation` (-1 to +1)
+        feed the stereo modes; without them both channels show `bands`.
+        """
+        self.push_frame(bands)
+        if self.current_mode in ("stereo", "phase"):
+            if channel_bands is None:
+                channel_bands = (bands, bands)
+            if self.current_mode == "stereo":
+                return self._generate_stereo_visualization(channel_bands, console_width)
+            return self._generate_phase_visualization(channel_bands, correlation, console_width)
+        if self.current_mode == "waterfall":
+            return self._generate_waterfall_visualization(console_width)
+        elif self.current_mode == "peaks":
+            return self._generate_peaks_visualization(bands, console_width, peaks)
+        elif self.current_mode == "bars":
             return self._generate_bars_visualization(bands, console_width)
         elif self.current_mode == "waveform":
             return self._generate_waveform_visualization(bands, console_width)
@@ -42,6 +170,7 @@ class VisualizationModes:
     def _generate_bars_visualization(self, bands, console_width):
         """Generate a more dynamic bar visualization"""
         text = Text()
+        cells = []
         num_chars = len(self.bar_chars)
         
         for i in range(console_width):
@@ -61,14 +190,14 @@ class VisualizationModes:
             light = 0.4 + band_height * 0.5  # Higher bars are brighter
             
             r, g, b = colorsys.hls_to_rgb(hue, light, sat)
-            color_hex = f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
-            text.append(char, style=color_hex)
+            cells.append((char, self._color_style(r, g, b)))
         
-        return text
+        return self._append_runs(text, cells)
     
     def _generate_waveform_visualization(self, bands, console_width):
         """Generate a more sophisticated waveform like visualization"""
         text = Text()
+        cells = []
         # Create a more detailed waveform that shows positive and negative values
         for i in range(console_width):
             band_index = min(int(i * self.num_bands / console_width), self.num_bands - 1)
@@ -96,14 +225,14 @@ class VisualizationModes:
             light = 0.4 + amplitude * 0.5
             
             r, g, b = colorsys.hls_to_rgb(hue, light, sat)
-            color_hex = f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
-            text.append(char, style=color_hex)
+            cells.append((char, self._color_style(r, g, b)))
         
-        return text
+        return self._append_runs(text, cells)
     
     def _generate_spectrum_visualization(self, bands, console_width):
         """Generate a more detailed spectrum analyzer like visualization"""
         text = Text()
+        cells = []
         
         # Create a more detailed spectrum effect by interpolating bands to fill console width
         for i in range(console_width):
@@ -161,7 +290,116 @@ class VisualizationModes:
             light = 0.3 + amplitude * 0.5
             
             r, g, b = colorsys.hls_to_rgb(hue, light, sat)
-            color_hex = f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
-            text.append(char, style=color_hex)
+            cells.append((char, self._color_style(r, g, b)))
         
-        return text
\ No newline at end of file
+        return self._append_runs(text, cells)
+
+    def _generate_waterfall_visualization(self, console_width):
+        """Scrolling spectrogram: the newest frame on top, older frames below"""
+        heat, _, _ = self._get_palettes()
+        shade_chars = [SHADE_CHARS[min(len(SHADE_CHARS) - 1, 1 + level * (len(SHADE_CHARS) - 1) // HEAT_LEVELS)]
+                       if level else " " for level in range(HEAT_LEVELS)]
+        frames = self._history[self._recent_frames(self.rows)][:, self._columns(console_width)]
+        levels = np.clip((frames * HEAT_LEVELS).astype(np.int32), 0, HEAT_LEVELS - 1)
+
+        text = Text()
+        for row in range(self.rows):
+            if row:
+                text.append("\n")
+            if row < len(levels):
+                self._append_level_runs(text, levels[row], shade_chars, heat)
+            else:
+                text.append(" " * console_width)
+        return text
+
+    def _generate_peaks_visualization(self, bands, console_width, peaks=None):
+        """Multi-row bars with a marker holding each band's recent maximum"""
+        _, row_styles, peak_style = self._get_palettes()
+        columns = self._columns(console_width)
+        current = np.zeros(self.num_bands, dtype=np.float32)
+        current[:min(len(bands), self.num_bands)] = bands[:self.num_bands]
+        if peaks is None:
+            peaks = self._history[self._recent_frames(PEAK_HOLD_FRAMES)].max(axis=0)
+        else:
+            peaks = np.resize(np.asarray(peaks, dtype=np.float32), self.num_bands)
+        heights = current[columns] * self.rows
+        peak_rows = np.minimum((peaks[columns] * self.rows).astype(np.int32), self.rows - 1)
+
+        peak_level = len(BLOCK_CHARS)
+        chars = list(BLOCK_CHARS) + [PEAK_CHAR]
+        text = Text()
+        for line in range(self.rows):
+            row = self.rows - 1 - line  # Row 0 is the bottom one
+            fill = np.clip(heights - row, 0.0, 1.0)
+            levels = (fill * (len(BLOCK_CHARS) - 1)).astype(np.int32)
+            levels[(levels == 0) & (peak_rows == row) & (peaks[columns] > 0.05)] = peak_level
+            styles = [None] + [row_styles[row]] * (len(BLOCK_CHARS) - 1) + [peak_style]
+            if line:
+                text.append("\n")
+            self._append_level_runs(text, levels, chars, styles)
+        return text
+
+    def _get_stereo_palettes(self):
+        """Styles of the stereo modes: one block-level ramp per channel, plus the meter colors"""
+        if self._stereo_palettes is None:
+            levels = len(BLOCK_CHARS)
+            left = [None] + [self._color_style(*colorsys.hls_to_rgb(0.5, 0.3 + 0.4 * level / (levels - 1), 0.9))
+                             for level in range(1, levels)]  # Cyan
+            right = [None] + [self._color_style(*colorsys.hls_to_rgb(0.83, 0.3 + 0.4 * level / (levels - 1), 0.9))
+                              for level in range(1, levels)]  # Magenta
+            meter = {name: self._color_style(*rgb) for name, rgb in
+                     (("scale", (0.45, 0.45, 0.45)), ("good", (0.2, 0.9, 0.3)),
+                      ("wide", (0.95, 0.85, 0.2)), ("phase", (0.95, 0.25, 0.2)), ("label", (0.8, 0.8, 0.8)))}
+            self._stereo_palettes = (left, right, meter)
+        return self._stereo_palettes
+
+    def _generate_stereo_visualization(self, channel_bands, console_width):
+        """Mirrored bars: left channel to the left of the centre, right channel to the right, bass in the middle"""
+        left_styles, right_styles, meter = self._get_stereo_palettes()
+        half = max(1, (console_width - 1) // 2)
+        columns = self._columns(half)
+        chars = BLOCK_CHARS
+        text = Text()
+        for channel, (styles, bands) in enumerate(((left_styles, channel_bands[0]), (right_styles, channel_bands[-1]))):
+            current = np.zeros(self.num_bands, dtype=np.float32)
+            current[:min(len(bands), self.num_bands)] = bands[:self.num_bands]
+            levels = np.clip((current[columns] * (len(chars) - 1)).astype(np.int32), 0, len(chars) - 1)
+            if channel == 0:
+                self._append_level_runs(text, levels[::-1], chars, styles)
+                text.append("│", style=meter["scale"])
+            else:
+                self._append_level_runs(text, levels, chars, styles)
+        return text
+
+    def _generate_phase_visualization(self, channel_bands, correlation, console_width):
+        """Correlation meter (-1 out of phase, 0 wide, +1 mono) and left/right balance"""
+        _, _, meter = self._get_stereo_palettes()
+        left, right = float(np.sum(channel_bands[0])), float(np.sum(channel_bands[-1]))
+        balance = (right - left) / (left + right) if left + right > 1e-6 else 0.0
+        correlation = float(np.clip(correlation, -1.0, 1.0))
+
+        labels = f" {correlation:+.2f} "
+        meter_width = max(5, (console_width - 2 * len("fase -1 ") - len(labels) - 8) // 2) | 1
+        balance_width = meter_width // 2 | 1
+
+        def scale(width, value, style):
+            marker = int(round((value + 1) / 2 * (width - 1)))
+            cells = [("┼" if i == width // 2 else "─", meter["scale"]) for i in range(width)]
+            cells[marker] = ("●", style)
+            return cells
+
+        if correlation > 0.3:
+            style = meter["good"]
+        elif correlation > -0.1:
+            style = meter["wide"]
+        else:
+            style = meter["phase"]
+        text = Text()
+        text.append("fase -1 ", style=meter["label"])
+        self._append_runs(text, scale(meter_width, correlation, style))
+        text.append(" +1", style=meter["label"])
+        text.append(labels, style=style)
+        text.append("   L ", style=meter["label"])
+        self._append_runs(text, scale(balance_width, balance, meter["good"]))
+        text.append(" R", style=meter["label"])
+        return text
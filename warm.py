@@ -0,0 +1,186 @@
+"""Offline warm-up of every persistent cache for the whole library (main.py --warm)"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from config import WARM_MAX_MEMORY_MB, WARM_WORKERS
+
+SAVE_EVERY = 20  # Tracks between analysis cache saves, so an interrupted run loses little
+BYTES_PER_SECOND = 44100 * 2 * 24  # Decoded int + float64 copies of a stereo 44.1 kHz second
+TASKS_PER_WORKER = 20  # Workers are replaced after this many tracks to return their memory
+
+
+def estimate_memory(song_path):
+    """Rough peak memory of warming a track, from its duration (or its file size)"""
+    try:
+        import mutagen
+        audio = mutagen.File(song_path)
+        if audio is not None and audio.info.length:
+            return int(audio.info.length * BYTES_PER_SECOND)
+    except Exception:
+        pass
+    try:
+        return os.path.getsize(song_path) * 12  # About 10x for compressed formats
+    except OSError:
+        return 0
+
+
+def warm_track(song_path, lyrics_path, measure_loudness, transcode=True):
+    """Worker process: decode a track once and fill every cache that misses it.
+
+    Returns the values the parent has to store (the analysis cache is only
+    written by the parent), the stages that ran, the bytes added to the
+    transcode cache and whether a missing transcode was left out because
+    `transcode` was False (the cache is full).
+    """
+    from transcode_cache import TranscodeCache, needs_transcode, content_key
+    from lyrics_aligner import needs_alignment
+
+    transcodes = TranscodeCache()
+    transcode_key = None
+    if needs_transcode(song_path) and transcodes.max_bytes > 0:
+        transcode_key = content_key(song_path)
+        if transcodes.lookup(song_path, key=transcode_key):
+            transcode_key = None
+    align = needs_alignment(lyrics_path)
+    result = {'stages': [], 'transcode_bytes': 0, 'transcode_skipped': bool(transcode_key) and not transcode}
+    if not transcode:
+        transcode_key = None
+    if not (measure_loudness or align or transcode_key):
+        return result
+
+    from pydub import AudioSegment
+    from audio_processor import segment_to_samples
+    audio_segment = AudioSegment.from_file(song_path)
+    if measure_loudness or align:
+        samples, sample_rate = segment_to_samples(audio_segment)
+        if measure_loudness:
+            from loudness import integrated_loudness
+            result['loudness_lufs'] = integrated_loudness(samples, sample_rate)
+            result['stages'].append('volumen')
+        if align:
+            from lyrics_aligner import align_lyrics_file
+            if align_lyrics_file(song_path, lyrics_path, samples, sample_rate):
+                result['stages'].append('letras alineadas')
+        del samples
+    if transcode_key:
+        path = transcodes.store(song_path, audio_segment, key=transcode_key)
+        result['transcode_bytes'] = os.path.getsize(path)
+        result['stages'].append('transcodificado')
+    return result
+
+
+def warm_library(song_pairs, cache, max_workers=WARM_WORKERS, max_memory_mb=WARM_MAX_MEMORY_MB, progress=None):
+    """Run warm_track over every song in a process pool; returns (warmed, failed, transcodes skipped).
+
+    Tracks are admitted while the estimated memory of the jobs in flight
+    stays under `max_memory_mb` (one job always runs). Each stage checks its
+    cache first, so running it again resumes where an interrupted run stopped.
+    Transcodes stop once the transcode cache is full: past its cap each new
+    one would only evict one made earlier in the same run.
+    """
+    from transcode_cache import TranscodeCache, needs_transcode
+
+    missing = object()
+    max_workers = max_workers or os.cpu_count() or 1
+    budget = max_memory_mb * 1024 * 1024
+    transcodes = TranscodeCache()
+    # Each transcode in flight reserves its source size until its real size is known
+    transcode_room = transcodes.max_bytes - transcodes.size()
+    queue = iter(song_pairs)
+    in_flight = {}  # future -> (song path, memory estimate, transcode reservation)
+    in_flight_bytes = 0
+    warmed = failed = skipped = done_count = 0
+    next_pair = next(queue, None)
+
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=TASKS_PER_WORKER) as executor:
+        try:
+            while True:
+                while next_pair is not None and len(in_flight) < max_workers:
+                    song_path, lyrics_path = next_pair
+                    estimate = estimate_memory(song_path)
+                    if in_flight and in_flight_bytes + estimate > budget:
+                        break
+                    measure = cache.get(song_path, 'loudness_lufs', missing) is missing
+                    reservation = os.path.getsize(song_path) if needs_transcode(song_path) else 0
+                    transcode = reservation <= transcode_room
+                    if transcode:
+                        transcode_room -= reservation
+                    else:
+                        reservation = 0
+                    future = executor.submit(warm_track, song_path, lyrics_path, measure, transcode)
+                    in_flight[future] = (song_path, estimate, reservation)
+                    in_flight_bytes += estimate
+                    next_pair = next(queue, None)
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    song_path, estimate, reservation = in_flight.pop(future)
+                    in_flight_bytes -= estimate
+                    transcode_room += reservation
+                    done_count += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"No se pudo preparar {os.path.basename(song_path)}: {e}")
+                    else:
+                        transcode_room -= result['transcode_bytes']
+                        skipped += result['transcode_skipped']
+                        if 'loudness_lufs' in result:
+                            cache.update(song_path, save=False, loudness_lufs=result['loudness_lufs'])
+                        if result['stages']:
+                            warmed += 1
+                    if progress:
+                        progress(done_count, os.path.basename(song_path))
+                    if done_count % SAVE_EVERY == 0:
+                        cache.save()
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            print("Interrumpido: lo ya procesado queda guardado; vuelva a ejecutar --warm para continuar.")
+        finally:
+            cache.save()
+    return warmed, failed, skipped
+
+
+def main():
+    """Scan the library, warm every track and rebuild the lyric search index"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Warm every cache of the library before playing")
+    parser.add_argument("--workers", type=int, default=WARM_WORKERS, help="number of worker processes")
+    parser.add_argument("--max-memory-mb", type=int, default=WARM_MAX_MEMORY_MB,
+                        help="estimated memory allowed for the tracks being processed")
+    args, _ = parser.parse_known_args()  # Ignores --warm when started from main.py
+
+    from rich.console import Console
+    from rich.progress import Progress, BarColumn, TextColumn, MofNCompleteColumn, TimeRemainingColumn
+    from analysis_cache import AnalysisCache
+    from lyric_index import LyricIndex
+    from utils import get_available_songs
+
+    console = Console()
+    console.print("[bold]1/3[/bold] Recorriendo la biblioteca y extrayendo letras embebidas...")
+    song_pairs = get_available_songs()
+
+    console.print(f"[bold]2/3[/bold] Decodificando {len(song_pairs)} canciones: volumen, alineación de letras y transcodificación...")
+    with Progress(TextColumn("{task.description}"), BarColumn(), MofNCompleteColumn(),
+                  TimeRemainingColumn(), TextColumn("[dim]{task.fields[song]}"), console=console) as bar:
+        task = bar.add_task("Preparando", total=len(song_pairs), song="")
+        warmed, failed, skipped = warm_library(song_pairs, AnalysisCache(), args.workers, args.max_memory_mb,
+                                      progress=lambda done, song: bar.update(task, completed=done, song=song))
+
+    console.print("[bold]3/3[/bold] Actualizando el índice de búsqueda en letras...")
+    lyric_index = LyricIndex()
+    lyric_index.refresh()
+
+    console.print(f"[green]Listo:[/green] {warmed} canciones preparadas, {len(song_pairs) - warmed - failed} ya estaban al día, "
+                  f"{failed} con errores, {len(lyric_index)} archivos de letras indexados.")
+    if skipped:
+        console.print(f"[yellow]{skipped} canciones sin transcodificar:[/yellow] la caché de transcodificación "
+                      f"llegó a su límite (TRANSCODE_CACHE_MAX_MB); se convertirán al reproducirlas.")
+
+
+if __name__ == "__main__":
+    main()